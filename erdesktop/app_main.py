@@ -1,33 +1,87 @@
 import sys
 
-from PyQt5.QtCore import QTranslator
+from PyQt5.QtCore import QTranslator, QTimer
 from PyQt5.QtWidgets import QApplication
 
+from erdesktop.util import logger
 from erdesktop.settings import Settings
+from erdesktop.util.startup import StartupTimer, ImportProfiler
 
-# noinspection PyUnresolvedReferences
-from erdesktop.resources import languages
-from erdesktop.main_window import MainWindow
-from erdesktop.util.service import ReminderService
+# prints timings of imports and startup phases when the application is idle
+PROFILE_STARTUP_ARG = '--profile-startup'
 
 
-def main():
-	app = QApplication(sys.argv)
+def load_translator(app, lang):
+	# compiled translations are registered by importing the resource module
+
+	# noinspection PyUnresolvedReferences
+	from erdesktop.resources import languages
+	translator = QTranslator(app)
+	translator.load(':/lang/{}.qm'.format(lang))
+	app.installTranslator(translator)
 
-	app.setStyle('Fusion')
 
-	settings = Settings()
+def startup(app, timer, start_service=True):
+	"""
+	Creates the main window and starts the reminder service timing every phase
+	with 'timer'. Returns the window and the service, which is None if
+	'start_service' is False.
+	"""
+	with timer.phase('imports'):
+		from erdesktop.main_window import MainWindow
+		from erdesktop.util.service import ReminderService
 
-	translator = QTranslator()
-	translator.load(':/lang/{}.qm'.format(settings.app_lang))
-	app.installTranslator(translator)
+	with timer.phase('settings'):
+		settings = Settings.shared()
+
+	with timer.phase('translator'):
+		load_translator(app, settings.app_lang)
+
+	with timer.phase('main window'):
+		window = MainWindow(app=app)
+
+	service = None
+	if start_service:
+		with timer.phase('reminder service'):
+			service = ReminderService(window, window.calendar)
 
-	window = MainWindow(app=app)
+			# noinspection PyUnresolvedReferences
+			app.aboutToQuit.connect(service.shutdown)
+			service.start()
+
+	with timer.phase('show'):
+		if not settings.start_in_tray:
+			window.show()
+
+	QTimer.singleShot(0, timer.idle)
+	return window, service
+
+
+def report(timer, profiler):
+	if profiler is None:
+		logger.debug('Startup:\n%s', timer.report())
+		return
+	profiler.stop()
+	print(timer.report())
+	print()
+	print(profiler.report())
+
+
+def main():
+	profiler = None
+	if PROFILE_STARTUP_ARG in sys.argv:
+		sys.argv.remove(PROFILE_STARTUP_ARG)
+		profiler = ImportProfiler()
+		profiler.start()
 
-	ReminderService(window, window.calendar).start()
+	timer = StartupTimer()
+	with timer.phase('application'):
+		app = QApplication(sys.argv)
+		app.setStyle('Fusion')
 
-	if not settings.start_in_tray:
-		window.show()
+	# noinspection PyUnusedLocal
+	window, service = startup(app, timer)
+	QTimer.singleShot(0, lambda: report(timer, profiler))
 
 	sys.exit(app.exec_())
 
@@ -4,17 +4,33 @@ import requests
 
 from erdesktop.cloud import routes
 from erdesktop.cloud import status
+from erdesktop.storage import Storage
 from erdesktop.settings import APP_DATA_PATH
 from erdesktop.util import exceptions as exc
 from erdesktop.util.decorators import failure_wrapper
+from erdesktop.util.exceptions import DatabaseException
 
 
 class CloudStorage:
 	"""
 	Cloud storage implements methods to access Event Reminder server-side data.
+
+	Incremental backups:
+		A backup which has a 'parent' digest contains only events changed since that
+		backup, see Storage. Before a delta is uploaded the chain of its parent is
+		looked up in the list of backups: if any backup of the chain is missing or
+		the chain already has MAX_CHAIN_DELTAS deltas, a full backup is uploaded
+		instead. Server answers 409 if the parent does not exist anymore, then a
+		full backup is uploaded as well. Downloading verifies every backup and
+		follows parents written in backup data up to the full backup, returning the
+		whole chain. Backups which depend on a backup are listed by
+		'dependent_backups', they cannot be restored once it is deleted.
 	"""
 
-	def __init__(self):
+	MAX_CHAIN_DELTAS = 10
+
+	def __init__(self, base_url=None):
+		self.__base_url = base_url
 		self.client = requests.Session()
 		token = self.__retrieve_token()
 		if token:
@@ -22,6 +38,11 @@ class CloudStorage:
 				'Authorization': 'Token {}'.format(token)
 			})
 
+	def __route(self, route):
+		if self.__base_url is None:
+			return route
+		return routes.rebase(route, self.__base_url)
+
 	@staticmethod
 	def __retrieve_token():
 		try:
@@ -41,7 +62,7 @@ class CloudStorage:
 
 	@failure_wrapper(method_desc='Login')
 	def login(self, username, password, remember=False):
-		response = self.client.post(routes.AUTH_LOGIN, json={
+		response = self.client.post(self.__route(routes.AUTH_LOGIN), json={
 			'username': username,
 			'password': password
 		})
@@ -60,7 +81,7 @@ class CloudStorage:
 
 	@failure_wrapper(method_desc='Logout')
 	def logout(self):
-		response = self.client.post(routes.AUTH_LOGOUT)
+		response = self.client.post(self.__route(routes.AUTH_LOGOUT))
 		if response.status_code != status.HTTP_200_OK:
 			raise exc.LogoutFailedError(response.status_code)
 		self.remove_token()
@@ -71,7 +92,7 @@ class CloudStorage:
 			token = self.client.headers.pop('Authorization')
 		else:
 			token = None
-		response = self.client.post(routes.ACCOUNT_CREATE, json={
+		response = self.client.post(self.__route(routes.ACCOUNT_CREATE), json={
 			'username': username,
 			'email': email
 		})
@@ -92,7 +113,7 @@ class CloudStorage:
 
 	@failure_wrapper(method_desc='Reading account')
 	def user(self):
-		response = self.client.get(routes.ACCOUNT_DETAILS)
+		response = self.client.get(self.__route(routes.ACCOUNT_DETAILS))
 		if response.status_code == status.HTTP_401_UNAUTHORIZED:
 			raise exc.AuthRequiredError()
 		if response.status_code != status.HTTP_200_OK:
@@ -104,21 +125,21 @@ class CloudStorage:
 		context = {}
 		if max_backups is not None:
 			context['max_backups'] = max_backups
-		response = self.client.post(routes.ACCOUNT_EDIT, json=context)
+		response = self.client.post(self.__route(routes.ACCOUNT_EDIT), json=context)
 		if response.status_code != status.HTTP_201_CREATED:
 			raise exc.UserUpdatingError(response.status_code)
 		return response.json()
 
 	@failure_wrapper(method_desc='Token request')
 	def request_token(self, email):
-		response = self.client.post(routes.ACCOUNT_SEND_TOKEN, json={'email': email})
+		response = self.client.post(self.__route(routes.ACCOUNT_SEND_TOKEN), json={'email': email})
 		if response.status_code != status.HTTP_201_CREATED:
 			raise exc.RequestTokenError(response.status_code)
 		return response.json()
 
 	@failure_wrapper(method_desc='Password reset')
 	def reset_password(self, email, new_password, new_password_confirm, confirmation_code):
-		response = self.client.post(routes.ACCOUNT_PASSWORD_RESET, json={
+		response = self.client.post(self.__route(routes.ACCOUNT_PASSWORD_RESET), json={
 			'email': email,
 			'new_password': new_password,
 			'new_password_confirm': new_password_confirm,
@@ -130,7 +151,7 @@ class CloudStorage:
 
 	@failure_wrapper(method_desc='Reading backups')
 	def backups(self):
-		response = self.client.get(routes.BACKUPS)
+		response = self.client.get(self.__route(routes.BACKUPS))
 		if response.status_code == status.HTTP_401_UNAUTHORIZED:
 			raise exc.AuthRequiredError()
 		elif response.status_code != status.HTTP_200_OK:
@@ -139,26 +160,108 @@ class CloudStorage:
 
 	@failure_wrapper(method_desc='Backup uploading')
 	def upload_backup(self, backup):
-		response = self.client.post(routes.BACKUP_CREATE, data=backup)
+		response = self.client.post(self.__route(routes.BACKUP_CREATE), data=backup)
 		if response.status_code == status.HTTP_401_UNAUTHORIZED:
 			raise exc.AuthRequiredError()
 		if response.status_code == status.HTTP_400_BAD_REQUEST:
 			raise exc.BackupAlreadyExistsError()
+		if response.status_code == status.HTTP_409_CONFLICT:
+			raise exc.BackupParentNotFoundError(response.status_code)
 		elif response.status_code != status.HTTP_201_CREATED:
 			raise exc.BackupUploadingError(response.status_code)
 
+	def upload_incremental_backup(self, storage, timestamp, include_settings, username=None):
+		"""
+		Uploads events changed since the backup base of 'storage' as a delta, or all
+		events if there is no base or the server does not have it, and makes the
+		uploaded backup the new base. Returns the uploaded backup data.
+		"""
+		base = storage.get_backup_base()
+		seq = storage.last_change_seq()
+		if base is not None:
+			length = self.chain_length(self.backups(), base[0])
+			if length is None or length >= self.MAX_CHAIN_DELTAS:
+				base = None
+		if base is not None:
+			events, deleted = storage.changes_since(base[1])
+			backup = storage.prepare_delta_data(events, deleted, base[0], timestamp, include_settings, username)
+			try:
+				self.upload_backup(backup)
+			except exc.BackupParentNotFoundError:
+				base = None
+		if base is None:
+			backup = storage.prepare_backup_data(storage.to_array(with_ids=True), timestamp, include_settings, username)
+			self.upload_backup(backup)
+		storage.set_backup_base(backup['digest'], seq)
+		return backup
+
 	@failure_wrapper(method_desc='Backup downloading')
 	def download_backup(self, backup_hash):
-		response = self.client.get('{}{}'.format(routes.BACKUP_DETAILS, backup_hash))
+		response = self.client.get('{}{}'.format(self.__route(routes.BACKUP_DETAILS), backup_hash))
 		if response.status_code == status.HTTP_401_UNAUTHORIZED:
 			raise exc.AuthRequiredError()
 		elif response.status_code != status.HTTP_200_OK:
 			raise exc.BackupDownloadingError(response.status_code)
 		return response.json()
 
+	def download_backup_chain(self, backup_hash):
+		"""
+		Downloads the backup and all its parents, returns them ordered from the full
+		backup to the requested one. Parents are taken from verified backup data, not
+		from fields sent by the server.
+		"""
+		chain = []
+		while backup_hash:
+			if any(backup['digest'] == backup_hash for backup in chain):
+				raise exc.BackupDownloadingError('broken backup chain')
+			backup = self.download_backup(backup_hash)
+			if backup.get('digest') != backup_hash:
+				raise exc.BackupDownloadingError('broken backup chain')
+			try:
+				backup_hash = Storage.decode_backup(backup).get('parent')
+			except DatabaseException as e:
+				raise exc.BackupDownloadingError(str(e))
+			chain.append(backup)
+		chain.reverse()
+		return chain
+
+	@staticmethod
+	def chain_length(backups, backup_hash):
+		"""
+		Returns the number of deltas in the chain of the backup with 'backup_hash'
+		using parents from the list of 'backups', or None if any backup of the chain
+		is not in the list.
+		"""
+		parents = {backup['digest']: backup.get('parent') for backup in backups}
+		length = -1
+		while backup_hash:
+			if backup_hash not in parents or length >= len(parents):
+				return None
+			backup_hash = parents[backup_hash]
+			length += 1
+		return length
+
+	@staticmethod
+	def dependent_backups(backups, backup_hash):
+		"""
+		Returns digests of backups from the list of 'backups' which are deltas based
+		on the backup with 'backup_hash', directly or through other deltas.
+		"""
+		parents = {backup['digest']: backup.get('parent') for backup in backups}
+		dependent = []
+		for digest in parents:
+			parent = parents[digest]
+			seen = {digest}
+			while parent and parent not in seen and parent != backup_hash:
+				seen.add(parent)
+				parent = parents.get(parent)
+			if parent == backup_hash:
+				dependent.append(digest)
+		return dependent
+
 	@failure_wrapper(method_desc='Backup deleting')
 	def delete_backup(self, backup_hash):
-		response = self.client.post('{}{}'.format(routes.BACKUP_DELETE, backup_hash))
+		response = self.client.post('{}{}'.format(self.__route(routes.BACKUP_DELETE), backup_hash))
 		if response.status_code == status.HTTP_400_BAD_REQUEST:
 			raise exc.AuthRequiredError()
 		elif response.status_code != status.HTTP_201_CREATED:
@@ -27,3 +27,10 @@ BACKUPS = '{}/backups/'.format(_BASE)
 BACKUP_CREATE = '{}create'.format(BACKUPS)
 BACKUP_DELETE = '{}delete/'.format(BACKUPS)
 BACKUP_DETAILS = '{}details/'.format(BACKUPS)
+
+
+def rebase(route, base):
+	"""
+	Returns the route on another server given by its api base url, e.g. a local one.
+	"""
+	return '{}{}'.format(base.rstrip('/'), route[len(_BASE):])
@@ -22,7 +22,7 @@ class AboutDialog(QDialog):
 		if self.calendar is None:
 			raise RuntimeError('AboutDialog: calendar is not set')
 
-		self.settings = Settings()
+		self.settings = Settings.shared()
 		self.user = None
 		self.thread_pool = QThreadPool()
 		self.data_section = QVBoxLayout()
@@ -39,10 +39,10 @@ class AccountDialog(QDialog):
 		self.setWindowTitle(self.tr('Account'))
 		self.setWindowFlags(Qt.Dialog)
 
-		self.settings = Settings()
+		self.settings = Settings.shared()
 		self.spinner = WaitingSpinner()
 		self.thread_pool = QThreadPool()
-		self.cloud = kwargs.get('cloud_storage', CloudStorage())
+		self.cloud = kwargs['cloud_storage'] if 'cloud_storage' in kwargs else CloudStorage()
 
 		self.username_signup_input = QLineEdit()
 		self.email_signup_input = QLineEdit()
@@ -5,7 +5,7 @@ from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt, QThreadPool
 from PyQt5.QtWidgets import (
 	QTabWidget, QFileDialog, QScrollArea, QListWidgetItem, QDialog,
-	QLineEdit, QListWidget, QWidget, QHBoxLayout, QVBoxLayout, QLabel
+	QLineEdit, QListWidget, QWidget, QHBoxLayout, QVBoxLayout, QLabel, QMessageBox
 )
 
 from requests.exceptions import RequestException
@@ -18,6 +18,7 @@ from erdesktop.cloud import CloudStorage
 from erdesktop.widgets import BackupWidget
 from erdesktop.widgets.util import PushButton, popup
 from erdesktop.widgets.waiting_spinner import WaitingSpinner
+from erdesktop.dialogs.settings_dialog import SettingsDialog
 from erdesktop.util.exceptions import (
 	BackupAlreadyExistsError, BackupDownloadingError, CloudStorageException,
 	AuthRequiredError, UserRetrievingError, ReadingBackupsError, BackupDeletingError
@@ -45,15 +46,16 @@ class BackupDialog(QDialog):
 		if self.calendar is None:
 			raise RuntimeError('BackupDialog: calendar is not set')
 
-		self.storage = kwargs.get('storage', Storage())
-		self.cloud = kwargs.get('cloud_storage', CloudStorage())
+		self.storage = kwargs['storage'] if 'storage' in kwargs else Storage()
+		self.cloud = kwargs['cloud_storage'] if 'cloud_storage' in kwargs else CloudStorage()
+		self.backups_cloud = []
 
 		self.setFixedSize(500, 320)
 		self.setWindowTitle(self.tr('Backup and Restore'))
 
 		self.backups_pool = []
 
-		self.settings = Settings()
+		self.settings = Settings.shared()
 
 		self.backup_file_input = QLineEdit()
 		self.restore_file_input = QLineEdit()
@@ -200,9 +202,14 @@ class BackupDialog(QDialog):
 
 	def launch_restore_local_success(self):
 		self.calendar.update()
-		self.calendar.settings_dialog.refresh_settings_values()
+		self.refresh_settings_dialog()
 		popup.info(self, self.tr('Data has been restored'))
 
+	def refresh_settings_dialog(self):
+		settings_dialog = self.calendar.created_dialog(SettingsDialog)
+		if settings_dialog is not None:
+			settings_dialog.refresh_settings_values()
+
 	def launch_backup_local(self):
 		path = self.backup_file_input.text()
 		self.settings.set_last_backup_path(path)
@@ -264,6 +271,7 @@ class BackupDialog(QDialog):
 		self.exec_worker(self.cloud.backups, None, self.refresh_backups_cloud_success)
 
 	def refresh_backups_cloud_success(self, backups):
+		self.backups_cloud = backups
 		self.upload_backup_button.setEnabled(True)
 		for backup in backups:
 			self.add_backup_widget(backup)
@@ -283,11 +291,12 @@ class BackupDialog(QDialog):
 			font=self.font(),
 			hash_sum=backup_data['digest'],
 			title=datetime.strptime(backup_data['timestamp'], EventModel.TIMESTAMP_FORMAT).strftime(EventModel.DATE_TIME_FORMAT),
-			description='{} {} {}, {}'.format(
+			description='{} {} {}, {}{}'.format(
 				backup_data['backup_size'],
 				backup_data['events_count'],
 				text_label,
-				self.tr('full backup') if backup_data['contains_settings'] is True else self.tr('excluded settings')
+				self.tr('full backup') if backup_data['contains_settings'] is True else self.tr('excluded settings'),
+				', {}'.format(self.tr('incremental')) if backup_data.get('parent') else ''
 			)
 		)
 		list_widget_item = QListWidgetItem(self.backups_cloud_list_widget)
@@ -300,11 +309,10 @@ class BackupDialog(QDialog):
 
 	def upload_backup_cloud_run(self):
 		user = self.cloud.user()
-		timestamp = datetime.strftime(datetime.now(), '%Y-%m-%d %H:%M:%S')
-		backup_data = self.storage.prepare_backup_data(
-			self.storage.to_array(), timestamp, self.settings.include_settings_backup, user['username']
+		timestamp = datetime.strftime(datetime.now(), EventModel.TIMESTAMP_FORMAT)
+		self.cloud.upload_incremental_backup(
+			self.storage, timestamp, self.settings.include_settings_backup, user['username']
 		)
-		self.cloud.upload_backup(backup_data)
 
 	def upload_backup_cloud_success(self):
 		self.refresh_backups_cloud()
@@ -316,18 +324,22 @@ class BackupDialog(QDialog):
 			self.exec_worker(self.download_backup_cloud_run, self.download_backup_cloud_success, None, *(current,))
 
 	def download_backup_cloud_run(self, current):
-		self.storage.restore_from_dict(self.cloud.download_backup(current.hash_sum))
+		self.storage.restore_chain(self.cloud.download_backup_chain(current.hash_sum))
 
 	def download_backup_cloud_success(self):
 		self.calendar.reset_palette(self.settings.app_theme)
 		self.calendar.reset_font(QFont('SansSerif', self.settings.app_font))
 		self.calendar.update()
-		self.calendar.settings_dialog.refresh_settings_values()
+		self.refresh_settings_dialog()
 		popup.info(self, self.tr('Backup was successfully downloaded. Restart application to enable all restored settings.'))
 
 	def delete_backup_cloud(self):
 		current = self.get_current_selected()
 		if current is not None:
+			if len(self.cloud.dependent_backups(self.backups_cloud, current.hash_sum)) > 0:
+				question = self.tr('Incremental backups based on this backup cannot be restored without it. Do you really want to delete it')
+				if popup.question(self, self.tr('Deleting a backup'), '{}?'.format(question)) != QMessageBox.Yes:
+					return
 			self.exec_worker(self.cloud.delete_backup, self.delete_backup_cloud_success, None, *(current.hash_sum,))
 
 	def delete_backup_cloud_success(self):
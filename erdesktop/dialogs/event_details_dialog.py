@@ -33,7 +33,7 @@ class EventDetailsDialog(QDialog):
 		if self.calendar is None:
 			raise RuntimeError('EventDetailsDialog: calendar is not set')
 
-		self.storage = kwargs.get('storage', Storage(try_to_reconnect=True))
+		self.storage = kwargs['storage'] if 'storage' in kwargs else Storage(try_to_reconnect=True)
 		self.storage.try_to_reconnect = True
 
 		self.title_input = QLineEdit(self)
@@ -43,6 +43,7 @@ class EventDetailsDialog(QDialog):
 		self.repeat_weekly_input = QCheckBox(self.tr('Repeat weekly'), self)
 
 		self.event_id = None
+		self.is_repeating = False
 		self.del_btn = None
 
 		self.is_editing = False
@@ -87,6 +88,7 @@ class EventDetailsDialog(QDialog):
 		self.is_editing = False
 		if date is not None:
 			self.event_id = None
+			self.is_repeating = False
 			self.date_input.setDate(QDate(date))
 			curr_time = (datetime.now() + timedelta(minutes=3)).time().replace(second=0, microsecond=0)
 			self.time_input.setTime(QTime(curr_time))
@@ -97,7 +99,9 @@ class EventDetailsDialog(QDialog):
 			self.setWindowTitle(self.tr('Update Event'))
 			self.title_input.setText(event_data.title)
 			self.description_input.setText(event_data.description)
-			self.date_input.setDate(event_data.date)
+			# an occurrence of a repeating event is edited as the whole series
+			self.is_repeating = event_data.repeat_weekly
+			self.date_input.setDate(event_data.series_date)
 			self.time_input.setTime(QTime(event_data.time))
 			self.repeat_weekly_input.setChecked(event_data.repeat_weekly)
 			self.del_btn.setEnabled(True)
@@ -134,11 +138,11 @@ class EventDetailsDialog(QDialog):
 			self.exec_worker(fn, self.close_and_update, err_format, **data)
 
 	def delete_event(self):
-		if popup.question(
-				self,
-				self.tr('Deleting an event'),
-				'{}?'.format(self.tr('Do you really want to delete the event'))
-		) == QMessageBox.Yes:
+		if self.is_repeating:
+			question = self.tr('Do you really want to delete all occurrences of the repeating event')
+		else:
+			question = self.tr('Do you really want to delete the event')
+		if popup.question(self, self.tr('Deleting an event'), '{}?'.format(question)) == QMessageBox.Yes:
 			worker = Worker(self.storage.delete_event, *(self.event_id,))
 			worker.signals.success.connect(self.close_and_update)
 			worker.err_format = '{}'
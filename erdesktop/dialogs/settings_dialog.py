@@ -1,5 +1,5 @@
 from PyQt5.QtCore import Qt, QThreadPool
-from PyQt5.QtGui import QIntValidator, QFont
+from PyQt5.QtGui import QIntValidator
 from PyQt5.QtWidgets import (
 	QDialog, QLineEdit, QCheckBox, QComboBox, QVBoxLayout,
 	QHBoxLayout, QWidget, QGridLayout, QLabel, QTabWidget
@@ -35,7 +35,7 @@ class SettingsDialog(QDialog):
 		if self.calendar is None:
 			raise RuntimeError('SettingsDialog: calendar is not set')
 
-		self.settings = Settings()
+		self.settings = Settings.shared()
 
 		if self.settings.app_lang == 'en_US':
 			self.setFixedSize(600, 450)
@@ -46,7 +46,7 @@ class SettingsDialog(QDialog):
 
 		self.spinner = WaitingSpinner()
 		self.thread_pool = QThreadPool()
-		self.cloud = kwargs.get('cloud_storage', CloudStorage())
+		self.cloud = kwargs['cloud_storage'] if 'cloud_storage' in kwargs else CloudStorage()
 
 		self.font_combo_box = QComboBox()
 		self.start_in_tray_check_box = QCheckBox()
@@ -278,9 +278,7 @@ class SettingsDialog(QDialog):
 				new_font = FONT_NORMAL
 			elif current == 2:
 				new_font = FONT_LARGE
-			font = QFont('SansSerif', new_font)
 			self.settings.set_font(new_font)
-			self.calendar.reset_font(font)
 
 	def remind_time_units_changed(self, current):
 		if self.ui_is_loaded:
@@ -305,7 +303,6 @@ class SettingsDialog(QDialog):
 	def theme_changed(self, current):
 		if self.ui_is_loaded:
 			self.settings.set_theme(current == 1)
-			self.calendar.reset_palette(self.settings.app_theme)
 
 	def remove_after_time_up_changed(self):
 		self.settings.set_remove_event_after_time_up(self.remove_after_time_up_check_box.isChecked())
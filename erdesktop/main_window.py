@@ -1,5 +1,3 @@
-import qtawesome as qta
-
 from datetime import datetime
 
 from PyQt5.QtGui import QFont
@@ -8,19 +6,22 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, QLocale
 
-from erdesktop.util import logger, log_msg
+from erdesktop.util import logger
 from erdesktop.widgets import CalendarWidget
 from erdesktop.system import system, shortcut_icon
 from erdesktop.widgets.util import error, info, PushButton
+from erdesktop.widgets.search_widget import SearchWidget
 from erdesktop.widgets.event_list_widget import EventListWidget
 from erdesktop.util.exceptions import ShortcutIconIsNotSupportedError
 from erdesktop.settings import Settings, APP_NAME, AVAILABLE_LOCALES, APP_MIN_WIDTH, APP_MIN_HEIGHT
 
+MENU_ICON_PROPERTY = 'icon_name'
+
 
 class MainWindow(QMainWindow):
 
 	def __init__(self, **kwargs):
-		self.settings = Settings()
+		self.settings = Settings.shared()
 		super().__init__(None, Qt.WindowFlags())
 
 		self.window().setWindowTitle(APP_NAME)
@@ -39,6 +40,18 @@ class MainWindow(QMainWindow):
 
 		self.calendar = self.init_calendar()
 
+		self.search_widget = SearchWidget(**{
+			'parent': self,
+			'storage': self.calendar.storage,
+			'events_list': self.events_list
+		})
+
+		# noinspection PyUnresolvedReferences
+		self.search_widget.searchCleared.connect(self.search_cleared)
+
+		# noinspection PyUnresolvedReferences
+		self.calendar.clicked.connect(self.search_widget.reset)
+
 		self.btn_new_event = PushButton(self.tr('New'), 90, 30, self.calendar.open_details_event)
 		self.btn_edit = PushButton(self.tr('Details'), 90, 30, self.calendar.edit_event_click)
 		self.btn_delete = PushButton(self.tr('Delete'), 90, 30, self.calendar.delete_event_click)
@@ -58,6 +71,7 @@ class MainWindow(QMainWindow):
 		# noinspection PyUnresolvedReferences
 		self.calendar.selectionChanged.connect(self.date_selection_changed)
 
+		self.menu_icons_loaded = False
 		self.setup_navigation_menu()
 		self.setFont(QFont('SansSerif', self.settings.app_font))
 
@@ -82,6 +96,9 @@ class MainWindow(QMainWindow):
 		else:
 			self.btn_new_event.setEnabled(True)
 
+	def search_cleared(self):
+		self.calendar.load_events(self.calendar.selectedDate())
+
 	def save_state(self):
 		self.settings.autocommit(False)
 		self.settings.set_pos(self.pos())
@@ -125,9 +142,13 @@ class MainWindow(QMainWindow):
 		scroll_view.setWidget(self.events_list)
 		scroll_view.setWidgetResizable(True)
 		scroll_view.setFixedWidth(400)
+		self.search_widget.setFixedWidth(400)
 
 		layout = QVBoxLayout()
 
+		# noinspection PyArgumentList
+		layout.addWidget(self.search_widget)
+
 		# noinspection PyArgumentList
 		layout.addWidget(scroll_view)
 
@@ -173,16 +194,39 @@ class MainWindow(QMainWindow):
 		main_menu = self.menuBar()
 		self.setup_file_menu(main_menu)
 		self.setup_help_menu(main_menu)
+		for menu in main_menu.findChildren(QMenu):
+
+			# noinspection PyUnresolvedReferences
+			menu.aboutToShow.connect(self.load_menu_icons)
+
+	def load_menu_icons(self):
+		"""
+		Sets icons of all menu actions when a menu is shown for the first time,
+		so qtawesome and its fonts are not loaded during startup.
+		"""
+		if self.menu_icons_loaded:
+			return
+		import qtawesome as qta
+		for menu in self.menuBar().findChildren(QMenu):
+			for action in menu.actions():
+				name = action.property(MENU_ICON_PROPERTY)
+				if name:
+					action.setIcon(qta.icon(name))
+		self.menu_icons_loaded = True
 
 	@staticmethod
 	def create_action(target, title, fn, shortcut=None, tip=None, icon=None):
+		"""
+		Creates a menu action, 'icon' is a qtawesome icon name which is loaded by
+		'load_menu_icons'.
+		"""
 		action = QAction(title, target)
 		if shortcut:
 			action.setShortcut(shortcut)
 		if tip:
 			action.setStatusTip(tip)
 		if icon:
-			action.setIcon(icon)
+			action.setProperty(MENU_ICON_PROPERTY, icon)
 
 		# noinspection PyUnresolvedReferences
 		action.triggered.connect(fn)
@@ -195,7 +239,7 @@ class MainWindow(QMainWindow):
 		except ShortcutIconIsNotSupportedError:
 			error(self, self.tr('Shortcut icon is not supported on {} by application').format(system.name()))
 		except Exception as exc:
-			logger.error(log_msg('Unable to create shortcut icon: {}'.format(exc)))
+			logger.error('Unable to create shortcut icon: %s', exc)
 			error(self, self.tr('Unable to create shortcut icon'))
 
 	def setup_file_menu(self, main_menu):
@@ -214,21 +258,21 @@ class MainWindow(QMainWindow):
 				'{}...'.format(self.tr('Se{}ttings').format('&')),
 				self.calendar.open_settings,
 				'Ctrl+Alt+S',
-				icon=qta.icon('mdi.settings')
+				icon='mdi.settings'
 			)
 		)
 		file_menu.addAction(self.create_action(
 			self,
 			'&{}'.format(self.tr('Create shortcut icon...')),
 			self.create_shortcut,
-			icon=qta.icon('mdi.desktop-mac')
+			icon='mdi.desktop-mac'
 		))
 		file_menu.addAction(
 			self.create_action(
 				self, '{}...'.format(self.tr('Backup and Restore')),
 				self.calendar.open_backup_and_restore,
 				'Ctrl+Alt+B',
-				icon=qta.icon('mdi.backup-restore')
+				icon='mdi.backup-restore'
 			)
 		)
 
@@ -237,8 +281,8 @@ class MainWindow(QMainWindow):
 		help_menu.addAction(self.create_action(
 			self, '&{}...'.format(self.tr('Account')),
 			self.calendar.open_account_info,
-			icon=qta.icon('mdi.account-circle')
+			icon='mdi.account-circle'
 		))
 		help_menu.addAction(self.create_action(
-			self, '&{}'.format(self.tr('About')), self.calendar.open_about, icon=qta.icon('mdi.information-outline')
+			self, '&{}'.format(self.tr('About')), self.calendar.open_about, icon='mdi.information-outline'
 		))
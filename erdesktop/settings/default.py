@@ -1,4 +1,5 @@
-from os.path import expanduser
+from os import environ
+from os.path import expanduser, join
 
 from PyQt5.QtCore import QLocale
 
@@ -9,7 +10,14 @@ def abs_path(init_path):
 	return '{}/{}'.format(APP_ROOT, init_path.lstrip('/'))
 
 
-APP_DATA_PATH = abs_path('tmp/')
+# settings, database and logs are kept in the directory given by this
+# environment variable if it is set, e.g. to run benchmarks on temporary data
+APP_DATA_PATH_ENV = 'ERDESKTOP_DATA_PATH'
+
+if APP_DATA_PATH_ENV in environ:
+	APP_DATA_PATH = join(environ[APP_DATA_PATH_ENV], '')
+else:
+	APP_DATA_PATH = abs_path('tmp/')
 
 
 APP_WIDTH = 1024
@@ -35,6 +43,20 @@ APP_ICON_SMALL_ICO = abs_path('png/app-icon-small.ico')
 
 APP_LOG_FILE = '{}application.log'.format(APP_DATA_PATH)
 
+LOG_LEVEL = 'INFO'
+
+# in bytes
+LOG_MAX_BYTES = 1024 * 1024
+
+# in seconds
+LOG_ROTATION_INTERVAL = 7 * 24 * 60 * 60
+
+LOG_BACKUP_COUNT = 5
+
+# records waiting to be written, see BoundedQueueHandler for policies
+LOG_QUEUE_SIZE = 1000
+LOG_QUEUE_POLICY = 'drop_new'
+
 APP_DB_PATH = APP_DATA_PATH
 APP_DB_FILE = '{}storage.db'.format(APP_DATA_PATH)
 
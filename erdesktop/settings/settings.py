@@ -1,48 +1,206 @@
+import os
+import threading
+
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import QSize, QPoint, QSettings
+from PyQt5.QtCore import QObject, QSize, QPoint, QSettings, pyqtSignal
 
 from erdesktop.settings import type_conv as tc
 from erdesktop.settings.default import *
 from erdesktop.settings.theme import dark_theme_palette, light_theme_palette
 
 
+class SettingsSignals(QObject):
+	"""
+	Change notifications of settings. 'changed' is emitted with the key of every
+	changed value, the others with the new value of a single setting.
+	"""
+
+	changed = pyqtSignal(str)
+	font_changed = pyqtSignal(int)
+	theme_changed = pyqtSignal(bool)
+	lang_changed = pyqtSignal(str)
+	max_backups_changed = pyqtSignal(int)
+	remove_event_after_time_up_changed = pyqtSignal(bool)
+	start_in_tray_changed = pyqtSignal(bool)
+	run_with_system_start_changed = pyqtSignal(bool)
+	notification_duration_changed = pyqtSignal(int)
+	remind_time_before_event_changed = pyqtSignal(int)
+	remind_time_unit_changed = pyqtSignal(int)
+	include_settings_backup_changed = pyqtSignal(bool)
+	log_level_changed = pyqtSignal(str)
+
+	KEY_SIGNALS = {
+		'app_user/font': 'font_changed',
+		'app_user/is_dark_theme': 'theme_changed',
+		'app_user/lang': 'lang_changed',
+		'app_user/max_backups': 'max_backups_changed',
+		'app_user/remove_event_after_time_up': 'remove_event_after_time_up_changed',
+		'app_user/start_in_tray': 'start_in_tray_changed',
+		'app_user/run_with_system_start': 'run_with_system_start_changed',
+		'event_user/notification_duration': 'notification_duration_changed',
+		'event_user/remind_time_before_event': 'remind_time_before_event_changed',
+		'event_user/remind_time_unit': 'remind_time_unit_changed',
+		'app_user/include_settings_backup': 'include_settings_backup_changed',
+		'app/log_level': 'log_level_changed'
+	}
+
+	def emit(self, key, value):
+		self.changed.emit(key)
+		name = self.KEY_SIGNALS.get(key)
+		if name is not None:
+			getattr(self, name).emit(value)
+
+
+class SettingsCache:
+	"""
+	Typed values of a settings file which are kept in memory and shared by all
+	Settings objects of that file, so reading a setting does not touch QSettings
+	after the first time.
+
+	Changed values are kept as dirty until 'flush' writes them to the file at
+	once; setting a value equal to the cached one does not make it dirty.
+	Changes are announced by 'signals'.
+	"""
+
+	def __init__(self, settings_file):
+		self.signals = SettingsSignals()
+		self.__settings = QSettings(settings_file, QSettings.IniFormat)
+		self.__values = {}
+		self.__dirty = {}
+		self.__lock = threading.RLock()
+
+	@property
+	def is_dirty(self):
+		return len(self.__dirty) > 0
+
+	def value(self, key, default, conv=None):
+		"""
+		Returns the cached value reading and converting it with 'conv' on a miss.
+		"""
+		try:
+			return self.__values[key]
+		except KeyError:
+			pass
+		with self.__lock:
+			value = self.__settings.value(key, default)
+			if conv is not None:
+				value = conv(value)
+			self.__values[key] = value
+		return value
+
+	def set_value(self, key, value, stored=None):
+		"""
+		Caches 'value' and marks it for writing as 'stored' if it is given.
+		Returns False if the value has not changed.
+		"""
+		with self.__lock:
+			if key in self.__values and self.__values[key] == value:
+				return False
+			self.__values[key] = value
+			self.__dirty[key] = value if stored is None else stored
+		self.signals.emit(key, value)
+		return True
+
+	def flush(self):
+		"""
+		Writes dirty values to the settings file.
+		"""
+		with self.__lock:
+			if not self.__dirty:
+				return
+			dirty, self.__dirty = self.__dirty, {}
+			for key, value in dirty.items():
+				self.__settings.setValue(key, value)
+			self.__settings.sync()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def settings_cache(settings_file=SETTINGS_FILE):
+	"""
+	Returns the cache of a settings file creating it on the first call.
+	"""
+	path = os.path.abspath(settings_file)
+	with _caches_lock:
+		cache = _caches.get(path)
+		if cache is None:
+			cache = _caches[path] = SettingsCache(settings_file)
+		return cache
+
+
 class Settings:
 	"""
 	Implements methods for application settings storage access.
+
+	The application uses one process-wide instance returned by 'shared', other
+	instances are needed only to access a different settings file.
+
+	Values are read from the in-memory cache of the settings file. Setters
+	change the cache and, in autocommit mode, write changes to the file;
+	otherwise changes are written by 'commit'. Changes are announced by
+	'signals', so consumers react to them instead of re-reading values.
 	"""
 
+	__shared = None
+	__shared_lock = threading.Lock()
+
 	def __init__(self, autocommit=True, settings_file=SETTINGS_FILE):
-		self.__settings = QSettings(settings_file, QSettings.IniFormat)
-	# 	self.__is_dark_theme = self.__settings.value('app_user/is_dark_theme', tc.bool_to_str(APP_IS_DARK_THEME))
+		self.__cache = settings_cache(settings_file)
 		self.__autocommit = autocommit
 		self.__remind_time_multiplier = [1, 60, 1440, 10080]
 
+	@classmethod
+	def shared(cls):
+		"""
+		Returns the settings instance of the application creating it on the first call.
+		"""
+		with cls.__shared_lock:
+			if cls.__shared is None:
+				cls.__shared = cls()
+			return cls.__shared
+
+	@property
+	def signals(self):
+		return self.__cache.signals
+
 	def autocommit(self, val: bool):
 		self.__autocommit = val
 
 	def commit(self):
 		self.__autocommit = True
-		self.__settings.sync()
+		self.__cache.flush()
 
 	def _commit(self):
 		if self.__autocommit:
-			self.__settings.sync()
+			self.__cache.flush()
+
+	def _value(self, key, default, conv=None):
+		return self.__cache.value(key, default, conv)
+
+	def _bool_value(self, key, default):
+		return self.__cache.value(key, tc.str_(default), tc.s_bool_)
 
 	@property
 	def app_size(self):
-		return self.__settings.value('app/size', QSize(APP_WIDTH, APP_HEIGHT))
+		return self._value('app/size', QSize(APP_WIDTH, APP_HEIGHT))
 
 	@property
 	def app_pos(self):
-		return self.__settings.value('app/pos', QPoint(APP_POS_X, APP_POS_Y))
+		return self._value('app/pos', QPoint(APP_POS_X, APP_POS_Y))
 
 	@property
 	def app_last_backup_path(self):
-		return self.__settings.value('app/last_backup_path', './')
+		return self._value('app/last_backup_path', './')
 
 	@property
 	def app_last_restore_path(self):
-		return self.__settings.value('app/last_restore_path', '')
+		return self._value('app/last_restore_path', '')
+
+	@property
+	def app_log_level(self):
+		return self._value('app/log_level', LOG_LEVEL, str.upper)
 
 	# noinspection PyMethodMayBeStatic
 	def app_icon(self, is_ico=False, q_icon=True, small=False):
@@ -65,55 +223,54 @@ class Settings:
 
 	@property
 	def is_dark_theme(self):
-		return tc.s_bool_(self.__settings.value('app_user/is_dark_theme', tc.str_(APP_IS_DARK_THEME)))
+		return self._bool_value('app_user/is_dark_theme', APP_IS_DARK_THEME)
 
 	@property
 	def app_font(self):
-		return int(self.__settings.value('app_user/font', FONT))
+		return self._value('app_user/font', FONT, int)
 
 	@property
 	def app_lang(self):
-		return self.__settings.value('app_user/lang', LANG)
+		return self._value('app_user/lang', LANG)
 
 	@property
 	def app_max_backups(self):
-		return int(self.__settings.value('app_user/max_backups', MAX_BACKUPS))
+		return self._value('app_user/max_backups', MAX_BACKUPS, int)
 
 	@property
 	def remove_event_after_time_up(self):
-		return tc.s_bool_(
-			self.__settings.value('app_user/remove_event_after_time_up', tc.str_(REMOVE_EVENT_AFTER_TIME_UP))
-		)
+		return self._bool_value('app_user/remove_event_after_time_up', REMOVE_EVENT_AFTER_TIME_UP)
 
 	@property
 	def start_in_tray(self):
-		return tc.s_bool_(self.__settings.value('app_user/start_in_tray', tc.str_(START_IN_TRAY)))
+		return self._bool_value('app_user/start_in_tray', START_IN_TRAY)
 
 	@property
 	def run_with_system_start(self):
-		return tc.s_bool_(
-			self.__settings.value('app_user/run_with_system_start', tc.str_(RUN_WITH_SYSTEM_START))
-		)
+		return self._bool_value('app_user/run_with_system_start', RUN_WITH_SYSTEM_START)
 
 	@property
 	def notification_duration(self):
-		return int(self.__settings.value('event_user/notification_duration', NOTIFICATION_DURATION))
+		return self._value('event_user/notification_duration', NOTIFICATION_DURATION, int)
 
 	def remind_time_before_event(self, to_minutes=False):
-		remind_time = int(self.__settings.value('event_user/remind_time_before_event', REMIND_TIME))
+		remind_time = self._value('event_user/remind_time_before_event', REMIND_TIME, int)
 		return remind_time if not to_minutes else self._remind_time_to_minutes(remind_time, self.remind_time_unit)
 
 	@property
 	def remind_time_unit(self):
-		return int(self.__settings.value('event_user/remind_time_unit', REMIND_UNIT))
+		return self._value('event_user/remind_time_unit', REMIND_UNIT, int)
 
 	@property
 	def include_settings_backup(self):
-		return tc.s_bool_(self.__settings.value('app_user/include_settings_backup', tc.str_(INCLUDE_SETTINGS_BACKUP)))
+		return self._bool_value('app_user/include_settings_backup', INCLUDE_SETTINGS_BACKUP)
 
-	def _set_value(self, key, value):
-		self.__settings.setValue(key, value)
-		self._commit()
+	def _set_value(self, key, value, stored=None):
+		if self.__cache.set_value(key, value, stored):
+			self._commit()
+
+	def _set_bool_value(self, key, value):
+		self._set_value(key, value, tc.str_(value))
 
 	def set_size(self, size: QSize):
 		self._set_value('app/size', size)
@@ -127,41 +284,44 @@ class Settings:
 	def set_last_restore_path(self, path: str):
 		self._set_value('app/last_restore_path', path)
 
+	def set_log_level(self, level: str):
+		self._set_value('app/log_level', level.upper())
+
 	def set_theme(self, is_dark: bool):
-		self._set_value('app_user/is_dark_theme', tc.str_(is_dark))
+		self._set_bool_value('app_user/is_dark_theme', is_dark)
 
 	def set_is_always_on_top(self, value: bool):
-		self._set_value('app_user/is_always_on_top', tc.str_(value))
+		self._set_bool_value('app_user/is_always_on_top', value)
 
 	def set_font(self, value: int):
-		self._set_value('app_user/font', value)
+		self._set_value('app_user/font', int(value))
 
 	def set_lang(self, value: str):
 		self._set_value('app_user/lang', value)
 
 	def set_max_backups(self, value: int):
-		self._set_value('app_user/max_backups', value)
+		self._set_value('app_user/max_backups', int(value))
 
 	def set_remove_event_after_time_up(self, value: bool):
-		self._set_value('app_user/remove_event_after_time_up', tc.str_(value))
+		self._set_bool_value('app_user/remove_event_after_time_up', value)
 
 	def set_start_in_tray(self, value: bool):
-		self._set_value('app_user/start_in_tray', tc.str_(value))
+		self._set_bool_value('app_user/start_in_tray', value)
 
 	def set_run_with_system_start(self, value: bool):
-		self._set_value('app_user/run_with_system_start', tc.str_(value))
+		self._set_bool_value('app_user/run_with_system_start', value)
 
 	def set_notification_duration(self, value: int):
-		self._set_value('event_user/notification_duration', value)
+		self._set_value('event_user/notification_duration', int(value))
 
 	def set_remind_time_before_event(self, value: int):
-		self._set_value('event_user/remind_time_before_event', value)
+		self._set_value('event_user/remind_time_before_event', int(value))
 
 	def set_remind_time_unit(self, value: int):
-		self._set_value('event_user/remind_time_unit', value)
+		self._set_value('event_user/remind_time_unit', int(value))
 
 	def set_include_settings_backup(self, value: bool):
-		self._set_value('app_user/include_settings_backup', tc.str_(value))
+		self._set_bool_value('app_user/include_settings_backup', value)
 
 	def to_dict(self):
 		return {
@@ -179,6 +339,7 @@ class Settings:
 		}
 
 	def from_dict(self, data):
+		self.autocommit(False)
 		self.set_theme(tc.bool_(
 			data.get('is_dark_theme', tc.int_(APP_IS_DARK_THEME)))
 		)
@@ -0,0 +1,200 @@
+import json
+import zlib
+import struct
+
+from hashlib import sha512
+
+from erdesktop.util.exceptions import DatabaseException
+
+
+class BackupFormat:
+	"""
+	Versioned backup container which is written and read as a stream.
+
+	Layout:
+		MAGIC, format version (unsigned short), then a sequence of frames. Each frame
+		is a frame type (1 byte), payload length (unsigned int) and payload.
+
+	Frames:
+		HEADER    json object: timestamp, names of event fields, settings flag
+		SETTINGS  zlib compressed json object with application settings
+		EVENTS    zlib compressed json list of at most CHUNK_SIZE event rows,
+		          each row is a list of values in order of header's 'fields'
+		END       json object with total number of events
+		DIGEST    sha512 sum of all bytes preceding this frame, always the last one
+
+	Memory usage of both reading and writing is bounded by the size of one chunk.
+	"""
+
+	MAGIC = b'ERBACKUP'
+	VERSION = 2
+
+	HEADER = b'H'
+	SETTINGS = b'S'
+	EVENTS = b'E'
+	END = b'Z'
+	DIGEST = b'D'
+
+	CHUNK_SIZE = 1000
+
+	FIELDS = ['title', 'date', 'time', 'description', 'is_past', 'repeat_weekly', 'is_notified']
+
+	_VERSION_STRUCT = struct.Struct('>H')
+	_FRAME_STRUCT = struct.Struct('>cI')
+
+	@staticmethod
+	def is_backup(file):
+		"""
+		Checks if a binary file has the container format, keeps file position.
+		"""
+		position = file.tell()
+		magic = file.read(len(BackupFormat.MAGIC))
+		file.seek(position)
+		return magic == BackupFormat.MAGIC
+
+
+class BackupWriter(BackupFormat):
+
+	def __init__(self, file, timestamp, include_settings, chunk_size=BackupFormat.CHUNK_SIZE):
+		self.__file = file
+		self.__digest = sha512()
+		self.__chunk = []
+		self.__chunk_size = chunk_size
+		self.events_count = 0
+		self.__write(self.MAGIC + self._VERSION_STRUCT.pack(self.VERSION))
+		self.__write_frame(self.HEADER, json.dumps({
+			'timestamp': timestamp,
+			'fields': self.FIELDS,
+			'contains_settings': include_settings
+		}).encode('utf8'))
+
+	def __write(self, data):
+		self.__digest.update(data)
+		self.__file.write(data)
+
+	def __write_frame(self, frame_type, payload):
+		self.__write(self._FRAME_STRUCT.pack(frame_type, len(payload)))
+		self.__write(payload)
+
+	def __flush_chunk(self):
+		if len(self.__chunk) > 0:
+			self.__write_frame(self.EVENTS, zlib.compress(json.dumps(self.__chunk).encode('utf8')))
+			self.__chunk = []
+
+	def write_settings(self, settings):
+		self.__write_frame(self.SETTINGS, zlib.compress(json.dumps(settings).encode('utf8')))
+
+	def write_event(self, event):
+		"""
+		Writes event given as a dictionary with keys from FIELDS.
+		"""
+		self.write_row([event.get(field) for field in self.FIELDS])
+
+	def write_row(self, row):
+		self.__chunk.append(row)
+		self.events_count += 1
+		if len(self.__chunk) >= self.__chunk_size:
+			self.__flush_chunk()
+
+	def close(self):
+		self.__flush_chunk()
+		self.__write_frame(self.END, json.dumps({'events_count': self.events_count}).encode('utf8'))
+		digest = self.__digest.digest()
+		self.__file.write(self._FRAME_STRUCT.pack(self.DIGEST, len(digest)))
+		self.__file.write(digest)
+
+
+class BackupReader(BackupFormat):
+
+	_err_template = 'Restore failure: {}.'
+
+	def __init__(self, file):
+		self.__file = file
+		self.__start = file.tell()
+		self.timestamp = None
+		self.fields = None
+		self.contains_settings = False
+		self.settings = None
+		self.events_count = None
+
+	def __fail(self, reason):
+		raise DatabaseException(self._err_template.format(reason))
+
+	def __read(self, size, digest):
+		data = self.__file.read(size)
+		if len(data) != size:
+			self.__fail('backup is broken')
+		if digest is not None:
+			digest.update(data)
+		return data
+
+	def __frames(self, digest=None):
+		self.__file.seek(self.__start)
+		if self.__read(len(self.MAGIC), digest) != self.MAGIC:
+			self.__fail('invalid backup file')
+		version = self._VERSION_STRUCT.unpack(self.__read(self._VERSION_STRUCT.size, digest))[0]
+		if version > self.VERSION:
+			self.__fail('unsupported backup version {}'.format(version))
+		while True:
+			frame_header = self.__file.read(self._FRAME_STRUCT.size)
+			if len(frame_header) != self._FRAME_STRUCT.size:
+				self.__fail('backup is broken')
+			frame_type, length = self._FRAME_STRUCT.unpack(frame_header)
+			if frame_type == self.DIGEST:
+				yield frame_type, self.__read(length, None)
+				return
+			if digest is not None:
+				digest.update(frame_header)
+			yield frame_type, self.__read(length, digest)
+
+	@staticmethod
+	def __decode(frame_type, payload):
+		if frame_type in (BackupFormat.SETTINGS, BackupFormat.EVENTS):
+			payload = zlib.decompress(payload)
+		return json.loads(payload.decode('utf8'))
+
+	def verify(self):
+		"""
+		Reads the whole container checking its digest and structure, loads
+		header, settings and number of events. Event chunks are not kept.
+		"""
+		digest = sha512()
+		events_count = 0
+		for frame_type, payload in self.__frames(digest):
+			if frame_type == self.DIGEST:
+				if payload != digest.digest():
+					self.__fail('backup is broken')
+				break
+			try:
+				data = self.__decode(frame_type, payload)
+			except (zlib.error, ValueError):
+				self.__fail('backup is broken')
+			if frame_type == self.HEADER:
+				self.timestamp = data.get('timestamp')
+				self.fields = data.get('fields')
+				self.contains_settings = data.get('contains_settings', False)
+			elif frame_type == self.SETTINGS:
+				self.settings = data
+			elif frame_type == self.EVENTS:
+				events_count += len(data)
+			elif frame_type == self.END:
+				self.events_count = data.get('events_count')
+		if self.timestamp is None or self.fields is None or self.events_count != events_count:
+			self.__fail('invalid backup data')
+		return self
+
+	def chunks(self):
+		"""
+		Yields lists of event rows, values are ordered as 'fields'.
+		"""
+		for frame_type, payload in self.__frames():
+			if frame_type == self.EVENTS:
+				yield self.__decode(frame_type, payload)
+
+	def events(self):
+		"""
+		Yields events as dictionaries.
+		"""
+		for chunk in self.chunks():
+			for row in chunk:
+				yield dict(zip(self.fields, row))
@@ -1,19 +1,57 @@
 from datetime import datetime, timedelta
 
+from erdesktop.storage.recurrence import ONE_DAY, recurrence_of
+from erdesktop.storage.converters import to_date, to_time, parse_date, parse_time, adapt_date_time
+
 from erdesktop.storage.sql import (
 	QUERY_INSERT_EVENT,
+	QUERY_UPSERT_EVENT,
 	QUERY_UPDATE_EVENT,
+	QUERY_UPDATE_EVENT_COLUMNS,
+	QUERY_RETURNING_EVENT,
+	SQLITE_HAS_RETURNING,
 	QUERY_SELECT_EVENTS_BY,
+	QUERY_SEARCH_EVENTS,
+	QUERY_LIKE_EVENTS,
+	QUERY_LIKE_EVENTS_CONDITION,
+	QUERY_HAS_EVENTS_FTS,
 	QUERY_DELETE_EVENT_BY_ID,
-	QUERY_CREATE_EVENT_TABLE
+	QUERY_DELETE_EVENTS_BY_IDS,
+	QUERY_SELECT_PENDING_EVENTS,
+	EVENTS_DATE_TIME_EXPR,
+	QUERY_SELECT_DATE_AGGREGATES,
+	QUERY_SELECT_RECURRING_EVENTS,
+	QUERY_SELECT_EVENT_ROWS,
+	QUERY_SELECT_CHANGES_SINCE,
+	QUERY_SELECT_LAST_CHANGE_SEQ,
+	QUERY_GET_SCHEMA_VERSION,
+	QUERY_SET_SCHEMA_VERSION,
+	SCHEMA_MIGRATIONS
 )
 
 
 class EventModel:
 	"""
 	Represents event in database.
+
+	Models are slotted. The database returns typed dates and times if it is
+	connected with 'detect_types', see 'erdesktop.storage.converters'; text
+	values, e.g. from backups, are kept as they are and parsed on the first access
+	of 'date' or 'time'. Code which does not need models, e.g. backups, works on
+	raw rows instead.
+
+	A repeating event is stored once with the date of its next pending
+	occurrence, following occurrences are expanded by its 'recurrence' rule when
+	a date range is read, see 'erdesktop.storage.recurrence'. Models of expanded
+	occurrences have the id of the stored event and its date in 'occurrence_of',
+	which is None for stored events, so changing an occurrence changes the
+	whole series.
 	"""
 
+	__slots__ = (
+		'id', 'title', '_date', '_time', 'description', 'is_past', 'repeat_weekly', 'is_notified', 'occurrence_of'
+	)
+
 	DATE_FORMAT = '%Y-%m-%d'
 	TIME_FORMAT = '%H:%M:%S'
 	TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
@@ -22,29 +60,64 @@ class EventModel:
 	def __init__(self, fields):
 		if isinstance(fields, dict):
 			fields = self.to_tuple(fields)
-		elif isinstance(fields, tuple) and len(fields) != 8:
-			fields = (None,) + fields
+		elif len(fields) == 6:
+			fields = (None,) + tuple(fields) + (0,)
+		elif len(fields) == 7:
+			fields = tuple(fields) + (0,)
 		self.id = fields[0]
 		self.title = fields[1]
-
-		date = fields[2]
-		if isinstance(date, str):
-			self.date = datetime.strptime(date, self.DATE_FORMAT).date()
-		else:
-			self.date = date
-
+		self._date = fields[2]
 		time = fields[3]
-		if isinstance(date, str):
-			last_dot = time.rfind('.')
-			if last_dot != -1:
-				time = time[:last_dot]
-			self.time = datetime.strptime(time, self.TIME_FORMAT).time()
-		else:
-			self.time = time.replace(microsecond=0)
+		if time is not None and not isinstance(time, (str, int)):
+			time = time.replace(microsecond=0)
+		self._time = time
 		self.description = fields[4]
-		self.is_past = True if fields[5] == 1 else False
-		self.repeat_weekly = True if fields[6] == 1 else False
+		self.is_past = fields[5] == 1
+		self.repeat_weekly = fields[6] == 1
 		self.is_notified = fields[7]
+		self.occurrence_of = None
+
+	@property
+	def date(self):
+		if isinstance(self._date, (str, int)):
+			self._date = to_date(self._date)
+		return self._date
+
+	@date.setter
+	def date(self, value):
+		self._date = value
+
+	@property
+	def time(self):
+		if isinstance(self._time, (str, int)):
+			self._time = to_time(self._time)
+		return self._time
+
+	@time.setter
+	def time(self, value):
+		self._time = value
+
+	@property
+	def recurrence(self):
+		return recurrence_of(self.repeat_weekly)
+
+	def occurrence(self, day):
+		"""
+		Returns a model of a following occurrence of the event on 'day'.
+		"""
+		occurrence = EventModel((
+			self.id, self.title, day, self._time, self.description, False, self.repeat_weekly, 0
+		))
+		occurrence.occurrence_of = self.date
+		return occurrence
+
+	@property
+	def series_date(self):
+		"""
+		Date which is stored for the event, for an occurrence the date of the
+		stored repeating event.
+		"""
+		return self.occurrence_of if self.occurrence_of is not None else self.date
 
 	@staticmethod
 	def to_tuple(fields: dict):
@@ -62,21 +135,88 @@ class EventModel:
 	def to_dict(self):
 		return {
 			'title': self.title,
-			'date': self.date.strftime(self.DATE_FORMAT),
-			'time': self.time.strftime(self.TIME_FORMAT),
+			'date': self.format_date(self._date),
+			'time': self.format_time(self._time),
 			'description': self.description,
 			'is_past': 1 if self.is_past is True else 0,
 			'repeat_weekly': 1 if self.repeat_weekly is True else 0,
 			'is_notified': self.is_notified
 		}
 
+	@staticmethod
+	def format_date(value):
+		return value if isinstance(value, str) else to_date(value).strftime(EventModel.DATE_FORMAT)
+
+	@staticmethod
+	def format_time(value):
+		return value[:8] if isinstance(value, str) else to_time(value).strftime(EventModel.TIME_FORMAT)
+
+	@staticmethod
+	def row_to_dict(row, with_id=False):
+		"""
+		Converts a raw row of the events table to a dictionary equal to the one made
+		by 'to_dict' without constructing a model.
+		"""
+		data = {
+			'title': row[1],
+			'date': EventModel.format_date(row[2]),
+			'time': EventModel.format_time(row[3]),
+			'description': row[4],
+			'is_past': 1 if row[5] == 1 else 0,
+			'repeat_weekly': 1 if row[6] == 1 else 0,
+			'is_notified': row[7]
+		}
+		if with_id:
+			data['id'] = row[0]
+		return data
+
+	@staticmethod
+	def dict_to_params(data):
+		"""
+		Converts a dictionary made by 'to_dict' to parameters of the insert query
+		without constructing a model.
+		"""
+		date = data.get('date', None)
+		time = data.get('time', None)
+		return (
+			data.get('title', None),
+			parse_date(date) if isinstance(date, str) else date,
+			parse_time(time) if isinstance(time, str) else time,
+			data.get('description', None),
+			1 if data.get('is_past', None) == 1 else 0,
+			1 if data.get('repeat_weekly', None) == 1 else 0
+		)
+
+	@staticmethod
+	def dict_to_upsert_params(data):
+		"""
+		Converts a dictionary made by 'to_dict' with an additional 'id' key to
+		parameters of the upsert query, which keeps the primary key and notification
+		state of the event.
+		"""
+		return (data.get('id', None),) + EventModel.dict_to_params(data) + (
+			1 if data.get('is_notified', None) == 1 else 0,
+		)
+
 	@staticmethod
 	def from_dict(data):
 		return EventModel(EventModel.to_tuple(data))
 
+	SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
 	@staticmethod
 	def create_table(cursor):
-		cursor.execute(QUERY_CREATE_EVENT_TABLE)
+		"""
+		Creates the table or upgrades its schema to the latest version applying
+		migrations which were not applied yet.
+		"""
+		version = cursor.execute(QUERY_GET_SCHEMA_VERSION).fetchone()[0]
+		for migration in SCHEMA_MIGRATIONS[version:]:
+			for query in migration:
+				cursor.execute(query)
+			version += 1
+			cursor.execute(QUERY_SET_SCHEMA_VERSION.format(version))
+		cursor.connection.commit()
 
 	@staticmethod
 	def get(cursor, pk):
@@ -89,20 +229,28 @@ class EventModel:
 	def insert(cursor, model):
 		cursor.execute(QUERY_INSERT_EVENT, (
 			model.title,
-			model.date.strftime(EventModel.DATE_FORMAT),
-			model.time.strftime(EventModel.TIME_FORMAT),
+			model.date,
+			model.time,
 			model.description,
 			model.is_past,
 			model.repeat_weekly
 		))
 		return cursor.lastrowid
 
+	@staticmethod
+	def insert_many(cursor, params):
+		cursor.executemany(QUERY_INSERT_EVENT, params)
+
+	@staticmethod
+	def upsert_many(cursor, params):
+		cursor.executemany(QUERY_UPSERT_EVENT, params)
+
 	@staticmethod
 	def update(cursor, model):
 		cursor.execute(QUERY_UPDATE_EVENT, (
 			model.title,
-			model.date.strftime(EventModel.DATE_FORMAT),
-			model.time.strftime(EventModel.TIME_FORMAT),
+			model.date,
+			model.time,
 			model.description,
 			model.is_past,
 			model.repeat_weekly,
@@ -111,34 +259,249 @@ class EventModel:
 		))
 		return model.id
 
+	# Texts of partial update queries keyed by updated columns and whether the
+	# past flag is refreshed, made on the first use.
+	UPDATE_QUERIES = {}
+
+	@staticmethod
+	def update_query(columns, refresh_past):
+		key = (columns, refresh_past)
+		query = EventModel.UPDATE_QUERIES.get(key)
+		if query is None:
+			assignments = ['{} = ?'.format(column) for column in columns]
+			if refresh_past:
+				assignments.append('is_past = CASE WHEN date >= ? THEN 0 ELSE is_past END')
+			query = QUERY_UPDATE_EVENT_COLUMNS.format(
+				', '.join(assignments), QUERY_RETURNING_EVENT if SQLITE_HAS_RETURNING else ''
+			)
+			EventModel.UPDATE_QUERIES[key] = query
+		return query
+
+	@staticmethod
+	def update_columns(cursor, pk, values, today=None):
+		"""
+		Updates only columns given in 'values' dictionary with a single statement and
+		returns the updated model, or None if the event does not exist. If 'today'
+		is given, the event is marked as not past when its date is not before it.
+		"""
+		columns = tuple(sorted(values))
+		params = [values[column] for column in columns]
+		if today is not None:
+			params.append(today)
+		params.append(pk)
+		query = EventModel.update_query(columns, today is not None)
+		if SQLITE_HAS_RETURNING:
+			rows = cursor.execute(query, params).fetchall()
+			return EventModel(rows[0]) if len(rows) > 0 else None
+		if cursor.execute(query, params).rowcount > 0:
+			return EventModel.get(cursor, pk)
+		return None
+
 	@staticmethod
 	def delete(cursor, pk):
-		if EventModel.get(cursor, pk) is not None:
-			cursor.execute(QUERY_DELETE_EVENT_BY_ID, (pk,))
-			return True
-		return False
+		return cursor.execute(QUERY_DELETE_EVENT_BY_ID, (pk,)).rowcount > 0
+
+	# Keys are deleted in batches of a fixed size, the last one is padded with
+	# NULLs, so a single query text is used for any number of keys.
+	DELETE_BATCH_SIZE = 500
+	DELETE_MANY_QUERY = QUERY_DELETE_EVENTS_BY_IDS.format(', '.join(['?'] * DELETE_BATCH_SIZE))
+
+	@staticmethod
+	def delete_many(cursor, pks):
+		"""
+		Deletes events by primary keys, missing ones are skipped. Returns the number
+		of deleted events.
+		"""
+		pks = list(pks)
+		size = EventModel.DELETE_BATCH_SIZE
+		deleted = 0
+		for start in range(0, len(pks), size):
+			batch = pks[start:start + size]
+			batch += [None] * (size - len(batch))
+			deleted += cursor.execute(EventModel.DELETE_MANY_QUERY, batch).rowcount
+		return deleted
+
+	# Parameterized select queries keyed by present filters (date, date and time
+	# window, time). The set of texts is fixed, so every shape is parsed once and
+	# then reused from the statement cache of the connection. Windows are also
+	# bounded by dates to use the date index.
+	SELECT_QUERIES = {
+		(False, False, False): QUERY_SELECT_EVENTS_BY.format(''),
+		(True, False, False): QUERY_SELECT_EVENTS_BY.format('WHERE date = ?'),
+		(True, True, False): QUERY_SELECT_EVENTS_BY.format(
+			'WHERE date BETWEEN ? AND ? AND {} BETWEEN ? AND ?'.format(EVENTS_DATE_TIME_EXPR)
+		),
+		(False, False, True): QUERY_SELECT_EVENTS_BY.format('WHERE time = ?'),
+		(True, False, True): QUERY_SELECT_EVENTS_BY.format('WHERE date = ? AND time = ?'),
+	}
+	SELECT_QUERIES[(True, True, True)] = SELECT_QUERIES[(True, True, False)]
+
+	@staticmethod
+	def select_rows(cursor, date=None, time=None, delta=None):
+		"""
+		Selects raw rows of events by date and time. If 'delta' is given with 'date', selects
+		events within 'delta' minutes starting from 'date' and 'time', or from the
+		beginning of the day if 'time' is not set.
+		"""
+		if date is not None and delta is not None:
+			start = datetime.combine(date, time if time is not None else datetime.min.time())
+			end = start + timedelta(minutes=delta)
+			params = (start.date(), end.date(), adapt_date_time(start), adapt_date_time(end))
+		else:
+			params = []
+			if date is not None:
+				params.append(date)
+			if time is not None:
+				params.append(time.replace(microsecond=0))
+		query = EventModel.SELECT_QUERIES[(date is not None, date is not None and delta is not None, time is not None)]
+		return cursor.execute(query, params).fetchall()
 
 	@staticmethod
 	def select(cursor, date=None, time=None, delta=None):
-		condition = ''
-		if date is not None:
-			condition += '(date '
-			if delta is not None:
-				condition += 'BETWEEN \'{}\' AND \'{}\')'.format(
-					date.strftime(EventModel.DATE_FORMAT),
-					(date + timedelta(minutes=delta)).strftime(EventModel.DATE_FORMAT)
-				)
+		return [EventModel(item) for item in EventModel.select_rows(cursor, date, time, delta)]
+
+	@staticmethod
+	def to_fts_query(text):
+		"""
+		Converts text typed by a user to a full-text query which matches events
+		containing words starting with each of its words. Returns None if the text
+		has no words.
+		"""
+		words = text.split()
+		if len(words) == 0:
+			return None
+		return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+	@staticmethod
+	def to_like_patterns(text):
+		"""
+		Converts text typed by a user to LIKE patterns matching texts which contain
+		each of its words, wildcards in words are escaped.
+		"""
+		return ['%{}%'.format(word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')) for word in text.split()]
+
+	@staticmethod
+	def has_full_text_index(cursor):
+		return cursor.execute(QUERY_HAS_EVENTS_FTS).fetchone()[0] > 0
+
+	@staticmethod
+	def search(cursor, text, limit, offset=0, full_text=True):
+		"""
+		Returns at most 'limit' events matching 'text' in titles or descriptions
+		ordered by relevance, skipping the first 'offset' ones.
+
+		If 'full_text' is False, the full-text index is not used: events containing
+		each word of 'text' are returned ordered by date and time.
+		"""
+		if not full_text:
+			patterns = EventModel.to_like_patterns(text)
+			if len(patterns) == 0:
+				return []
+			query = QUERY_LIKE_EVENTS.format(' AND '.join([QUERY_LIKE_EVENTS_CONDITION] * len(patterns)))
+			params = [pattern for pattern in patterns for _ in range(2)] + [limit, offset]
+			return [EventModel(item) for item in cursor.execute(query, params).fetchall()]
+		query = EventModel.to_fts_query(text)
+		if query is None:
+			return []
+		return [EventModel(item) for item in cursor.execute(QUERY_SEARCH_EVENTS, (query, limit, offset)).fetchall()]
+
+	@staticmethod
+	def __pending_tuples(query_result):
+		return [(
+			item[0],
+			datetime.combine(to_date(item[1]), to_time(item[2])),
+			item[3]
+		) for item in query_result]
+
+	@staticmethod
+	def select_pending(cursor, pk=None):
+		"""
+		Returns (id, datetime, is_notified) tuples of events which are not past yet
+		without constructing full models.
+		"""
+		if pk is not None:
+			query_result = cursor.execute(QUERY_SELECT_PENDING_EVENTS.format('AND id = ?'), (pk,)).fetchall()
+		else:
+			query_result = cursor.execute(QUERY_SELECT_PENDING_EVENTS.format('')).fetchall()
+		return EventModel.__pending_tuples(query_result)
+
+	SELECT_DUE_QUERY = QUERY_SELECT_PENDING_EVENTS.format('AND {} <= ?'.format(EVENTS_DATE_TIME_EXPR))
+
+	@staticmethod
+	def select_due(cursor, until):
+		"""
+		Returns (id, datetime, is_notified) tuples of events which are not past yet
+		and are due not later than 'until', overdue ones included.
+		"""
+		query_result = cursor.execute(EventModel.SELECT_DUE_QUERY, (adapt_date_time(until),)).fetchall()
+		return EventModel.__pending_tuples(query_result)
+
+	@staticmethod
+	def select_date_aggregates(cursor, start_date, end_date):
+		"""
+		Returns (date, count, has_past) tuples ordered by date for each date between
+		'start_date' and 'end_date' inclusively which has at least one event or an
+		occurrence of a repeating event.
+		"""
+		aggregates = {
+			to_date(item[0]): [item[1], item[2] == 1]
+			for item in cursor.execute(QUERY_SELECT_DATE_AGGREGATES, (start_date, end_date)).fetchall()
+		}
+		for item in cursor.execute(QUERY_SELECT_RECURRING_EVENTS, (end_date,)).fetchall():
+			start = to_date(item[2])
+			for day in recurrence_of(item[6]).occurrences(start, max(start_date, start + ONE_DAY), end_date):
+				aggregates.setdefault(day, [0, False])[0] += 1
+		return [(day, count, has_past) for day, (count, has_past) in sorted(aggregates.items())]
+
+	@staticmethod
+	def select_day(cursor, day):
+		"""
+		Returns events of 'day' and following occurrences of repeating events which
+		fall on it ordered by time.
+		"""
+		events = EventModel.select(cursor, day)
+		repeats = []
+		for item in cursor.execute(QUERY_SELECT_RECURRING_EVENTS, (day,)).fetchall():
+			event = EventModel(item)
+			if event.recurrence.first_on_or_after(event.date, day) == day:
+				repeats.append(event.occurrence(day))
+		if len(repeats) > 0:
+			events = sorted(events + repeats, key=lambda x: x.time)
+		return events
+
+	@staticmethod
+	def iterate_rows(cursor, size=1000):
+		"""
+		Lazily yields raw (title, date, time, description, is_past, repeat_weekly,
+		is_notified) rows with date and time in text formats fetching at most 'size'
+		rows at a time.
+		"""
+		format_date, format_time = EventModel.format_date, EventModel.format_time
+		cursor.execute(QUERY_SELECT_EVENT_ROWS)
+		rows = cursor.fetchmany(size)
+		while len(rows) > 0:
+			for row in rows:
+				yield (row[0], format_date(row[1]), format_time(row[2])) + row[3:]
+			rows = cursor.fetchmany(size)
+
+	@staticmethod
+	def select_changes(cursor, seq):
+		"""
+		Returns a (events, deleted) pair of events changed after the change sequence
+		number 'seq': dictionaries made by 'to_dict' with an additional 'id' key and
+		primary keys of deleted events.
+		"""
+		events, deleted = [], []
+		for item in cursor.execute(QUERY_SELECT_CHANGES_SINCE, (seq,)).fetchall():
+			if item[1] == 1:
+				deleted.append(item[0])
 			else:
-				condition += '= \'{}\')'.format(date.strftime(EventModel.DATE_FORMAT))
-		if time is not None:
-			time_condition = 'time = \'{}\''.format(time.strftime(EventModel.TIME_FORMAT))
-			if condition != '':
-				condition += ' AND '
-			condition += time_condition
-		if condition != '':
-			condition = 'WHERE ' + condition
-		query_result = cursor.execute(QUERY_SELECT_EVENTS_BY.format(condition)).fetchall()
-		return [EventModel(item) for item in query_result]
+				events.append(EventModel.row_to_dict((item[0],) + item[2:], with_id=True))
+		return events, deleted
+
+	@staticmethod
+	def last_change_seq(cursor):
+		return cursor.execute(QUERY_SELECT_LAST_CHANGE_SEQ).fetchone()[0]
 
 	def expired(self, now):
 		return now >= datetime.combine(self.date, self.time)
@@ -0,0 +1,186 @@
+import time
+import sqlite3
+import threading
+
+from erdesktop.storage.sql import CONNECTION_PRAGMAS, QUERY_SET_PRAGMA, QUERY_CHECK_CONNECTION
+from erdesktop.util.exceptions import DatabaseException
+
+
+class PooledConnection:
+	"""
+	Connection of a single thread with its cursor and state of the transaction
+	which is open in that thread.
+	"""
+
+	__slots__ = ('db', 'cursor', 'thread', 'transaction_depth', 'changed', 'last_used')
+
+	def __init__(self, db, thread):
+		self.db = db
+		self.cursor = db.cursor()
+		self.thread = thread
+		self.transaction_depth = 0
+		self.changed = []
+		self.last_used = time.monotonic()
+
+	@property
+	def is_open(self):
+		return self.db is not None
+
+	def close(self):
+		"""
+		Closes the connection, errors of a broken connection are ignored.
+		"""
+		if self.db is not None:
+			try:
+				self.cursor.close()
+				self.db.close()
+			except sqlite3.Error:
+				pass
+			self.db = None
+			self.cursor = None
+
+
+class ConnectionPool:
+	"""
+	Keeps a separate connection to the database for every thread which uses it,
+	so cursors and transactions are never shared between threads. A connection
+	is opened on the first use in a thread and is closed with the pool.
+
+	Connections are kept by the thread identifier rather than in thread-local
+	storage: Python forgets thread-local values of threads which it did not
+	start, e.g. of QThreadPool, after every runnable, while the identifier stays
+	the same for the lifetime of the thread. Connections of Python threads which
+	have finished are closed when another connection is opened, a thread which
+	gets the identifier of a finished one takes over its connection.
+
+	Python cannot tell when threads which it did not start finish, they look
+	alive until the process exits. So connections which were not used for
+	'idle_timeout' seconds outside of a transaction are closed as well when
+	another connection is opened, e.g. connections of QThreadPool threads which
+	have expired. A thread opens a new connection if it needs one again.
+
+	Databases are switched to WAL journal mode, in which readers do not wait for
+	a writer and see the last committed state, while a writer waits for another
+	one at most 'timeout' seconds.
+
+	Connections are reused while they are healthy. After an error 'recover'
+	checks the connection of the calling thread and closes it if it is broken,
+	so the next use opens a new one. 'opened' and 'failed' count connections
+	which were opened and replaced after failures during the pool's lifetime.
+	"""
+
+	def __init__(self, db_file, timeout=5.0, idle_timeout=60.0):
+		self.__db_file = db_file
+		self.__timeout = timeout
+		self.__idle_timeout = idle_timeout
+		self.__connections = {}
+		self.__lock = threading.Lock()
+		self.is_open = False
+		self.opened = 0
+		self.failed = 0
+
+	@property
+	def size(self):
+		"""
+		Number of open connections.
+		"""
+		with self.__lock:
+			return len([x for x in self.__connections.values() if x.is_open])
+
+	def open(self):
+		self.is_open = True
+
+	def connect(self):
+		"""
+		Opens a new connection of the calling thread closing its previous one.
+		"""
+		self.release()
+		db = sqlite3.connect(
+			self.__db_file, timeout=self.__timeout, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+		)
+		for name, value in CONNECTION_PRAGMAS.items():
+			db.execute(QUERY_SET_PRAGMA.format(name, value))
+		connection = PooledConnection(db, threading.current_thread())
+		with self.__lock:
+			self.__close_finished()
+			self.__connections[threading.get_ident()] = connection
+			self.opened += 1
+		return connection
+
+	def __close_finished(self):
+		idle_since = time.monotonic() - self.__idle_timeout
+		for ident, connection in list(self.__connections.items()):
+			is_idle = connection.transaction_depth == 0 and connection.last_used < idle_since
+			if is_idle or not connection.thread.is_alive():
+				connection.close()
+				del self.__connections[ident]
+
+	def __connection(self):
+		"""
+		Returns the connection of the calling thread or None.
+		"""
+		with self.__lock:
+			connection = self.__connections.get(threading.get_ident())
+			if connection is not None:
+				connection.last_used = time.monotonic()
+				# the identifier of a finished thread may be given to the calling one
+				connection.thread = threading.current_thread()
+		return connection
+
+	def get(self):
+		"""
+		Returns the connection of the calling thread opening it if needed.
+		"""
+		if not self.is_open:
+			raise DatabaseException('Connection failure: connect to the database first')
+		connection = self.__connection()
+		if connection is None or not connection.is_open:
+			connection = self.connect()
+		return connection
+
+	def recover(self):
+		"""
+		Checks the connection of the calling thread after an error and closes it if
+		it does not respond. Returns True if the connection was closed.
+		"""
+		connection = self.__connection()
+		if connection is None or not connection.is_open:
+			return False
+		try:
+			connection.db.execute(QUERY_CHECK_CONNECTION).fetchall()
+			return False
+		except sqlite3.Error:
+			with self.__lock:
+				self.failed += 1
+			self.release()
+			return True
+
+	def stats(self):
+		"""
+		Returns numbers of currently open, ever opened and failed connections.
+		"""
+		return {
+			'open': self.size,
+			'opened': self.opened,
+			'failed': self.failed
+		}
+
+	def release(self):
+		"""
+		Closes the connection of the calling thread.
+		"""
+		with self.__lock:
+			connection = self.__connections.pop(threading.get_ident(), None)
+		if connection is not None:
+			connection.close()
+
+	def close(self):
+		"""
+		Closes connections of all threads.
+		"""
+		self.is_open = False
+		with self.__lock:
+			connections = list(self.__connections.values())
+			self.__connections.clear()
+		for connection in connections:
+			connection.close()
@@ -0,0 +1,65 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+ONE_DAY = timedelta(days=1)
+
+
+class Recurrence(ABC):
+	"""
+	Rule of repeating an event. Occurrences are computed from the date of the
+	first one, 'start', and are never stored; the events table keeps only the
+	date of the next pending occurrence and the rule.
+
+	Subclasses implement 'first_on_or_after' in constant time, everything else
+	is built on it.
+	"""
+
+	@abstractmethod
+	def first_on_or_after(self, start, day):
+		"""
+		Returns the date of the first occurrence not before 'day'.
+		"""
+
+	def next_after(self, start, moment):
+		"""
+		Returns date and time of the first occurrence later than 'moment' of an
+		event which first occurs at datetime 'start'.
+		"""
+		day = self.first_on_or_after(start.date(), max(start.date(), moment.date()))
+		if datetime.combine(day, start.time()) <= moment:
+			day = self.first_on_or_after(start.date(), day + ONE_DAY)
+		return datetime.combine(day, start.time())
+
+	def occurrences(self, start, first, last):
+		"""
+		Lazily yields dates of occurrences between 'first' and 'last' inclusively.
+		"""
+		day = self.first_on_or_after(start, max(start, first))
+		while day <= last:
+			yield day
+			day = self.first_on_or_after(start, day + ONE_DAY)
+
+
+class IntervalRecurrence(Recurrence):
+	"""
+	Repeats an event every 'days' days.
+	"""
+
+	def __init__(self, days):
+		self.days = days
+
+	def first_on_or_after(self, start, day):
+		if day <= start:
+			return start
+		return start + timedelta(days=-(-(day - start).days // self.days) * self.days)
+
+
+WEEKLY = IntervalRecurrence(7)
+
+
+def recurrence_of(repeat_weekly):
+	"""
+	Returns the rule stored for an event, the events table stores only the
+	'repeat_weekly' flag.
+	"""
+	return WEEKLY if repeat_weekly else None
@@ -1,3 +1,5 @@
+import sqlite3
+
 # noinspection SqlDialectInspection,SqlNoDataSourceInspection
 QUERY_CREATE_EVENT_TABLE = """
 CREATE TABLE IF NOT EXISTS Events (
@@ -12,6 +14,298 @@ CREATE TABLE IF NOT EXISTS Events (
 );
 """
 
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_DATE_TIME_INDEX = """
+CREATE INDEX IF NOT EXISTS EventsDateTimeIdx ON Events (date, time);
+"""
+
+# Dates are stored as ordinal days and times as seconds since midnight, see
+# 'erdesktop.storage.converters'. This is date and time of an event as one
+# sortable number of seconds.
+EVENTS_DATE_TIME_EXPR = '(date * 86400 + time)'
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_DUE_INDEX = """
+CREATE INDEX IF NOT EXISTS EventsDueIdx ON Events ({}, date, time, is_notified) WHERE is_past = 0;
+""".format(EVENTS_DATE_TIME_EXPR)
+
+# Repeating events are few, the index lets expanding their occurrences skip
+# all other events.
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_RECURRING_INDEX = """
+CREATE INDEX IF NOT EXISTS EventsRecurringIdx ON Events (date) WHERE repeat_weekly = 1;
+"""
+
+# Converts 'YYYY-MM-DD' text to an ordinal day, julian day 1721424.5 is day 0.
+_TEXT_DATE_TO_ORDINAL = 'CAST(julianday({0}) - 1721424.5 AS INTEGER)'
+
+# Converts 'HH:MM:SS[.ffffff]' text to seconds since midnight.
+_TEXT_TIME_TO_SECONDS = (
+	'(CAST(substr({0}, 1, 2) AS INTEGER) * 3600 + '
+	'CAST(substr({0}, 4, 2) AS INTEGER) * 60 + '
+	'CAST(substr({0}, 7, 2) AS INTEGER))'
+)
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_ENCODE_TEXT_DATES = """
+UPDATE Events SET date = {}, time = {} WHERE typeof(date) = 'text' OR typeof(time) = 'text';
+""".format(
+	_TEXT_DATE_TO_ORDINAL.format('date'),
+	_TEXT_TIME_TO_SECONDS.format('time')
+)
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_ENCODE_INSERT_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS EventsEncodeInsertTrg AFTER INSERT ON Events
+  WHEN typeof(NEW.date) = 'text' OR typeof(NEW.time) = 'text' BEGIN
+  UPDATE Events SET date = {}, time = {} WHERE id = NEW.id;
+END;
+""".format(
+	_TEXT_DATE_TO_ORDINAL.format('NEW.date'),
+	_TEXT_TIME_TO_SECONDS.format('NEW.time')
+)
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_ENCODE_UPDATE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS EventsEncodeUpdateTrg AFTER UPDATE OF date, time ON Events
+  WHEN typeof(NEW.date) = 'text' OR typeof(NEW.time) = 'text' BEGIN
+  UPDATE Events SET date = {}, time = {} WHERE id = NEW.id;
+END;
+""".format(
+	_TEXT_DATE_TO_ORDINAL.format('NEW.date'),
+	_TEXT_TIME_TO_SECONDS.format('NEW.time')
+)
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENT_CHANGES_TABLE = """
+CREATE TABLE IF NOT EXISTS EventChanges (
+  seq               INTEGER      NOT NULL PRIMARY KEY AUTOINCREMENT,
+  id                INTEGER      NOT NULL UNIQUE,
+  deleted           INTEGER      NOT NULL
+);
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_METADATA_TABLE = """
+CREATE TABLE IF NOT EXISTS Metadata (
+  key               VARCHAR(100) NOT NULL PRIMARY KEY,
+  value             TEXT
+);
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_INSERT_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS EventsInsertTrg AFTER INSERT ON Events BEGIN
+  INSERT OR REPLACE INTO EventChanges (id, deleted) VALUES (NEW.id, 0);
+END;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_UPDATE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS EventsUpdateTrg AFTER UPDATE ON Events BEGIN
+  INSERT OR REPLACE INTO EventChanges (id, deleted) VALUES (NEW.id, 0);
+END;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_DELETE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS EventsDeleteTrg AFTER DELETE ON Events BEGIN
+  INSERT OR REPLACE INTO EventChanges (id, deleted) VALUES (OLD.id, 1);
+END;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_TRACK_ALL_EVENTS = """
+INSERT OR REPLACE INTO EventChanges (id, deleted) SELECT id, 0 FROM Events;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_GET_SCHEMA_VERSION = """
+PRAGMA user_version;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SET_SCHEMA_VERSION = """
+PRAGMA user_version = {};
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_DROP_INDEX = """
+DROP INDEX IF EXISTS {};
+"""
+
+# Indexes of the latest schema version, they are dropped and recreated during bulk loads.
+EVENTS_INDEXES = {
+	'EventsDateTimeIdx': QUERY_CREATE_EVENTS_DATE_TIME_INDEX,
+	'EventsDueIdx': QUERY_CREATE_EVENTS_DUE_INDEX,
+	'EventsRecurringIdx': QUERY_CREATE_EVENTS_RECURRING_INDEX
+}
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS {};
+"""
+
+# Triggers which record changes of events, they are dropped while the whole table is replaced.
+EVENTS_TRIGGERS = {
+	'EventsInsertTrg': QUERY_CREATE_EVENTS_INSERT_TRIGGER,
+	'EventsUpdateTrg': QUERY_CREATE_EVENTS_UPDATE_TRIGGER,
+	'EventsDeleteTrg': QUERY_CREATE_EVENTS_DELETE_TRIGGER
+}
+
+# Full-text index of titles and descriptions. It is an external content table,
+# which stores only the index and reads texts from Events, kept in sync by
+# triggers. Titles and descriptions are tokenized case and diacritics
+# insensitively, prefixes of 2 and 3 characters are indexed to speed up prefix
+# queries.
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS EventsFts USING fts5(
+  title, description, content='Events', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_FTS_INSERT_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS EventsFtsInsertTrg AFTER INSERT ON Events BEGIN
+  INSERT INTO EventsFts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+END;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_FTS_UPDATE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS EventsFtsUpdateTrg AFTER UPDATE OF title, description ON Events BEGIN
+  INSERT INTO EventsFts (EventsFts, rowid, title, description) VALUES ('delete', OLD.id, OLD.title, OLD.description);
+  INSERT INTO EventsFts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+END;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CREATE_EVENTS_FTS_DELETE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS EventsFtsDeleteTrg AFTER DELETE ON Events BEGIN
+  INSERT INTO EventsFts (EventsFts, rowid, title, description) VALUES ('delete', OLD.id, OLD.title, OLD.description);
+END;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_DELETE_ALL_EVENTS_FTS = """
+INSERT INTO EventsFts (EventsFts) VALUES ('delete-all');
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_REBUILD_EVENTS_FTS = """
+INSERT INTO EventsFts (EventsFts) VALUES ('rebuild');
+"""
+
+# Triggers which keep the full-text index in sync, while the whole table is
+# replaced they are dropped and the index is rebuilt once.
+EVENTS_FTS_TRIGGERS = {
+	'EventsFtsInsertTrg': QUERY_CREATE_EVENTS_FTS_INSERT_TRIGGER,
+	'EventsFtsUpdateTrg': QUERY_CREATE_EVENTS_FTS_UPDATE_TRIGGER,
+	'EventsFtsDeleteTrg': QUERY_CREATE_EVENTS_FTS_DELETE_TRIGGER
+}
+
+# Events matching a full-text query, best first. Matches in titles weigh more
+# than in descriptions.
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SEARCH_EVENTS = """
+SELECT e.* FROM EventsFts JOIN Events e ON e.id = EventsFts.rowid
+  WHERE EventsFts MATCH ? ORDER BY bm25(EventsFts, 10.0, 1.0), e.date, e.time LIMIT ? OFFSET ?;
+"""
+
+# Events which titles or descriptions contain each of the given LIKE patterns,
+# used instead of the full-text index if SQLite is built without FTS5. Holds a
+# condition per pattern, see QUERY_LIKE_EVENTS_CONDITION.
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_LIKE_EVENTS = """
+SELECT * FROM Events
+  WHERE {} ORDER BY date, time LIMIT ? OFFSET ?;
+"""
+
+QUERY_LIKE_EVENTS_CONDITION = "(title LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\')"
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_HAS_EVENTS_FTS = """
+SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'EventsFts';
+"""
+
+# FTS5 is an optional SQLite extension, the full-text index is not created
+# without it and search falls back to LIKE patterns.
+def _sqlite_has_fts5():
+	connection = sqlite3.connect(':memory:')
+	try:
+		return connection.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5');").fetchone()[0] == 1
+	finally:
+		connection.close()
+
+
+SQLITE_HAS_FTS5 = _sqlite_has_fts5()
+
+# Pragmas which are set on every new connection. WAL journal lets readers run
+# concurrently with a writer.
+CONNECTION_PRAGMAS = {
+	'journal_mode': 'WAL'
+}
+
+# Pragmas which speed up bulk loads, their previous values are restored after loading.
+BULK_LOAD_PRAGMAS = {
+	'synchronous': 1,
+	'cache_size': -65536,
+	'temp_store': 2
+}
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_GET_PRAGMA = """
+PRAGMA {};
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SET_PRAGMA = """
+PRAGMA {} = {};
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_CHECK_CONNECTION = """
+SELECT 1;
+"""
+
+# Write transactions take the write lock at once, so a transaction which reads
+# first waits for other writers instead of failing when it starts writing.
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_BEGIN_TRANSACTION = """
+BEGIN IMMEDIATE;
+"""
+
+# Each item upgrades the schema by one version, stored in 'PRAGMA user_version'.
+# Databases of released versions have only the Events table with text dates
+# and times at version 0.
+SCHEMA_MIGRATIONS = (
+	(QUERY_CREATE_EVENT_TABLE,),
+	(
+		QUERY_ENCODE_TEXT_DATES,
+		QUERY_CREATE_EVENTS_ENCODE_INSERT_TRIGGER,
+		QUERY_CREATE_EVENTS_ENCODE_UPDATE_TRIGGER,
+		QUERY_CREATE_EVENTS_DATE_TIME_INDEX,
+		QUERY_CREATE_EVENTS_DUE_INDEX
+	),
+	(
+		QUERY_CREATE_EVENT_CHANGES_TABLE,
+		QUERY_CREATE_METADATA_TABLE,
+		QUERY_CREATE_EVENTS_INSERT_TRIGGER,
+		QUERY_CREATE_EVENTS_UPDATE_TRIGGER,
+		QUERY_CREATE_EVENTS_DELETE_TRIGGER,
+		QUERY_TRACK_ALL_EVENTS
+	),
+	(
+		QUERY_CREATE_EVENTS_FTS_TABLE,
+		QUERY_REBUILD_EVENTS_FTS,
+		QUERY_CREATE_EVENTS_FTS_INSERT_TRIGGER,
+		QUERY_CREATE_EVENTS_FTS_UPDATE_TRIGGER,
+		QUERY_CREATE_EVENTS_FTS_DELETE_TRIGGER
+	) if SQLITE_HAS_FTS5 else (),
+	(QUERY_CREATE_EVENTS_RECURRING_INDEX,),
+)
+
 # noinspection SqlDialectInspection,SqlNoDataSourceInspection
 QUERY_SELECT_EVENT_BY_ID = """
 SELECT * FROM Events WHERE id = {};
@@ -28,18 +322,98 @@ INSERT INTO Events(title, date, time, description, is_past, repeat_weekly)
   VALUES (?, ?, ?, ?, ?, ?);
 """
 
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_UPSERT_EVENT = """
+INSERT OR REPLACE INTO Events(id, title, date, time, description, is_past, repeat_weekly, is_notified)
+  VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
 # noinspection SqlDialectInspection,SqlNoDataSourceInspection
 QUERY_UPDATE_EVENT = """
 UPDATE Events SET title = ?, date = ?, time = ?, description = ?, is_past = ?, repeat_weekly = ?, is_notified = ?
   WHERE id = ?;
 """
 
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_UPDATE_EVENT_COLUMNS = """
+UPDATE Events SET {}
+  WHERE id = ?{};
+"""
+
+# 'RETURNING' is supported since SQLite 3.35.0, older versions read the row
+# after updating it.
+SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+QUERY_RETURNING_EVENT = """
+  RETURNING id, title, date, time, description, is_past, repeat_weekly, is_notified"""
+
 # noinspection SqlDialectInspection,SqlNoDataSourceInspection
 QUERY_DELETE_EVENT_BY_ID = """
 DELETE FROM Events WHERE id = ?;
 """
 
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_DELETE_EVENTS_BY_IDS = """
+DELETE FROM Events WHERE id IN ({});
+"""
+
 # noinspection SqlDialectInspection,SqlNoDataSourceInspection
 QUERY_SELECT_EVENTS_BY = """
 SELECT * FROM Events {};
 """
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SELECT_PENDING_EVENTS = """
+SELECT id, date, time, is_notified FROM Events WHERE is_past = 0 {};
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SELECT_DATE_AGGREGATES = """
+SELECT date, COUNT(*), MAX(is_past) FROM Events WHERE date BETWEEN ? AND ? GROUP BY date;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SELECT_RECURRING_EVENTS = """
+SELECT * FROM Events WHERE repeat_weekly = 1 AND date < ?;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SELECT_EVENT_ROWS = """
+SELECT title, date, time, description, is_past, repeat_weekly, is_notified FROM Events;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SELECT_CHANGES_SINCE = """
+SELECT c.id, c.deleted, e.title, e.date, e.time, e.description, e.is_past, e.repeat_weekly, e.is_notified
+  FROM EventChanges c LEFT JOIN Events e ON e.id = c.id WHERE c.seq > ? ORDER BY c.seq;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SELECT_LAST_CHANGE_SEQ = """
+SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'EventChanges'), 0);
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_DELETE_ALL_CHANGES = """
+DELETE FROM EventChanges;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_PRUNE_TOMBSTONES = """
+DELETE FROM EventChanges WHERE deleted = 1 AND seq <= ?;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_GET_METADATA = """
+SELECT value FROM Metadata WHERE key = ?;
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_SET_METADATA = """
+INSERT OR REPLACE INTO Metadata (key, value) VALUES (?, ?);
+"""
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+QUERY_DELETE_METADATA = """
+DELETE FROM Metadata WHERE key = ?;
+"""
@@ -5,11 +5,14 @@ import base64
 import sqlite3
 
 from hashlib import sha512
+from contextlib import contextmanager
 from datetime import datetime
 
 from erdesktop.storage.sql import *
 from erdesktop.settings import Settings, APP_DB_FILE, APP_DB_PATH
+from erdesktop.storage.pool import ConnectionPool
 from erdesktop.storage.models import EventModel
+from erdesktop.storage.backup import BackupReader, BackupWriter
 from erdesktop.settings import BACKUP_FILE_NAME
 from erdesktop.util.exceptions import DatabaseException
 
@@ -18,21 +21,31 @@ class Storage:
 	"""
 	Implements methods for accessing events from the database.
 
-	Backup:
+	Backup file:
+		'backup' streams events from a database cursor into a BackupWriter
+		container: a header, optional settings, zlib compressed chunks of events
+		and a trailing sha512 digest, see BackupFormat. Memory usage does not
+		depend on the number of events.
+
+	Restore from file:
+		'restore' checks if the file starts with BackupFormat.MAGIC. Such files are
+		verified with a BackupReader first (digest, structure and timestamp), then
+		events are read again chunk by chunk and loaded with 'bulk_load' in a
+		single transaction.
+
+		Legacy files:
+			Any other file is a backup saved by an older version, i.e. backup data
+			prepared as described below and pickled. It is unpickled and restored
+			with 'restore_from_dict'.
+
+	Cloud backup:
 		Prepare data
 			Backup is represented in json (python dictionary) format. 'Data' contains
 			a list of events took from the database, settings if it is included in
-			backup and username of its author if backup is preparing for uploading to
-			cloud. It is serialized to a binary string. 'Digest' is sha512 sum of
-			serialized 'data'. 'Timestamp' is date and time when backups is created.
-			'Backup' is serialized 'data' which is encoded using base64 algorithm.
-
-		Save to file
-			Prepared data is beeing serialized to a binary string and saved to a file.
-
-	Restore:
-		Read:
-			Program reads file with backup data and deserializes it from binary string.
+			backup and username of its author. It is serialized to a binary string.
+			'Digest' is sha512 sum of serialized 'data'. 'Timestamp' is date and time
+			when backups is created. 'Backup' is serialized 'data' which is encoded
+			using base64 algorithm.
 
 		Restore data
 			Algorithm checks if all required keys are in dictionary object. If this operation
@@ -41,15 +54,57 @@ class Storage:
 			'backup' using base64 decoding, takes its sha512 sum and compares it with written
 			in backup data. After success algorithm deserializes 'backup', restores database
 			and settings if the last one is included in backup.
+
+	Incremental backups:
+		Triggers on Events record the last change of every event in EventChanges
+		with a growing sequence number, deleted events are kept there as tombstones.
+		After a backup is uploaded its digest and the sequence number it covers are
+		saved as the backup base, so the next backup contains only events changed
+		since then and ids of deleted ones, and references the base as 'parent'. Such
+		deltas are restored by 'restore_chain' replaying the base snapshot and all
+		deltas in order in a single transaction. Replacing all events, e.g. restoring
+		from a file, resets the backup base and the next backup is a full snapshot.
+
+	Connections:
+		Every thread which uses a storage gets its own connection from a
+		ConnectionPool, so a cursor or a transaction is never shared between the
+		GUI thread, workers and the reminder service. The database runs in WAL
+		journal mode, readers are not blocked by a writer.
+
+		Connections are reused as long as they work. If a query fails, the
+		connection is checked and a broken one is replaced on the next use; a
+		disconnected storage connects again only if 'try_to_reconnect' is set.
+		'connection_stats' reports numbers of open, opened and failed connections.
+
+	Transactions:
+		Every change is made within 'transaction', a block which commits once when
+		it exits. Changes made by several calls inside an outer 'with
+		storage.transaction():' block are committed together, which saves a disk
+		sync per change, and are rolled back together if the block raises.
+
+	Search:
+		Titles and descriptions are indexed in the EventsFts full-text table, which
+		triggers keep in sync with Events. 'search' matches words by prefix and
+		ranks results with bm25 weighting matches in titles higher. The table is
+		not created if SQLite is built without FTS5, then 'search' falls back to
+		LIKE patterns which match words anywhere in titles and descriptions.
+
+	Change listeners:
+		Callables registered with 'add_change_listener' are shared by all storage
+		instances and are called with the primary key of an event after each committed
+		transaction which changed that event, or with None if the whole table was replaced.
 	"""
 
+	_change_listeners = []
+
+	BACKUP_BASE_DIGEST_KEY = 'backup_base_digest'
+	BACKUP_BASE_SEQ_KEY = 'backup_base_seq'
+
 	def __init__(self, db_path=APP_DB_PATH, db_file=APP_DB_FILE, try_to_reconnect=False, backup_file=BACKUP_FILE_NAME):
 		if not os.path.exists(db_path):
 			os.makedirs(db_path)
 
-		self.__db = None
-		self.__cursor = None
-		self.__db_file = db_file
+		self.__pool = ConnectionPool(db_file)
 		self.__backup_file_name = backup_file
 		self.try_to_reconnect = try_to_reconnect
 		self.is_connected = False
@@ -57,24 +112,120 @@ class Storage:
 		self.connect()
 
 	def connect(self):
-		self.__db = sqlite3.connect(self.__db_file, check_same_thread=False)
-		self.__cursor = self.__db.cursor()
-		EventModel.create_table(self.__cursor)
+		"""
+		Opens a new connection of the calling thread and upgrades the schema if
+		needed. Other threads open their own connections on the first use.
+		"""
+		self.__pool.open()
+		cursor = self.__pool.connect().cursor
+		EventModel.create_table(cursor)
+		self.__has_full_text_index = EventModel.has_full_text_index(cursor)
 		self.is_connected = True
 
 	def disconnect(self):
-		self.__cursor.close()
-		self.__db.close()
+		"""
+		Closes connections of all threads.
+		"""
+		self.__pool.close()
 		self.is_connected = False
 
+	@property
+	def __db(self):
+		return self.__pool.get().db
+
+	@property
+	def __cursor(self):
+		return self.__pool.get().cursor
+
+	@classmethod
+	def add_change_listener(cls, listener):
+		if listener not in cls._change_listeners:
+			cls._change_listeners.append(listener)
+
+	@classmethod
+	def remove_change_listener(cls, listener):
+		if listener in cls._change_listeners:
+			cls._change_listeners.remove(listener)
+
+	@classmethod
+	def notify_changed(cls, pk=None):
+		for listener in tuple(cls._change_listeners):
+			listener(pk)
+
+	@property
+	def in_transaction(self):
+		return self.is_connected and self.__pool.get().transaction_depth > 0
+
+	@contextmanager
+	def transaction(self):
+		"""
+		Groups changes made inside the block into a single transaction, which is
+		committed once when the outermost block exits or rolled back as a whole if
+		it raises. Blocks can be nested, transactions of different threads are
+		independent. Change listeners are called after the commit for each changed
+		event once.
+		"""
+		if not self.is_connected:
+			raise DatabaseException('Transaction failure: connect to the database first')
+		connection = self.__pool.get()
+		if connection.transaction_depth > 0:
+			connection.transaction_depth += 1
+			try:
+				yield self
+			finally:
+				connection.transaction_depth -= 1
+			return
+		connection.db.commit()
+		connection.cursor.execute(QUERY_BEGIN_TRANSACTION)
+		connection.transaction_depth = 1
+		try:
+			yield self
+			connection.db.commit()
+		except BaseException as exc:
+			connection.changed = []
+			if isinstance(exc, sqlite3.Error) and self.__pool.recover():
+				raise
+			connection.db.rollback()
+			raise
+		finally:
+			connection.transaction_depth = 0
+		changed, connection.changed = connection.changed, []
+		for pk in ([None] if None in changed else list(dict.fromkeys(changed))):
+			self.notify_changed(pk)
+
+	def __mark_changed(self, *pks):
+		self.__pool.get().changed.extend(pks)
+
+	def __ensure_connected(self, failure):
+		if not self.is_connected and self.try_to_reconnect:
+			self.connect()
+		if not self.is_connected:
+			raise DatabaseException('{} failure: connect to the database first'.format(failure))
+
+	@contextmanager
+	def __reading(self, failure='Retrieving'):
+		"""
+		Yields the cursor of the calling thread. A connection which fails is
+		replaced on the next use if it is broken.
+		"""
+		self.__ensure_connected(failure)
+		try:
+			yield self.__cursor
+		except sqlite3.Error:
+			self.__pool.recover()
+			raise
+
+	def connection_stats(self):
+		"""
+		Returns numbers of currently open, ever opened and failed connections.
+		"""
+		return self.__pool.stats()
+
 	def event_exists(self, pk):
 		return self.get_event_by_id(pk) is not None
 
 	def create_event(self, title, e_date, e_time, description, repeat_weekly, is_past=False):
-		if self.try_to_reconnect:
-			self.connect()
-		if not self.is_connected:
-			raise DatabaseException('Creation failure: connect to the database first')
+		self.__ensure_connected('Creation')
 		event = EventModel((
 			None,
 			title,
@@ -85,72 +236,227 @@ class Storage:
 			repeat_weekly,
 			0
 		))
-		event.id = EventModel.insert(self.__cursor, event)
-		self.__db.commit()
+		with self.transaction():
+			event.id = EventModel.insert(self.__cursor, event)
+			self.__mark_changed(event.id)
 		return event
 
 	def update_event(self, pk, title=None, e_date=None, e_time=None, description=None, is_past=None, repeat_weekly=None, is_notified=None):
-		if self.try_to_reconnect:
-			self.connect()
-		if not self.is_connected:
-			raise DatabaseException('Updating failure: connect to the database first')
-		event = self.get_event_by_id(pk)
-		if event:
-			if title is not None:
-				event.title = title
-			if e_time is not None:
-				event.time = e_time
-			if e_date is not None:
-				event.date = e_date
-			if description is not None:
-				event.description = description
-			if event.date >= datetime.today().date() and is_past is None:
-				event.is_past = False
-			else:
-				event.is_past = is_past
-			if repeat_weekly is not None:
-				event.repeat_weekly = repeat_weekly
-			if is_notified is not None:
-				event.is_notified = is_notified
-			EventModel.update(self.__cursor, event)
-			self.__db.commit()
-			return event
-		raise DatabaseException('Updating failure: event does not exist')
+		"""
+		Updates given fields of an event with a single statement. Unless 'is_past'
+		is given, the event is marked as not past if its date is not before today.
+		"""
+		self.__ensure_connected('Updating')
+		values = {}
+		if title is not None:
+			values['title'] = title
+		if e_date is not None:
+			values['date'] = e_date
+		if e_time is not None:
+			values['time'] = e_time
+		if description is not None:
+			values['description'] = description
+		if repeat_weekly is not None:
+			values['repeat_weekly'] = repeat_weekly
+		if is_notified is not None:
+			values['is_notified'] = is_notified
+		today = None
+		if is_past is not None:
+			values['is_past'] = is_past
+		elif e_date is None:
+			today = datetime.today().date()
+		elif e_date >= datetime.today().date():
+			values['is_past'] = False
+		with self.transaction():
+			event = EventModel.update_columns(self.__cursor, pk, values, today)
+			if event is None:
+				raise DatabaseException('Updating failure: event does not exist')
+			self.__mark_changed(event.id)
+		return event
 
 	def delete_event(self, pk):
-		if self.try_to_reconnect:
-			self.connect()
-		if not self.is_connected:
-			raise DatabaseException('Deleting failure: connect to the database first')
-		EventModel.delete(self.__cursor, pk)
-		self.__db.commit()
-		return None
+		"""
+		Deletes an event by primary key. Returns False if it does not exist.
+		"""
+		self.__ensure_connected('Deleting')
+		with self.transaction():
+			deleted = EventModel.delete(self.__cursor, pk)
+			if deleted:
+				self.__mark_changed(pk)
+		return deleted
+
+	def delete_events(self, pks):
+		"""
+		Deletes events by primary keys in a single transaction, missing ones are
+		skipped. Returns the number of deleted events.
+		"""
+		self.__ensure_connected('Deleting')
+		pks = list(pks)
+		with self.transaction():
+			deleted = EventModel.delete_many(self.__cursor, pks)
+			if deleted > 0:
+				self.__mark_changed(*pks)
+		return deleted
 
 	def get_events(self, e_date=None, e_time=None, delta=None):
-		if not self.is_connected:
-			raise DatabaseException('Retrieving failure: connect to the database first')
-		return EventModel.select(self.__cursor, e_date, e_time, delta)
+		with self.__reading() as cursor:
+			return EventModel.select(cursor, e_date, e_time, delta)
 
-	def to_array(self):
-		self.connect()
-		events = self.get_events()
-		return [x.to_dict() for x in events]
+	def get_day_events(self, day):
+		"""
+		Returns events of 'day' including occurrences of repeating events.
+		"""
+		with self.__reading() as cursor:
+			return EventModel.select_day(cursor, day)
+
+	def get_date_aggregates(self, start_date, end_date):
+		with self.__reading() as cursor:
+			return EventModel.select_date_aggregates(cursor, start_date, end_date)
+
+	def get_pending_events(self, pk=None):
+		with self.__reading() as cursor:
+			return EventModel.select_pending(cursor, pk)
+
+	def get_due_events(self, until):
+		with self.__reading() as cursor:
+			return EventModel.select_due(cursor, until)
+
+	def search(self, query, limit=50, offset=0):
+		"""
+		Returns at most 'limit' events which titles or descriptions contain words
+		starting with each word of 'query', the most relevant first, skipping the
+		first 'offset' ones. If SQLite has no FTS5 extension, events containing
+		each word of 'query' are returned ordered by date and time.
+		"""
+		with self.__reading() as cursor:
+			return EventModel.search(cursor, query, limit, offset, self.__has_full_text_index)
+
+	def to_array(self, with_ids=False):
+		with self.__reading() as cursor:
+			return [EventModel.row_to_dict(row, with_ids) for row in EventModel.select_rows(cursor)]
 
 	def get_event_by_id(self, pk):
-		return EventModel.get(self.__cursor, pk)
+		with self.__reading() as cursor:
+			return EventModel.get(cursor, pk)
+
+	def bulk_load(self, params, replace=False):
+		"""
+		Inserts events given as an iterable of insert query parameters in a single
+		transaction, removing all existing events first if 'replace' is True.
+		Indexes are rebuilt once after loading and tuned pragmas are used while
+		loading. If any row fails, the database is left untouched.
+		"""
+		self.__bulk_write(lambda cursor: EventModel.insert_many(cursor, params), replace)
+
+	@contextmanager
+	def __bulk_pragmas(self):
+		"""
+		Uses pragmas tuned for loading many rows inside the block, unless it is
+		entered within a transaction.
+		"""
+		pragmas = {}
+		if not self.in_transaction:
+			for name, value in BULK_LOAD_PRAGMAS.items():
+				pragmas[name] = self.__cursor.execute(QUERY_GET_PRAGMA.format(name)).fetchone()[0]
+				self.__cursor.execute(QUERY_SET_PRAGMA.format(name, value))
+		try:
+			yield
+		finally:
+			for name, value in pragmas.items():
+				self.__cursor.execute(QUERY_SET_PRAGMA.format(name, value))
+
+	def __bulk_write(self, write, replace):
+		self.__ensure_connected('Loading')
+		fts_triggers = EVENTS_FTS_TRIGGERS if self.__has_full_text_index else {}
+		with self.__bulk_pragmas(), self.transaction():
+			if replace:
+				for trigger in list(EVENTS_TRIGGERS) + list(fts_triggers):
+					self.__cursor.execute(QUERY_DROP_TRIGGER.format(trigger))
+				if self.__has_full_text_index:
+					self.__cursor.execute(QUERY_DELETE_ALL_EVENTS_FTS)
+				self.__cursor.execute(QUERY_DELETE_ALL_EVENTS)
+				self.__cursor.execute(QUERY_DELETE_ALL_CHANGES)
+				self.__cursor.execute(QUERY_DELETE_METADATA, (self.BACKUP_BASE_DIGEST_KEY,))
+				self.__cursor.execute(QUERY_DELETE_METADATA, (self.BACKUP_BASE_SEQ_KEY,))
+			for index in EVENTS_INDEXES:
+				self.__cursor.execute(QUERY_DROP_INDEX.format(index))
+			write(self.__cursor)
+			for query in EVENTS_INDEXES.values():
+				self.__cursor.execute(query)
+			if replace:
+				self.__cursor.execute(QUERY_TRACK_ALL_EVENTS)
+				if self.__has_full_text_index:
+					self.__cursor.execute(QUERY_REBUILD_EVENTS_FTS)
+				for query in list(EVENTS_TRIGGERS.values()) + list(fts_triggers.values()):
+					self.__cursor.execute(query)
+			self.__mark_changed(None)
 
 	def from_array(self, arr):
-		for item in arr:
-			EventModel.insert(self.__cursor, EventModel.from_dict(item))
-		self.__db.commit()
+		self.bulk_load(EventModel.dict_to_params(item) for item in arr)
+
+	def last_change_seq(self):
+		with self.__reading() as cursor:
+			return EventModel.last_change_seq(cursor)
+
+	def changes_since(self, seq):
+		"""
+		Returns a (events, deleted) pair: dictionaries with ids of events changed
+		after the change sequence number 'seq' and ids of events deleted since then.
+		"""
+		with self.__reading() as cursor:
+			return EventModel.select_changes(cursor, seq)
+
+	def get_backup_base(self):
+		"""
+		Returns a (digest, seq) pair of the last acknowledged backup or None if the
+		next backup has to be a full one.
+		"""
+		with self.__reading() as cursor:
+			digest = cursor.execute(QUERY_GET_METADATA, (self.BACKUP_BASE_DIGEST_KEY,)).fetchone()
+			seq = cursor.execute(QUERY_GET_METADATA, (self.BACKUP_BASE_SEQ_KEY,)).fetchone()
+		if digest is None or seq is None:
+			return None
+		return digest[0], int(seq[0])
+
+	def set_backup_base(self, digest, seq):
+		"""
+		Saves the backup 'digest' which contains all changes up to 'seq' as a base
+		of the next delta and drops tombstones which are covered by it.
+		"""
+		self.__ensure_connected('Updating')
+		with self.transaction():
+			self.__cursor.execute(QUERY_SET_METADATA, (self.BACKUP_BASE_DIGEST_KEY, digest))
+			self.__cursor.execute(QUERY_SET_METADATA, (self.BACKUP_BASE_SEQ_KEY, seq))
+			self.__cursor.execute(QUERY_PRUNE_TOMBSTONES, (seq,))
 
 	@staticmethod
-	def prepare_backup_data(events_array, timestamp, include_settings, username=None, settings=Settings().to_dict()):
+	def prepare_backup_data(events_array, timestamp, include_settings, username=None, settings=None):
 		data = {
 			'db': events_array
 		}
+		return Storage.__pack_backup_data(data, timestamp, include_settings, len(events_array), username, settings)
+
+	@staticmethod
+	def prepare_delta_data(events_array, deleted, parent, timestamp, include_settings, username=None, settings=None):
+		"""
+		Prepares backup data which contains only changed and deleted events and
+		refers to the 'parent' backup digest.
+		"""
+		data = {
+			'delta': {
+				'events': events_array,
+				'deleted': deleted
+			},
+			'parent': parent
+		}
+		backup = Storage.__pack_backup_data(data, timestamp, include_settings, len(events_array), username, settings)
+		backup['parent'] = parent
+		return backup
+
+	@staticmethod
+	def __pack_backup_data(data, timestamp, include_settings, events_count, username, settings):
 		if include_settings:
-			data['settings'] = settings
+			data['settings'] = settings if settings is not None else Settings.shared().to_dict()
 		if username is not None:
 			data['username'] = username
 		data = json.dumps(data).encode('utf8')
@@ -160,7 +466,7 @@ class Storage:
 			'timestamp': timestamp,
 			'backup': encoded_data,
 			'backup_size': Storage.count_str_size(encoded_data),
-			'events_count': len(events_array),
+			'events_count': events_count,
 			'contains_settings': include_settings
 		}
 
@@ -175,7 +481,12 @@ class Storage:
 			counter += 1
 		return str(round(size_in_bytes, 2)) + ' ' + units[counter]
 
-	def restore_from_dict(self, data):
+	@staticmethod
+	def decode_backup(data):
+		"""
+		Verifies backup data, i.e. its timestamp and digest, and returns the decoded
+		backup, raises DatabaseException if it is invalid.
+		"""
 		err_template = 'Restore failure: {}.'
 		for key in ['digest', 'timestamp', 'backup']:
 			if key not in data:
@@ -185,19 +496,82 @@ class Storage:
 		backup_decoded = base64.b64decode(data['backup'])
 		if sha512(backup_decoded).hexdigest() != data['digest']:
 			raise DatabaseException(err_template.format('backup is broken'))
-		backup = json.loads(backup_decoded.decode('utf8'))
+		return json.loads(backup_decoded.decode('utf8'))
+
+	def restore_from_dict(self, data):
+		backup = self.decode_backup(data)
 		if 'db' not in backup:
-			raise DatabaseException(err_template.format('invalid backup data'))
-		self.__cursor.execute(QUERY_DELETE_ALL_EVENTS)
-		self.from_array(backup['db'])
+			raise DatabaseException('Restore failure: invalid backup data.')
+		self.bulk_load((EventModel.dict_to_params(item) for item in backup['db']), replace=True)
 		if 'settings' in backup:
-			Settings().from_dict(backup['settings'])
+			Settings.shared().from_dict(backup['settings'])
+
+	def restore_chain(self, chain):
+		"""
+		Restores a full backup followed by deltas which are based on it, 'chain' is
+		a list of backup data ordered from the full backup to the latest delta. The
+		latest backup becomes the base of the next delta.
+		"""
+		err_template = 'Restore failure: {}.'
+		backups = [self.decode_backup(data) for data in chain]
+		if len(backups) == 0 or 'db' not in backups[0]:
+			raise DatabaseException(err_template.format('invalid backup data'))
+		for i in range(1, len(backups)):
+			if 'delta' not in backups[i] or backups[i].get('parent') != chain[i - 1]['digest']:
+				raise DatabaseException(err_template.format('broken backup chain'))
+
+		def write(cursor):
+			EventModel.upsert_many(cursor, (EventModel.dict_to_upsert_params(item) for item in backups[0]['db']))
+			for delta in backups[1:]:
+				EventModel.upsert_many(cursor, (EventModel.dict_to_upsert_params(item) for item in delta['delta']['events']))
+				EventModel.delete_many(cursor, delta['delta']['deleted'])
+
+		with self.__bulk_pragmas(), self.transaction():
+			self.__bulk_write(write, True)
+			self.set_backup_base(chain[-1]['digest'], self.last_change_seq())
+		for backup in reversed(backups):
+			if 'settings' in backup:
+				Settings.shared().from_dict(backup['settings'])
+				break
+
+	def restore_from_file(self, file):
+		err_template = 'Restore failure: {}.'
+		reader = BackupReader(file).verify()
+		if datetime.now() < datetime.strptime(reader.timestamp, EventModel.TIMESTAMP_FORMAT):
+			raise DatabaseException(err_template.format('incorrect timestamp'))
+		self.bulk_load((
+			EventModel.dict_to_params(dict(zip(reader.fields, row))) for chunk in reader.chunks() for row in chunk
+		), replace=True)
+		if reader.settings is not None:
+			Settings.shared().from_dict(reader.settings)
 
 	def backup(self, path: str, include_settings):
+		"""
+		Writes a backup file to 'path' directory. The file is written under a
+		temporary name and renamed when it is complete, so a failed backup leaves
+		no partial file behind.
+		"""
 		timestamp = datetime.strftime(datetime.now(), EventModel.TIMESTAMP_FORMAT)
-		with open('{}/{} {}.bak'.format(path.rstrip('/'), self.__backup_file_name, timestamp), 'wb') as file:
-			file.write(pickle.dumps(self.prepare_backup_data(self.to_array(), timestamp, include_settings)))
+		file_name = '{}/{} {}.bak'.format(path.rstrip('/'), self.__backup_file_name, timestamp)
+		tmp_file_name = '{}.tmp'.format(file_name)
+		try:
+			with open(tmp_file_name, 'wb') as file:
+				writer = BackupWriter(file, timestamp, include_settings)
+				if include_settings:
+					writer.write_settings(Settings.shared().to_dict())
+				with self.__reading('Backup') as cursor:
+					for row in EventModel.iterate_rows(cursor):
+						writer.write_row(row)
+				writer.close()
+			os.replace(tmp_file_name, file_name)
+		except BaseException:
+			if os.path.exists(tmp_file_name):
+				os.remove(tmp_file_name)
+			raise
 
 	def restore(self, file_path: str):
 		with open(file_path, 'rb') as file:
-			self.restore_from_dict(pickle.loads(file.read()))
+			if BackupReader.is_backup(file):
+				self.restore_from_file(file)
+			else:
+				self.restore_from_dict(pickle.loads(file.read()))
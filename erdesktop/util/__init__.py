@@ -1,2 +1,2 @@
 from erdesktop.util.worker import Worker
-from erdesktop.util.logger import logger, log_msg
+from erdesktop.util.logger import logger
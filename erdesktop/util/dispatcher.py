@@ -0,0 +1,154 @@
+import time
+import queue
+import threading
+
+from collections import deque
+
+from erdesktop.util.logger import logger
+from erdesktop.util.notification import Notification, default_backend
+
+
+class NotificationDispatcher:
+	"""
+	Sends notifications from a background thread, so 'submit' never waits for
+	a backend.
+
+	Submitted notifications wait in a queue of at most 'max_size' items, new
+	ones are dropped while it is full. The sender takes the first waiting
+	notification together with all which are submitted within 'coalesce_window'
+	seconds after it. Of several notifications with the same key only the last
+	one is sent, and if more than 'coalesce_limit' remain they are combined
+	into a single summary notification.
+
+	The backend of the current system is used if 'backend' is not given.
+
+	'stats' returns numbers of submitted, sent, coalesced, dropped and failed
+	notifications and the average and maximum latency in milliseconds from
+	submitting to the end of sending over the last LATENCY_SAMPLES ones.
+	"""
+
+	MAX_SIZE = 100
+
+	# in seconds
+	COALESCE_WINDOW = 0.1
+
+	COALESCE_LIMIT = 3
+
+	LATENCY_SAMPLES = 100
+
+	__STOP = object()
+
+	def __init__(self, backend=None, max_size=MAX_SIZE, coalesce_window=COALESCE_WINDOW, coalesce_limit=COALESCE_LIMIT):
+		self.__backend = backend
+		self.coalesce_window = coalesce_window
+		self.coalesce_limit = coalesce_limit
+		self.__queue = queue.Queue(max_size)
+		self.__thread = None
+		self.__lock = threading.Lock()
+		self.__latencies = deque(maxlen=self.LATENCY_SAMPLES)
+		self.submitted = 0
+		self.sent = 0
+		self.coalesced = 0
+		self.dropped = 0
+		self.failed = 0
+
+	@property
+	def is_running(self):
+		return self.__thread is not None and self.__thread.is_alive()
+
+	def start(self):
+		if self.is_running:
+			return
+		self.__thread = threading.Thread(target=self.__run, name='NotificationDispatcher', daemon=True)
+		self.__thread.start()
+
+	def stop(self, timeout=None):
+		"""
+		Sends notifications which are already submitted and stops the sender.
+		"""
+		if not self.is_running:
+			return
+		self.__queue.put(self.__STOP)
+		self.__thread.join(timeout)
+
+	def submit(self, notification):
+		"""
+		Queues 'notification' for sending. Returns False if it was dropped.
+		"""
+		try:
+			self.__queue.put_nowait((time.monotonic(), notification))
+		except queue.Full:
+			with self.__lock:
+				self.dropped += 1
+			return False
+		with self.__lock:
+			self.submitted += 1
+		return True
+
+	def stats(self):
+		with self.__lock:
+			latencies = list(self.__latencies)
+			return {
+				'pending': self.__queue.qsize(),
+				'submitted': self.submitted,
+				'sent': self.sent,
+				'coalesced': self.coalesced,
+				'dropped': self.dropped,
+				'failed': self.failed,
+				'latency_avg': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+				'latency_max': max(latencies) * 1000 if latencies else 0.0
+			}
+
+	def __run(self):
+		stopped = False
+		while not stopped:
+			item = self.__queue.get()
+			if item is self.__STOP:
+				break
+			batch = [item]
+			stopped = self.__collect(batch)
+			self.__dispatch(batch)
+		if self.__backend is not None:
+			self.__backend.close()
+
+	def __collect(self, batch):
+		"""
+		Adds notifications which are submitted within the coalescing window to
+		'batch'. Returns True if the dispatcher is stopped meanwhile.
+		"""
+		deadline = time.monotonic() + self.coalesce_window
+		while True:
+			try:
+				item = self.__queue.get(timeout=max(deadline - time.monotonic(), 0))
+			except queue.Empty:
+				return False
+			if item is self.__STOP:
+				return True
+			batch.append(item)
+
+	def __coalesce(self, notifications):
+		latest = {}
+		for i, notification in enumerate(notifications):
+			latest[notification.key if notification.key is not None else ('', i)] = notification
+		result = list(latest.values())
+		if len(result) > self.coalesce_limit:
+			result = [Notification.summary(result)]
+		return result
+
+	def __dispatch(self, batch):
+		notifications = self.__coalesce([notification for _, notification in batch])
+		sent = 0
+		for notification in notifications:
+			try:
+				if self.__backend is None:
+					self.__backend = default_backend()
+				self.__backend.send(notification)
+				sent += 1
+			except Exception as exc:
+				logger.error('Notification error: %s', exc)
+		finished = time.monotonic()
+		with self.__lock:
+			self.sent += sent
+			self.failed += len(notifications) - sent
+			self.coalesced += len(batch) - len(notifications)
+			self.__latencies.extend(finished - submitted for submitted, _ in batch)
@@ -63,6 +63,10 @@ class BackupUploadingError(CloudStorageException):
 	"""Unable to upload backup to server exception"""
 
 
+class BackupParentNotFoundError(BackupUploadingError):
+	"""Unable to upload incremental backup because its parent backup is not on server"""
+
+
 class BackupDownloadingError(CloudStorageException):
 	"""Unable to download backup to server exception"""
 
@@ -81,3 +85,7 @@ class AutoStartIsNotSupportedError(Exception):
 
 class ShortcutIconIsNotSupportedError(Exception):
 	"""Unable to create shortcut icon in current system"""
+
+
+class NotificationError(Exception):
+	"""Unable to send a notification"""
@@ -0,0 +1,111 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+
+class RotatingLogFileHandler(RotatingFileHandler):
+	"""
+	Log file handler which starts a new file when the current one grows over
+	'max_bytes' or becomes older than 'interval' seconds, whichever comes first.
+	Up to 'backup_count' previous files are kept as 'file.1', 'file.2'...
+
+	Age of a file which exists on start is counted from its last modification.
+	"""
+
+	def __init__(self, filename, max_bytes, backup_count, interval):
+		super(RotatingLogFileHandler, self).__init__(
+			filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+		)
+		self.interval = interval
+		started = os.path.getmtime(filename) if os.path.isfile(filename) else time.time()
+		self.rollover_at = started + interval
+
+	def shouldRollover(self, record):
+		if self.interval > 0 and time.time() >= self.rollover_at and os.path.isfile(self.baseFilename):
+			return True
+		return super(RotatingLogFileHandler, self).shouldRollover(record)
+
+	def doRollover(self):
+		super(RotatingLogFileHandler, self).doRollover()
+		self.rollover_at = time.time() + self.interval
+
+
+class BoundedQueueHandler(QueueHandler):
+	"""
+	Passes records to a QueueListener through a bounded queue, so logging
+	threads never wait for disk I/O. When the queue is full records are handled
+	according to 'policy':
+		DROP_NEW - the new record is dropped;
+		DROP_OLDEST - the oldest queued record is dropped to free a place;
+		BLOCK - the logging thread waits up to 'timeout' seconds for a place and
+			drops the record after that.
+
+	Number of dropped records is kept in 'dropped' and reported by a warning
+	record as soon as the queue has room again.
+	"""
+
+	DROP_NEW = 'drop_new'
+	DROP_OLDEST = 'drop_oldest'
+	BLOCK = 'block'
+
+	def __init__(self, records_queue, policy=DROP_NEW, timeout=0.1):
+		super(BoundedQueueHandler, self).__init__(records_queue)
+		if policy not in (self.DROP_NEW, self.DROP_OLDEST, self.BLOCK):
+			raise ValueError('unknown queue policy: {}'.format(policy))
+		self.policy = policy
+		self.timeout = timeout
+		self.dropped = 0
+		self.__unreported = 0
+		self.__lock = threading.Lock()
+
+	def enqueue(self, record):
+		if self.__unreported > 0:
+			self.__report_dropped(record)
+		if not self.__put(record):
+			self.__count_dropped()
+
+	def __count_dropped(self):
+		with self.__lock:
+			self.dropped += 1
+			self.__unreported += 1
+
+	def __put(self, record):
+		try:
+			if self.policy == self.BLOCK:
+				self.queue.put(record, timeout=self.timeout)
+			else:
+				self.queue.put_nowait(record)
+			return True
+		except queue.Full:
+			if self.policy != self.DROP_OLDEST:
+				return False
+		try:
+			self.queue.get_nowait()
+		except queue.Empty:
+			pass
+		else:
+			self.__count_dropped()
+		try:
+			self.queue.put_nowait(record)
+			return True
+		except queue.Full:
+			return False
+
+	def __report_dropped(self, record):
+		with self.__lock:
+			count, self.__unreported = self.__unreported, 0
+		warning = logging.makeLogRecord({
+			'name': record.name,
+			'levelno': logging.WARNING,
+			'levelname': logging.getLevelName(logging.WARNING),
+			'msg': '{} log records were dropped, the queue was full'.format(count)
+		})
+		try:
+			self.queue.put_nowait(warning)
+		except queue.Full:
+			with self.__lock:
+				self.__unreported += count
@@ -1,30 +1,53 @@
 import os
+import queue
+import atexit
 import logging
-from inspect import getframeinfo, stack
 
-from erdesktop.settings import APP_NAME, APP_LOG_FILE, APP_DATA_PATH
+from logging.handlers import QueueListener
+
+from PyQt5.QtCore import Qt
+
+from erdesktop.settings import (
+	Settings, APP_NAME, APP_LOG_FILE, APP_DATA_PATH, LOG_LEVEL, LOG_MAX_BYTES, LOG_ROTATION_INTERVAL,
+	LOG_BACKUP_COUNT, LOG_QUEUE_SIZE, LOG_QUEUE_POLICY
+)
+from erdesktop.util.log_handlers import RotatingLogFileHandler, BoundedQueueHandler
 
 if not os.path.exists(APP_DATA_PATH):
 	os.makedirs(APP_DATA_PATH)
 
 
 logger = logging.getLogger(APP_NAME)
-logger.setLevel(logging.DEBUG)
 
-fh = logging.FileHandler(APP_LOG_FILE)
-fh.setLevel(logging.DEBUG)
+fh = RotatingLogFileHandler(APP_LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATION_INTERVAL)
 
 ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
 
-formatter = logging.Formatter('%(asctime)s [%(name)s | %(levelname)s]:\n\t%(message)s')
+# file and line of the call are taken by the logger from the caller's frame
+formatter = logging.Formatter('%(asctime)s [%(name)s | %(levelname)s]:\n\t%(pathname)s:%(lineno)d - %(message)s\n')
 fh.setFormatter(formatter)
 ch.setFormatter(formatter)
 
-logger.addHandler(fh)
-logger.addHandler(ch)
+# records are written by the listener thread, logging threads only put them to the queue
+qh = BoundedQueueHandler(queue.Queue(LOG_QUEUE_SIZE), LOG_QUEUE_POLICY)
+listener = QueueListener(qh.queue, fh, ch, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
+logger.addHandler(qh)
+
+
+def set_level(level):
+	"""
+	Sets the level of application logs by its name, unknown names mean LOG_LEVEL.
+	"""
+	try:
+		logger.setLevel(level)
+	except (ValueError, TypeError):
+		logger.setLevel(LOG_LEVEL)
+
 
+set_level(Settings.shared().app_log_level)
 
-def log_msg(message, shift=2):
-	caller = getframeinfo(stack()[1][0])
-	return '{}:{} - {}\n'.format(caller.filename, caller.lineno - shift, message)
+# noinspection PyUnresolvedReferences
+Settings.shared().signals.log_level_changed.connect(set_level, Qt.DirectConnection)
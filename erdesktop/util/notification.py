@@ -1,57 +1,302 @@
+import time
 import platform
+import threading
+import subprocess
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from erdesktop.settings import APP_NAME
+from erdesktop.util.exceptions import NotificationError
 
 
 class Notification:
+	"""
+	Desktop notification. 'key' identifies the subject of the notification,
+	e.g. an event, notifications with the same key are about the same thing.
+	"""
 
 	URGENCY_LOW = 'low'
 	URGENCY_NORMAL = 'normal'
 	URGENCY_CRITICAL = 'critical'
 
-	def __init__(self, title, description, duration=5, urgency=URGENCY_LOW, icon_path=None):
-		if urgency not in [self.URGENCY_LOW, self.URGENCY_NORMAL, self.URGENCY_CRITICAL]:
+	URGENCIES = [URGENCY_LOW, URGENCY_NORMAL, URGENCY_CRITICAL]
+
+	def __init__(self, title, description, duration=5, urgency=URGENCY_LOW, icon_path=None, key=None):
+		if urgency not in self.URGENCIES:
 			raise ValueError('invalid urgency was given: {}'.format(urgency))
-		self.__WINDOWS = 'Windows'
-		self.__LINUX = 'Linux'
 		self.__title = title
 		self.__description = description
 		self.__duration = duration
 		self.__urgency = urgency
 		self.__icon_path = icon_path
-		self.__is_windows = False
+		self.__key = key
+
+	@property
+	def title(self):
+		return self.__title
+
+	@property
+	def description(self):
+		return self.__description
+
+	@property
+	def duration(self):
+		return self.__duration
+
+	@property
+	def urgency(self):
+		return self.__urgency
+
+	@property
+	def icon_path(self):
+		return self.__icon_path
+
+	@property
+	def key(self):
+		return self.__key
+
+	@staticmethod
+	def summary(notifications):
+		"""
+		Combines notifications into one which lists the first line of every
+		description, takes the highest urgency and the longest duration.
+		"""
+		first = notifications[0]
+		return Notification(
+			title=first.title,
+			description='\n'.join(x.description.split('\n', 1)[0] for x in notifications),
+			duration=max(x.duration for x in notifications),
+			urgency=max((x.urgency for x in notifications), key=Notification.URGENCIES.index),
+			icon_path=first.icon_path
+		)
 
 	# sends notification depending on system
 	def send(self):
-		system = platform.system()
-		if self.__LINUX in system:
-			self.__send_linux()
-		elif self.__WINDOWS in system:
-			self.__send_windows()
-		else:
-			raise SystemError('notifications are not supported for {} system'.format(system))
+		with _shared_lock:
+			shared_backend().send(self)
+
+
+class NotificationBackend(ABC):
+	"""
+	Shows notifications to the user. 'send' may block, so backends are called
+	from the thread of NotificationDispatcher and are used by that thread only.
+	"""
+
+	@abstractmethod
+	def send(self, notification):
+		pass
+
+	def close(self):
+		pass
 
-	# sends notification if running on Linux system
-	def __send_linux(self):
-		import subprocess
+
+class SubprocessBackend(NotificationBackend):
+	"""
+	Runs 'notify-send' for every notification.
+	"""
+
+	COMMAND = 'notify-send'
+
+	# in seconds
+	TIMEOUT = 5
+
+	def send(self, notification):
 		command = [
-			'notify-send', '"{}"'.format(self.__title),
-			'"{}"'.format(self.__description),
-			'-u', self.__urgency,
-			'-t', '{}'.format(self.__duration * 1000)
+			self.COMMAND, notification.title, notification.description,
+			'-u', notification.urgency,
+			'-t', '{}'.format(notification.duration * 1000)
 		]
-		if self.__icon_path is not None:
-			command += ['-i', self.__icon_path]
-		subprocess.call(command)
+		if notification.icon_path is not None:
+			command += ['-i', notification.icon_path]
+		try:
+			subprocess.run(command, check=True, timeout=self.TIMEOUT)
+		except (OSError, subprocess.SubprocessError) as exc:
+			raise NotificationError('{} failed: {}'.format(self.COMMAND, exc))
+
+
+class DBusBackend(NotificationBackend):
+	"""
+	Calls 'Notify' of org.freedesktop.Notifications service through one
+	connection to the session bus, or to the bus at 'address', which is kept
+	open between notifications.
+
+	Ids returned by the service are remembered for the last MAX_REPLACE_IDS
+	notification keys, so a notification replaces the shown one with the same
+	key instead of stacking under it.
+
+	While the bus or the service is not available notifications are sent by
+	'fallback' if it is given, connecting is retried after RECONNECT_DELAY.
+	"""
+
+	SERVICE = 'org.freedesktop.Notifications'
+	PATH = '/org/freedesktop/Notifications'
+	INTERFACE = 'org.freedesktop.Notifications'
+
+	URGENCY_LEVELS = {
+		Notification.URGENCY_LOW: 0,
+		Notification.URGENCY_NORMAL: 1,
+		Notification.URGENCY_CRITICAL: 2
+	}
+
+	MAX_REPLACE_IDS = 1000
+
+	# in seconds
+	RECONNECT_DELAY = 60
+
+	def __init__(self, app_name, address=None, fallback=None):
+		self.app_name = app_name
+		self.address = address
+		self.fallback = fallback
+		self.__connection_name = 'notifications-{}'.format(id(self))
+		self.__interface = None
+		self.__retry_at = 0
+		self.__ids = OrderedDict()
 
-	# sends notification if running on Windows system
-	def __send_windows(self):
+	@property
+	def is_connected(self):
+		return self.__interface is not None
+
+	@staticmethod
+	def typed(value, type_id):
+		from PyQt5.QtCore import QVariant
+		variant = QVariant(value)
+		variant.convert(type_id)
+		return variant
+
+	def notify_args(self, notification, replaces_id=0):
+		"""
+		Returns arguments of 'Notify' method.
+		"""
+		from PyQt5.QtCore import QMetaType
+		from PyQt5.QtDBus import QDBusArgument
+		return [
+			self.app_name,
+			self.typed(replaces_id, QMetaType.UInt),
+			notification.icon_path or '',
+			notification.title,
+			notification.description,
+			QDBusArgument([], QMetaType.QStringList),
+			{'urgency': self.typed(self.URGENCY_LEVELS[notification.urgency], QMetaType.UChar)},
+			self.typed(notification.duration * 1000, QMetaType.Int)
+		]
+
+	def send(self, notification):
+		try:
+			self.__notify(notification)
+		except NotificationError:
+			if self.fallback is None:
+				raise
+			self.fallback.send(notification)
+
+	def close(self):
+		self.__disconnect()
+		if self.fallback is not None:
+			self.fallback.close()
+
+	def __connect(self):
+		if time.monotonic() < self.__retry_at:
+			raise NotificationError('{} is not available'.format(self.SERVICE))
+		try:
+			from PyQt5.QtDBus import QDBusConnection, QDBusInterface
+		except ImportError:
+			self.__retry_at = float('inf')
+			raise NotificationError('notifications are not supported, can\'t import QtDBus')
+		if self.address is None:
+			connection = QDBusConnection.connectToBus(QDBusConnection.SessionBus, self.__connection_name)
+		else:
+			connection = QDBusConnection.connectToBus(self.address, self.__connection_name)
+		interface = QDBusInterface(self.SERVICE, self.PATH, self.INTERFACE, connection)
+		if not connection.isConnected() or not interface.isValid():
+			error = connection.lastError() if not connection.isConnected() else interface.lastError()
+			self.__fail('{} is not available: {}'.format(self.SERVICE, error.message()))
+		self.__interface = interface
+
+	def __fail(self, message):
+		self.__retry_at = time.monotonic() + self.RECONNECT_DELAY
+		self.__disconnect()
+		raise NotificationError(message)
+
+	def __disconnect(self):
+		self.__interface = None
+		try:
+			from PyQt5.QtDBus import QDBusConnection
+		except ImportError:
+			return
+		QDBusConnection.disconnectFromBus(self.__connection_name)
+
+	def __notify(self, notification):
+		from PyQt5.QtDBus import QDBusMessage
+		if self.__interface is None:
+			self.__connect()
+		replaces_id = self.__ids.get(notification.key, 0) if notification.key is not None else 0
+		reply = self.__interface.call('Notify', *self.notify_args(notification, replaces_id))
+		if reply.type() == QDBusMessage.ErrorMessage:
+			self.__fail(reply.errorMessage())
+		if notification.key is not None:
+			self.__ids[notification.key] = reply.arguments()[0]
+			self.__ids.move_to_end(notification.key)
+			if len(self.__ids) > self.MAX_REPLACE_IDS:
+				self.__ids.popitem(last=False)
+
+
+class ToastBackend(NotificationBackend):
+	"""
+	Shows Windows toast notifications.
+	"""
+
+	def send(self, notification):
 		try:
 			import win10toast
-			win10toast.ToastNotifier().show_toast(
-				threaded=True,
-				title=self.__title,
-				msg=self.__description,
-				duration=self.__duration,
-				icon_path=self.__icon_path
-			)
 		except ImportError:
 			raise ImportError('notifications are not supported, can\'t import necessary library')
+		win10toast.ToastNotifier().show_toast(
+			threaded=True,
+			title=notification.title,
+			msg=notification.description,
+			duration=notification.duration,
+			icon_path=notification.icon_path
+		)
+
+
+class SinkBackend(NotificationBackend):
+	"""
+	Keeps sent notifications in 'sent' instead of showing them, for tests.
+	"""
+
+	def __init__(self):
+		self.sent = []
+		self.__lock = threading.Lock()
+
+	def send(self, notification):
+		with self.__lock:
+			self.sent.append(notification)
+
+
+_shared = None
+_shared_lock = threading.RLock()
+
+
+def shared_backend():
+	"""
+	Returns the backend of the current system which is created on the first
+	call and then kept, so its connection is reused by every 'Notification.send'.
+	Calls of 'send' are serialized, backends are not shared between threads.
+	"""
+	global _shared
+	with _shared_lock:
+		if _shared is None:
+			_shared = default_backend()
+		return _shared
+
+
+def default_backend():
+	"""
+	Returns a new backend of the current system.
+	"""
+	system = platform.system()
+	if 'Linux' in system:
+		return DBusBackend(APP_NAME, fallback=SubprocessBackend())
+	elif 'Windows' in system:
+		return ToastBackend()
+	raise SystemError('notifications are not supported for {} system'.format(system))
@@ -0,0 +1,130 @@
+import heapq
+import threading
+
+from datetime import datetime
+
+
+class DeadlineScheduler:
+	"""
+	Keeps a min-heap of upcoming event deadlines.
+
+	Every scheduled event has a generation number, so rescheduling an event only
+	pushes new heap entries; outdated ones are dropped lazily when they reach the
+	top of the heap. Other threads report changes with 'invalidate', which wakes
+	the thread blocked in 'wait' immediately.
+	"""
+
+	NOTIFY = 'notify'
+	EXPIRE = 'expire'
+	RELOAD = 'reload'
+
+	# in seconds, upper bound of a single sleep to survive system clock changes
+	MAX_SLEEP = 60
+
+	def __init__(self, max_sleep=MAX_SLEEP):
+		self.__max_sleep = max_sleep
+		self.__heap = []
+		self.__generations = {}
+		self.__counter = 0
+		self.__changed = set()
+		self.__reload = True
+		self.__stopped = False
+		self.__cond = threading.Condition()
+
+	def __len__(self):
+		with self.__cond:
+			self.__drop_stale()
+			return len(self.__heap)
+
+	@property
+	def is_stopped(self):
+		return self.__stopped
+
+	def schedule(self, pk, deadlines):
+		"""
+		Replaces all deadlines of the event 'pk' by 'deadlines', a list of
+		(datetime, kind) pairs.
+		"""
+		with self.__cond:
+			self.__counter += 1
+			self.__generations[pk] = self.__counter
+			for deadline, kind in deadlines:
+				heapq.heappush(self.__heap, (deadline, self.__counter, pk, kind))
+			self.__cond.notify_all()
+
+	def unschedule(self, pk):
+		with self.__cond:
+			self.__generations.pop(pk, None)
+
+	def clear(self):
+		with self.__cond:
+			self.__heap.clear()
+			self.__generations.clear()
+
+	def invalidate(self, pk=None):
+		"""
+		Marks the event 'pk' as changed, or the whole schedule if 'pk' is None,
+		and wakes the waiting thread. Safe to call from any thread.
+		"""
+		with self.__cond:
+			if pk is None:
+				self.__reload = True
+			else:
+				self.__changed.add(pk)
+			self.__cond.notify_all()
+
+	def pop_changes(self):
+		"""
+		Returns a (reload, pks) pair describing what was invalidated since the
+		previous call.
+		"""
+		with self.__cond:
+			reload, changed = self.__reload, self.__changed
+			self.__reload, self.__changed = False, set()
+			return reload, changed
+
+	def next_deadline(self):
+		with self.__cond:
+			self.__drop_stale()
+			return self.__heap[0][0] if self.__heap else None
+
+	def wait(self):
+		"""
+		Blocks until the earliest deadline is reached, the schedule is invalidated
+		or the scheduler is stopped. Returns a list of due (pk, kind) pairs which
+		may be empty if the thread was woken for another reason.
+		"""
+		with self.__cond:
+			if not self.__has_pending_work():
+				self.__drop_stale()
+				timeout = self.__max_sleep
+				if self.__heap:
+					timeout = min(timeout, (self.__heap[0][0] - datetime.now()).total_seconds())
+				if timeout > 0:
+					self.__cond.wait(timeout)
+			return self.__pop_due(datetime.now())
+
+	def stop(self):
+		with self.__cond:
+			self.__stopped = True
+			self.__cond.notify_all()
+
+	def __has_pending_work(self):
+		return self.__stopped or self.__reload or len(self.__changed) > 0
+
+	def __pop_due(self, now):
+		due = []
+		while self.__heap:
+			deadline, generation, pk, kind = self.__heap[0]
+			if self.__generations.get(pk) != generation:
+				heapq.heappop(self.__heap)
+			elif deadline <= now:
+				heapq.heappop(self.__heap)
+				due.append((pk, kind))
+			else:
+				break
+		return due
+
+	def __drop_stale(self):
+		while self.__heap and self.__generations.get(self.__heap[0][2]) != self.__heap[0][1]:
+			heapq.heappop(self.__heap)
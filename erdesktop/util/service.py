@@ -1,77 +1,181 @@
 import time
 
-from PyQt5.QtCore import QThread
+from PyQt5.QtCore import Qt, QThread
 
-from datetime import date, datetime, timedelta
+from datetime import datetime, timedelta
 
 from erdesktop.system import system
 from erdesktop.storage import Storage
-from erdesktop.util import logger, log_msg
+from erdesktop.util import logger
 from erdesktop.settings import Settings, APP_NAME
 from erdesktop.util.notification import Notification
+from erdesktop.util.dispatcher import NotificationDispatcher
+from erdesktop.util.exceptions import NotificationError
+from erdesktop.util.scheduler import DeadlineScheduler
 
 
 class ReminderService(QThread):
+	"""
+	Sends notifications about upcoming and expired events.
 
-	def __init__(self, parent, calendar):
+	Notify and expire deadlines of all pending events are kept in a DeadlineScheduler,
+	so the service sleeps until the earliest one instead of polling the database.
+	Storage change listener wakes it up earlier when any event is created, updated
+	or deleted, and only changed events are re-read from the database.
+
+	Only events which are due within the remind window plus LOOKAHEAD are loaded,
+	a RELOAD deadline at the end of LOOKAHEAD loads the next portion.
+
+	Changes of all events which are due at once are saved in one transaction.
+
+	Changes of the remind time settings wake the service up to rebuild the schedule.
+
+	Notifications are sent by a NotificationDispatcher in the background, so
+	a burst of due events does not wait for the notification backend, which is
+	the backend of the current system if 'notification_backend' is not given.
+	If the dispatcher queue is full the event is retried after RETRY_DELAY.
+
+	'shutdown' stops the service and waits for its thread, it has to be called
+	before the application quits.
+	"""
+
+	# in seconds
+	RETRY_DELAY = 1
+	LOOKAHEAD = 3600
+
+	# in milliseconds
+	SHUTDOWN_TIMEOUT = 5000
+
+	def __init__(self, parent, calendar, notification_backend=None, storage=None):
 		super().__init__(parent=parent)
 		self.__calendar = calendar
-		self.__settings = Settings()
-		self.__storage = Storage()
+		self.__settings = Settings.shared()
+		self.__storage = storage if storage is not None else Storage()
+		self.__scheduler = DeadlineScheduler()
+		self.__dispatcher = NotificationDispatcher(notification_backend)
+		self.__remind_time = None
+
+	def stop(self):
+		self.__scheduler.stop()
+
+	def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+		"""
+		Stops the service and waits at most 'timeout' milliseconds until its thread
+		finishes. Returns False if the thread is still running.
+		"""
+		self.stop()
+		return self.wait(timeout)
 
 	def run(self):
+		Storage.add_change_listener(self.__scheduler.invalidate)
+		signals = self.__settings.signals
+
+		# noinspection PyUnresolvedReferences
+		signals.remind_time_before_event_changed.connect(self.__remind_time_changed, Qt.DirectConnection)
+
+		# noinspection PyUnresolvedReferences
+		signals.remind_time_unit_changed.connect(self.__remind_time_changed, Qt.DirectConnection)
 		try:
+			self.__dispatcher.start()
 			self.__storage.connect()
-			try:
-				self.__process_events(today=date.today())
-			except Exception as exc:
-				logger.error(log_msg('Service error, can not process non-today events: {}'.format(exc)))
-			while True:
+			while not self.__scheduler.is_stopped:
 				try:
-					time.sleep(1)
-					self.__process_events(today=date.today(), date_filter=date.today())
+					self.__refresh_schedule()
 				except Exception as exc:
-					logger.error(log_msg('Processing event error: {}'.format(exc)))
+					logger.error('Service error, can not refresh schedule: %s', exc)
+					self.__scheduler.invalidate()
+					time.sleep(self.RETRY_DELAY)
+					continue
+				self.__process_events(self.__scheduler.wait())
 		except Exception as exc:
-			logger.error(log_msg('Service error: {}'.format(exc), 8))
+			logger.error('Service error: %s', exc)
 		finally:
-			self.storage.disconnect()
+			# noinspection PyUnresolvedReferences
+			signals.remind_time_before_event_changed.disconnect(self.__remind_time_changed)
+
+			# noinspection PyUnresolvedReferences
+			signals.remind_time_unit_changed.disconnect(self.__remind_time_changed)
+			Storage.remove_change_listener(self.__scheduler.invalidate)
+			self.__dispatcher.stop()
+			self.__storage.disconnect()
+
+	def __remind_time_changed(self, *__args):
+		self.__scheduler.invalidate()
 
-	def __process_events(self, today, date_filter=None):
+	def __refresh_schedule(self):
 		remind_time = self.__settings.remind_time_before_event(True)
-		events = self.__storage.get_events(date_filter, delta=remind_time)
-		need_to_update = False
-		for event in events:
+		reload, changed = self.__scheduler.pop_changes()
+		if reload or remind_time != self.__remind_time:
+			self.__remind_time = remind_time
+			self.__scheduler.clear()
 			now = datetime.now()
-			now_plus_delta = (
-				now + timedelta(minutes=remind_time if remind_time >= 1 else 0)
-			).replace(microsecond=0)
-			if event.is_past is False and ((event.date == now.date() and event.time <= now_plus_delta.time()) or event.date < now_plus_delta.date()):
-				if event.expired(now):
-					self.__send_notification(event)
-					if event.repeat_weekly is True:
-						new_date = event.date
-						while new_date <= today:
-							new_date += timedelta(days=7)
-						self.__storage.update_event(pk=event.id, e_date=new_date)
-					else:
-						if self.__settings.remove_event_after_time_up is True:
-							self.__storage.delete_event(event.id)
-						else:
-							self.__storage.update_event(pk=event.id, is_past=True, is_notified=1)
-					need_to_update = True
-				else:
-					if event.is_notified == 0:
-						self.__send_notification(event)
-						self.__storage.update_event(pk=event.id, is_notified=1)
+			pending = self.__storage.get_due_events(
+				now + timedelta(minutes=max(remind_time, 0), seconds=self.LOOKAHEAD)
+			)
+			self.__scheduler.schedule(None, [(now + timedelta(seconds=self.LOOKAHEAD), DeadlineScheduler.RELOAD)])
+		else:
+			pending = []
+			for pk in changed:
+				self.__scheduler.unschedule(pk)
+				pending += self.__storage.get_pending_events(pk)
+		for pk, event_datetime, is_notified in pending:
+			self.__scheduler.schedule(pk, self.__deadlines(event_datetime, is_notified))
+
+	def __deadlines(self, event_datetime, is_notified):
+		deadlines = [(event_datetime, DeadlineScheduler.EXPIRE)]
+		if not is_notified and self.__remind_time >= 1:
+			deadlines.append((event_datetime - timedelta(minutes=self.__remind_time), DeadlineScheduler.NOTIFY))
+		return deadlines
+
+	def __process_events(self, due):
+		if any(kind == DeadlineScheduler.RELOAD for __pk, kind in due):
+			self.__scheduler.invalidate()
+		due = [(pk, kind) for pk, kind in due if kind != DeadlineScheduler.RELOAD]
+		if len(due) == 0:
+			return
+		need_to_update = False
+		try:
+			with self.__storage.transaction():
+				for pk, kind in due:
+					try:
+						need_to_update = self.__process_event(pk, kind) or need_to_update
+					except Exception as exc:
+						logger.error('Processing event error: %s', exc)
+						self.__scheduler.schedule(pk, [(datetime.now() + timedelta(seconds=self.RETRY_DELAY), kind)])
+		except Exception as exc:
+			logger.error('Service error, can not save processed events: %s', exc)
+			self.__scheduler.invalidate()
 		if need_to_update:
 			self.__calendar.update()
 
+	def __process_event(self, pk, kind):
+		event = self.__storage.get_event_by_id(pk)
+		if event is None or event.is_past is True:
+			return False
+		now = datetime.now()
+		if event.expired(now):
+			self.__send_notification(event)
+			if event.recurrence is not None:
+				next_time = event.recurrence.next_after(datetime.combine(event.date, event.time), now)
+				self.__storage.update_event(pk=event.id, e_date=next_time.date(), is_notified=0)
+			elif self.__settings.remove_event_after_time_up is True:
+				self.__storage.delete_event(event.id)
+			else:
+				self.__storage.update_event(pk=event.id, is_past=True, is_notified=1)
+			return True
+		if kind == DeadlineScheduler.NOTIFY and not event.is_notified:
+			self.__send_notification(event)
+			self.__storage.update_event(pk=event.id, is_notified=1)
+		return False
+
 	def __send_notification(self, event):
-		Notification(
+		notification = Notification(
 			title=APP_NAME,
 			icon_path=self.__settings.app_icon(not system.is_linux(), q_icon=False, small=True),
 			description='{}\n\n{}'.format(event.title, event.description),
 			duration=self.__settings.notification_duration,
-			urgency=Notification.URGENCY_CRITICAL
-		).send()
+			urgency=Notification.URGENCY_CRITICAL,
+			key=event.id
+		)
+		if not self.__dispatcher.submit(notification):
+			raise NotificationError('notification queue is full')
@@ -0,0 +1,104 @@
+import sys
+import time
+import builtins
+import threading
+
+from contextlib import contextmanager
+
+
+class StartupTimer:
+	"""
+	Measures phases of application startup. Phases are timed by 'phase'
+	blocks, 'idle' marks the moment when the event loop becomes idle for the
+	first time, i.e. the startup is finished.
+	"""
+
+	def __init__(self):
+		self.started = time.perf_counter()
+		self.phases = []
+		self.idle_at = None
+
+	@contextmanager
+	def phase(self, name):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.phases.append((name, (time.perf_counter() - start) * 1000))
+
+	def idle(self):
+		if self.idle_at is None:
+			self.idle_at = time.perf_counter()
+
+	@property
+	def total(self):
+		"""
+		Time in milliseconds from creating the timer to idle, or to now if the
+		event loop was not idle yet.
+		"""
+		end = self.idle_at if self.idle_at is not None else time.perf_counter()
+		return (end - self.started) * 1000
+
+	def report(self):
+		"""
+		Returns a table of phase durations in milliseconds.
+		"""
+		rows = list(self.phases) + [('total to idle', self.total)]
+		width = max(len(name) for name, _ in rows)
+		return '\n'.join('{:<{}}  {:>9.2f} ms'.format(name, width, duration) for name, duration in rows)
+
+
+class ImportProfiler:
+	"""
+	Measures time of importing modules while it is started. For every module
+	imported for the first time it records the total time, including modules
+	it imports itself, and the self time without them.
+	"""
+
+	def __init__(self):
+		self.timings = {}
+		self.__original = None
+		self.__local = threading.local()
+
+	def start(self):
+		self.__original = builtins.__import__
+		builtins.__import__ = self.__import
+
+	def stop(self):
+		if self.__original is not None:
+			builtins.__import__ = self.__original
+			self.__original = None
+
+	@staticmethod
+	def __is_loaded(name, fromlist):
+		module = sys.modules.get(name)
+		return module is not None and all(hasattr(module, x) for x in fromlist or ())
+
+	def __import(self, name, globals=None, locals=None, fromlist=(), level=0):
+		if self.__is_loaded(name, fromlist):
+			return self.__original(name, globals, locals, fromlist, level)
+		key = name if name not in sys.modules else '{}.{}'.format(name, ','.join(fromlist))
+		stack = self.__local.__dict__.setdefault('stack', [])
+		stack.append(0.0)
+		start = time.perf_counter()
+		try:
+			return self.__original(name, globals, locals, fromlist, level)
+		finally:
+			elapsed = time.perf_counter() - start
+			nested = stack.pop()
+			if stack:
+				stack[-1] += elapsed
+			if key not in self.timings:
+				self.timings[key] = (elapsed * 1000, (elapsed - nested) * 1000)
+
+	def report(self, limit=20):
+		"""
+		Returns a table of 'limit' slowest imports by total time in milliseconds.
+		"""
+		rows = sorted(self.timings.items(), key=lambda x: x[1][0], reverse=True)[:limit]
+		if not rows:
+			return ''
+		width = max(len(name) for name, _ in rows)
+		lines = ['{:<{}}  {:>9}  {:>9}'.format('module', width, 'total, ms', 'self, ms')]
+		lines += ['{:<{}}  {:>9.2f}  {:>9.2f}'.format(name, width, total, own) for name, (total, own) in rows]
+		return '\n'.join(lines)
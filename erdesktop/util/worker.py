@@ -2,7 +2,7 @@ import sys
 import traceback
 
 from erdesktop.settings import DEBUG
-from erdesktop.util.logger import logger, log_msg
+from erdesktop.util.logger import logger
 
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, QRunnable
 
@@ -35,8 +35,9 @@ class Worker(QRunnable):
 			if DEBUG:
 				traceback.print_exc()
 			exc_type, value = sys.exc_info()[:2]
-			logger.error(log_msg(self.err_format.format(value)))
-			self.signals.error.emit((exc_type, self.err_format.format(value), traceback.format_exc()))
+			message = self.err_format.format(value)
+			logger.error(message)
+			self.signals.error.emit((exc_type, message, traceback.format_exc()))
 		else:
 			self.signals.success.emit()
 			self.signals.param_success.emit(result)
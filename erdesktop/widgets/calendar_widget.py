@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 from PyQt5.QtGui import QFont, QColor, QPen
 from PyQt5.QtCore import Qt, QRect, QDate, QThreadPool
@@ -6,18 +6,19 @@ from PyQt5.QtWidgets import QCalendarWidget, QMenu, QMessageBox
 
 from erdesktop.storage import Storage
 from erdesktop.settings import Settings
-from erdesktop.cloud import CloudStorage
-from erdesktop.util import logger, log_msg, Worker
+from erdesktop.util import logger, Worker
 from erdesktop.widgets.util import info, error, popup
 from erdesktop.settings import FONT_LARGE, FONT_NORMAL
-from erdesktop.dialogs.about_dialog import AboutDialog
 from erdesktop.util.exceptions import DatabaseException
-from erdesktop.dialogs.backup_dialog import BackupDialog
-from erdesktop.dialogs.account_dialog import AccountDialog
-from erdesktop.dialogs.settings_dialog import SettingsDialog
-from erdesktop.dialogs.event_details_dialog import EventDetailsDialog
 from erdesktop.settings.default import BADGE_COLOR, BADGE_LETTER_COLOR
 
+BADGE_QCOLOR = QColor(BADGE_COLOR)
+BADGE_LETTER_QCOLOR = QColor(BADGE_LETTER_COLOR)
+BADGE_WHITE_COLOR = QColor(255, 255, 255)
+PAST_BADGE_COLOR = QColor(0, 0, 0)
+OTHER_MONTH_BADGE_COLOR = QColor(196, 196, 196)
+BADGE_TEXT_PEN = QPen(BADGE_WHITE_COLOR)
+
 
 class CalendarWidget(QCalendarWidget):
 
@@ -31,6 +32,9 @@ class CalendarWidget(QCalendarWidget):
 		# noinspection PyUnresolvedReferences
 		self.clicked[QDate].connect(self.load_events)
 
+		# noinspection PyUnresolvedReferences
+		self.currentPageChanged.connect(self.page_changed)
+
 		self.setContentsMargins(0, 0, 0, 0)
 
 		self.events_list = kwargs.get('events_list', None)
@@ -41,57 +45,114 @@ class CalendarWidget(QCalendarWidget):
 
 		self.thread_pool = QThreadPool()
 
-		self.settings = Settings()
+		self.settings = Settings.shared()
 		font = QFont('SansSerif', self.settings.app_font)
 		self.setFont(font)
 		self.setPalette(self.settings.app_theme)
 
-		self.cloud_storage = CloudStorage()
-
-		params = {
-			'font': font,
-			'calendar': self,
-			'flags': self.parent.windowFlags(),
-			'palette': self.settings.app_theme,
-			'parent': self
-		}
+		# noinspection PyUnresolvedReferences
+		self.settings.signals.font_changed.connect(self.font_changed)
 
-		self.event_details_dialog = EventDetailsDialog(storage=self.storage, **params)
-		self.settings_dialog = SettingsDialog(cloud_storage=self.cloud_storage, **params)
-		self.backup_dialog = BackupDialog(storage=self.storage, cloud_storage=self.cloud_storage, **params)
+		# noinspection PyUnresolvedReferences
+		self.settings.signals.theme_changed.connect(self.theme_changed)
 
-		self.dialogs = [
-			self.event_details_dialog,
-			self.settings_dialog,
-			self.backup_dialog
-		]
+		self.__cloud_storage = None
+		self.__dialogs = {}
 
-		self.marked_dates = []
-		self.past_events = []
+		self.badges = {}
+		self.badge_texts = {}
+		self.badge_font_size = self.settings.app_font
 
 		self.update()
 
+	@property
+	def cloud_storage(self):
+		"""
+		Cloud client, created on the first use.
+		"""
+		if self.__cloud_storage is None:
+			from erdesktop.cloud import CloudStorage
+			self.__cloud_storage = CloudStorage()
+		return self.__cloud_storage
+
+	@property
+	def dialogs(self):
+		"""
+		Dialogs which are created so far.
+		"""
+		return list(self.__dialogs.values())
+
+	# dialog modules are imported on the first use, they pull in requests and qtawesome
+
+	@property
+	def event_details_dialog(self):
+		from erdesktop.dialogs.event_details_dialog import EventDetailsDialog
+		return self.__dialog(EventDetailsDialog, storage=self.storage)
+
+	@property
+	def settings_dialog(self):
+		from erdesktop.dialogs.settings_dialog import SettingsDialog
+		return self.__dialog(SettingsDialog, cloud_storage=self.cloud_storage)
+
+	@property
+	def backup_dialog(self):
+		from erdesktop.dialogs.backup_dialog import BackupDialog
+		return self.__dialog(BackupDialog, storage=self.storage, cloud_storage=self.cloud_storage)
+
+	def created_dialog(self, dialog_class):
+		"""
+		Returns the dialog of 'dialog_class' if it is already created, otherwise None.
+		"""
+		return self.__dialogs.get(dialog_class)
+
+	def __dialog(self, dialog_class, **kwargs):
+		"""
+		Returns the dialog of 'dialog_class' creating it with current font and
+		palette on the first call, so dialogs which are never opened are never built.
+		"""
+		dialog = self.__dialogs.get(dialog_class)
+		if dialog is None:
+			dialog = dialog_class(
+				font=QFont('SansSerif', self.settings.app_font),
+				calendar=self,
+				flags=self.parent.windowFlags(),
+				palette=self.settings.app_theme,
+				parent=self,
+				**kwargs
+			)
+			self.__dialogs[dialog_class] = dialog
+		return dialog
+
+	@staticmethod
+	def aggregates_to_badges(aggregates):
+		return {event_date: (count, has_past) for event_date, count, has_past in aggregates}
+
 	@staticmethod
-	def events_to_dates(events):
-		events_dates = []
-		past_events = []
-		for event in events:
-			events_dates.append(event.date)
-			if event.is_past:
-				past_events.append(event.date)
-		return events_dates, past_events
+	def visible_range(year, month):
+		"""
+		Returns the first and the last date which can be shown on the page of given
+		month, i.e. the month itself with leading and trailing weeks.
+		"""
+		first = date(year, month, 1)
+		last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+		return first - timedelta(days=14), last + timedelta(days=14)
 
 	def showEvent(self, event):
 		super().showEvent(event)
 		self.load_events(self.selectedDate())
 
+	def page_changed(self, year, month):
+		self.update()
+
 	def update(self, *__args):
 		try:
-			self.marked_dates, self.past_events = self.events_to_dates(self.storage.get_events())
+			self.badges = self.aggregates_to_badges(
+				self.storage.get_date_aggregates(*self.visible_range(self.yearShown(), self.monthShown()))
+			)
 		except DatabaseException:
 			info(self, self.tr('Unable to find related database, it will be created automatically'))
 		except Exception as exc:
-			logger.error(log_msg('Unknown error: {}'.format(exc)))
+			logger.error('Unknown error: %s', exc)
 			error(self, '{}: {}'.format(self.tr('Error occurred'), exc))
 		super(CalendarWidget, self).update(*__args)
 
@@ -111,12 +172,18 @@ class CalendarWidget(QCalendarWidget):
 
 	def paintCell(self, painter, rect, date, **kwargs):
 		QCalendarWidget.paintCell(self, painter, rect, date)
-		if date.toPyDate() in self.marked_dates:
-			self.paint_date(
-				date, painter, rect, self.marked_dates.count(date.toPyDate()), date.toPyDate() in self.past_events
-			)
+		badge = self.badges.get(date.toPyDate())
+		if badge is not None:
+			self.paint_date(date, painter, rect, *badge)
+
+	def font_changed(self, size):
+		self.reset_font(QFont('SansSerif', size))
+
+	def theme_changed(self, *__args):
+		self.reset_palette(self.settings.app_theme)
 
 	def reset_font(self, font):
+		self.badge_font_size = font.pointSize()
 		self.setFont(font)
 		self.parent.setFont(font)
 		for dialog in self.dialogs:
@@ -139,34 +206,36 @@ class CalendarWidget(QCalendarWidget):
 			minimum += (9 if font_size != FONT_LARGE else 15)
 		return minimum + (55 if num > 1 else 50)
 
+	def badge_text(self, num):
+		text = self.badge_texts.get(num)
+		if text is None:
+			num_repr = repr(num)
+			if len(num_repr) > 1 and int(num_repr[-2]) == 1:
+				text = self.tr('events')
+			elif 1 < int(num_repr[-1]) < 5:
+				text = self.tr('events*')
+			else:
+				text = self.tr('event{}'.format('s' if int(num_repr[-1]) > 1 or num % 2 == 0 else ''))
+			text = '{} {}'.format(num, text)
+			self.badge_texts[num] = text
+		return text
+
 	def paint_date(self, date, painter, rect, num, is_past):
-		font_not_large = self.settings.app_font != FONT_LARGE
+		font_not_large = self.badge_font_size != FONT_LARGE
 		ellipse_rect = QRect(
-			rect.x() + 3, rect.y() + 3, self.get_badge_width(num, self.settings.app_font), 20 if font_not_large else 25
+			rect.x() + 3, rect.y() + 3, self.get_badge_width(num, self.badge_font_size), 20 if font_not_large else 25
 		)
-		text_rect = QRect(ellipse_rect.x() - 3.1, ellipse_rect.y() + (7 if font_not_large else 10), 20, 20)
-		if self.monthShown() == date.month():
-			if is_past:
-				painter.setBrush(QColor(0, 0, 0))
-			else:
-				painter.setBrush(QColor(BADGE_COLOR))
+		text_rect = QRect(ellipse_rect.x() - 3, ellipse_rect.y() + (7 if font_not_large else 10), 20, 20)
+		is_month_shown = self.monthShown() == date.month()
+		if is_month_shown:
+			painter.setBrush(PAST_BADGE_COLOR if is_past else BADGE_QCOLOR)
 		else:
-			painter.setBrush(QColor(196, 196, 196))
+			painter.setBrush(OTHER_MONTH_BADGE_COLOR)
 		painter.setPen(Qt.NoPen)
 		painter.drawRect(ellipse_rect)
-		if self.monthShown() == date.month():
-			painter.setBrush(QColor(BADGE_LETTER_COLOR))
-		else:
-			painter.setBrush(QColor(255, 255, 255))
-		painter.setPen(QPen(QColor(255, 255, 255)))
-		num_repr = repr(num)
-		if len(num_repr) > 1 and int(num_repr[-2]) == 1:
-			text = self.tr('events')
-		elif 1 < int(num_repr[-1]) < 5:
-			text = self.tr('events*')
-		else:
-			text = self.tr('event{}'.format('s' if int(num_repr[-1]) > 1 or num % 2 == 0 else ''))
-		painter.drawText(text_rect.center(), '{} {}'.format(num, text))
+		painter.setBrush(BADGE_LETTER_QCOLOR if is_month_shown else BADGE_WHITE_COLOR)
+		painter.setPen(BADGE_TEXT_PEN)
+		painter.drawText(text_rect.center(), self.badge_text(num))
 
 	def edit_event_click(self):
 		self.event_details_dialog.reset_inputs(
@@ -194,31 +263,34 @@ class CalendarWidget(QCalendarWidget):
 				self.delete_events,
 				*(self.events_list.selected_ids(),)
 			)
-		else:
-			if self.storage.event_exists(self.events_list.selected_item.id):
-				self.perform_deleting(
-					self.tr('Deleting an event'),
-					'{}?'.format(self.tr('Do you really want to delete the event')),
-					self.storage.delete_event,
-					*(self.events_list.selected_item.id,)
-				)
+		elif self.events_list.selected_item is not None:
+			event = self.events_list.selected_item
+			if event.repeat_weekly:
+				question = self.tr('Do you really want to delete all occurrences of the repeating event')
+			else:
+				question = self.tr('Do you really want to delete the event')
+			# a missing event is skipped by 'delete_event', the list is reloaded anyway
+			self.perform_deleting(
+				self.tr('Deleting an event'),
+				question,
+				self.storage.delete_event,
+				*(event.id,)
+			)
 
 	def delete_events(self, events_ids):
-		for pk in events_ids:
-			if self.storage.event_exists(pk):
-				self.storage.delete_event(pk)
+		self.storage.delete_events(events_ids)
 
 	def load_events(self, date):
 		py_date = date.toPyDate()
 		try:
-			events = self.storage.get_events(py_date)
+			events = self.storage.get_day_events(py_date)
 			if len(events) > 0:
 				self.events_list.set_data(events)
 			else:
 				self.events_list.set_empty()
 			return True
 		except DatabaseException as exc:
-			logger.error(log_msg('database error: {}'.format(exc), 7))
+			logger.error('database error: %s', exc)
 			error(self, '{}\n{}'.format(self.tr('Database error'), exc))
 
 	def open_details_event(self):
@@ -236,6 +308,7 @@ class CalendarWidget(QCalendarWidget):
 		self.backup_dialog.exec_()
 
 	def open_account_info(self):
+		from erdesktop.dialogs.account_dialog import AccountDialog
 		dialog = AccountDialog(
 			flags=self.parent.windowFlags(),
 			palette=self.settings.app_theme,
@@ -248,6 +321,7 @@ class CalendarWidget(QCalendarWidget):
 		dialog.exec_()
 
 	def open_about(self):
+		from erdesktop.dialogs.about_dialog import AboutDialog
 		dialog = AboutDialog(
 			flags=self.parent.windowFlags(),
 			calendar=self,
@@ -1,61 +1,191 @@
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
-from PyQt5.QtWidgets import QListWidget, QListWidgetItem, QLabel, QSizePolicy, QAbstractItemView
+from PyQt5.QtGui import QPainter, QColor, QPalette, QFontMetrics
+from PyQt5.QtCore import Qt, QRect, QSize, QEvent, QModelIndex, QAbstractListModel, pyqtSignal
+from PyQt5.QtWidgets import QListView, QAbstractItemView, QStyledItemDelegate, QStyle, QStyleOptionViewItem
 
-from erdesktop.widgets.event_widget import EventWidget
 
+class EventListModel(QAbstractListModel):
+	"""
+	Exposes a list of EventModel objects to the view without creating widgets.
+	"""
 
-class EventListWidget(QListWidget):
+	EventRole = Qt.UserRole + 1
+
+	def __init__(self, parent=None):
+		super(EventListModel, self).__init__(parent)
+		self.__events = []
+
+	def rowCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else len(self.__events)
+
+	def data(self, index, role=Qt.DisplayRole):
+		if not index.isValid() or index.row() >= len(self.__events):
+			return None
+		event = self.__events[index.row()]
+		if role == Qt.DisplayRole:
+			return EventItemDelegate.title_text(event)
+		if role == self.EventRole:
+			return event
+		return None
+
+	def event_at(self, row):
+		return self.__events[row]
+
+	def set_events(self, events):
+		self.beginResetModel()
+		self.__events = list(events) if events is not None else []
+		self.endResetModel()
+
+
+class EventItemDelegate(QStyledItemDelegate):
+	"""
+	Paints title, time and description of an event straight from the model,
+	so only rows which are visible are laid out and drawn.
+	"""
+
+	MARGIN = 9
+	SPACING = 6
+	TEXT_FLAGS = Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap
+
+	def __init__(self, parent):
+		super(EventItemDelegate, self).__init__(parent)
+		self.__size_cache = {}
+
+	@staticmethod
+	def title_text(event):
+		return '{} | {}'.format(event.time.strftime('%H:%M'), event.title)
+
+	@staticmethod
+	def has_description(event):
+		return event.description is not None and len(event.description) != 0
+
+	def clear_cache(self):
+		self.__size_cache.clear()
+
+	def text_width(self):
+		return max(1, self.parent().viewport().width() - 2 * self.MARGIN)
+
+	def layout_texts(self, font_metrics, width, event):
+		"""
+		Returns heights of title and description blocks wrapped to 'width'.
+		"""
+		bounds = QRect(0, 0, width, 1 << 20)
+		title_height = font_metrics.boundingRect(bounds, self.TEXT_FLAGS, self.title_text(event)).height()
+		description_height = 0
+		if self.has_description(event):
+			description_height = font_metrics.boundingRect(bounds, self.TEXT_FLAGS, event.description).height()
+		return title_height, description_height
+
+	def description_offset(self, font_metrics, title_height):
+		return title_height + font_metrics.lineSpacing() + 2 * self.SPACING
+
+	def sizeHint(self, option, index):
+		width = self.text_width()
+		event = index.data(EventListModel.EventRole)
+		key = (index.row(), width, option.font.key(), self.title_text(event), event.description)
+		size = self.__size_cache.get(key)
+		if size is None:
+			font_metrics = QFontMetrics(option.font)
+			title_height, description_height = self.layout_texts(font_metrics, width, event)
+			height = title_height
+			if description_height > 0:
+				height = self.description_offset(font_metrics, title_height) + description_height
+			size = QSize(width + 2 * self.MARGIN, height + 2 * self.MARGIN)
+			self.__size_cache[key] = size
+		return size
+
+	def paint(self, painter, option, index):
+		event = index.data(EventListModel.EventRole)
+		style_option = QStyleOptionViewItem(option)
+		self.initStyleOption(style_option, index)
+		style_option.text = ''
+		style = option.widget.style() if option.widget is not None else None
+		if style is not None:
+			style.drawControl(QStyle.CE_ItemViewItem, style_option, painter, option.widget)
+
+		painter.save()
+		if option.state & QStyle.State_Selected:
+			painter.setPen(option.palette.color(QPalette.HighlightedText))
+		else:
+			painter.setPen(option.palette.color(QPalette.Text))
+		painter.setFont(option.font)
+		font_metrics = QFontMetrics(option.font)
+		rect = option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+		title_height, description_height = self.layout_texts(font_metrics, rect.width(), event)
+		painter.drawText(rect, self.TEXT_FLAGS, self.title_text(event))
+		if description_height > 0:
+			painter.drawText(
+				rect.adjusted(0, self.description_offset(font_metrics, title_height), 0, 0),
+				self.TEXT_FLAGS,
+				event.description
+			)
+		painter.restore()
+
+
+class EventListWidget(QListView):
+
+	itemSelectionChanged = pyqtSignal()
 
 	def __init__(self, **kwargs):
 		super(EventListWidget, self).__init__()
-
 		self.setContentsMargins(0, 0, 0, 0)
-
 		self.parent = kwargs.get('parent', None)
 		if self.parent is None:
 			raise RuntimeError('EventListWidget: parent is not set')
 
+		self.events_model = EventListModel(self)
+		self.delegate = EventItemDelegate(self)
+		self.setModel(self.events_model)
+		self.setItemDelegate(self.delegate)
+
 		self.setSelectionMode(QAbstractItemView.ExtendedSelection)
 		self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-		self.verticalScrollBar().setPageStep(1)
-		self.verticalScrollBar().setRange(0, 100)
+		self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+		self.setResizeMode(QListView.Adjust)
+		self.setLayoutMode(QListView.Batched)
+		self.setBatchSize(50)
 
+		# noinspection PyUnresolvedReferences
+		self.selectionModel().selectionChanged.connect(self.selection_changed)
 		self.set_empty()
 
+	def selection_changed(self, *__args):
+		self.itemSelectionChanged.emit()
+
 	@property
 	def selected_item(self):
-		if len(self.selectedItems()) > 0:
-			return self.itemWidget(self.selectedItems()[0]).event_data
+		rows = self.selectionModel().selectedRows()
+		if len(rows) > 0:
+			return self.events_model.event_at(rows[0].row())
 		return None
 
 	def selected_ids(self):
-		return [self.itemWidget(x).event_data.id for x in self.selectedItems()]
-
-	def append_event_item(self, event_item):
-		item = EventWidget(self, event_item)
-		list_item = QListWidgetItem(self)
-		list_item.setSizeHint(item.sizeHint())
-		self.setItemWidget(list_item, item)
+		return [self.events_model.event_at(x.row()).id for x in self.selectionModel().selectedRows()]
 
 	def set_data(self, data):
-		self.clear()
-		if data is not None:
-			for data_item in data:
-				self.append_event_item(data_item)
-		self.setCurrentRow(0)
+		self.delegate.clear_cache()
+		self.events_model.set_events(data)
+		if self.events_model.rowCount() > 0:
+			self.setCurrentIndex(self.events_model.index(0))
 
 	def set_empty(self):
-		self.clear()
-		lbl = QLabel(self.tr('No events'))
-		lbl.setAlignment(Qt.AlignCenter)
-		lbl.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-		lbl.setStyleSheet('color: gray;')
-		lbl.setFont(QFont('18'))
-		lbl.setContentsMargins(0, 10, 0, 0)
-
-		lbl_item = QListWidgetItem(self)
-		lbl_item.setFlags(Qt.NoItemFlags)
-		lbl_item.setSizeHint(lbl.sizeHint())
-
-		self.setItemWidget(lbl_item, lbl)
+		self.set_data(None)
+
+	def resizeEvent(self, event):
+		self.delegate.clear_cache()
+		super(EventListWidget, self).resizeEvent(event)
+
+	def changeEvent(self, event):
+		super(EventListWidget, self).changeEvent(event)
+		if event.type() == QEvent.FontChange:
+			# row heights were measured with the previous font
+			self.delegate.clear_cache()
+			self.doItemsLayout()
+
+	def paintEvent(self, event):
+		super(EventListWidget, self).paintEvent(event)
+		if self.events_model.rowCount() == 0:
+			painter = QPainter(self.viewport())
+			painter.setPen(QColor('gray'))
+			painter.drawText(
+				self.viewport().rect().adjusted(0, 10, 0, 0), Qt.AlignHCenter | Qt.AlignTop, self.tr('No events')
+			)
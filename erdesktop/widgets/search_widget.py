@@ -0,0 +1,124 @@
+from PyQt5.QtCore import QTimer, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QLineEdit, QHBoxLayout
+
+from erdesktop.util import Worker
+from erdesktop.widgets.util import PushButton, popup
+
+
+class SearchWidget(QWidget):
+	"""
+	Search box which shows events found by 'Storage.search' in the events list.
+
+	Querying starts DEBOUNCE_INTERVAL milliseconds after the last change of the
+	text and runs in a worker thread, results of queries which are outdated by
+	the time they finish are dropped. Results are shown by pages of PAGE_SIZE
+	events; one more event is requested to know if the next page exists.
+	'searchCleared' is emitted when the text is cleared.
+	"""
+
+	DEBOUNCE_INTERVAL = 300
+	PAGE_SIZE = 50
+
+	searchCleared = pyqtSignal()
+
+	def __init__(self, **kwargs):
+		super(SearchWidget, self).__init__(kwargs.get('parent', None))
+		self.storage = kwargs['storage']
+		self.events_list = kwargs['events_list']
+
+		self.__page = 0
+		self.__serial = 0
+
+		self.thread_pool = QThreadPool()
+		self.thread_pool.setMaxThreadCount(1)
+
+		self.timer = QTimer(self)
+		self.timer.setSingleShot(True)
+		self.timer.setInterval(self.DEBOUNCE_INTERVAL)
+
+		# noinspection PyUnresolvedReferences
+		self.timer.timeout.connect(self.search)
+
+		self.input = QLineEdit(self)
+		self.input.setPlaceholderText(self.tr('Search events'))
+		self.input.setClearButtonEnabled(True)
+
+		# noinspection PyUnresolvedReferences
+		self.input.textChanged.connect(self.text_changed)
+
+		self.btn_previous = PushButton('<', 30, 30, self.previous_page)
+		self.btn_next = PushButton('>', 30, 30, self.next_page)
+
+		layout = QHBoxLayout()
+		layout.setContentsMargins(0, 0, 0, 0)
+
+		# noinspection PyArgumentList
+		layout.addWidget(self.input)
+		layout.addWidget(self.btn_previous)
+		layout.addWidget(self.btn_next)
+		self.setLayout(layout)
+
+		self.set_paging(False, False)
+
+	@property
+	def is_active(self):
+		return len(self.input.text().split()) > 0
+
+	def set_paging(self, has_previous, has_next):
+		self.btn_previous.setVisible(has_previous or has_next)
+		self.btn_next.setVisible(has_previous or has_next)
+		self.btn_previous.setEnabled(has_previous)
+		self.btn_next.setEnabled(has_next)
+
+	def text_changed(self, *__args):
+		self.__page = 0
+		self.timer.start()
+
+	def reset(self):
+		"""
+		Clears the text without showing anything in the events list.
+		"""
+		self.timer.stop()
+		self.__serial += 1
+		self.__page = 0
+		self.input.blockSignals(True)
+		self.input.clear()
+		self.input.blockSignals(False)
+		self.set_paging(False, False)
+
+	def previous_page(self):
+		if self.__page > 0:
+			self.__page -= 1
+			self.search()
+
+	def next_page(self):
+		self.__page += 1
+		self.search()
+
+	def search(self):
+		self.timer.stop()
+		self.__serial += 1
+		if not self.is_active:
+			self.set_paging(False, False)
+			self.searchCleared.emit()
+			return
+		serial, page = self.__serial, self.__page
+		worker = Worker(self.storage.search, self.input.text(), self.PAGE_SIZE + 1, page * self.PAGE_SIZE)
+
+		# noinspection PyUnresolvedReferences
+		worker.signals.param_success.connect(lambda events: self.show_results(serial, page, events))
+
+		# noinspection PyUnresolvedReferences
+		worker.signals.error.connect(lambda err: self.popup_error(serial, err))
+		self.thread_pool.start(worker)
+
+	def show_results(self, serial, page, events):
+		if serial != self.__serial:
+			return
+		self.events_list.set_data(events[:self.PAGE_SIZE])
+		self.set_paging(page > 0, len(events) > self.PAGE_SIZE)
+
+	def popup_error(self, serial, err):
+		if serial != self.__serial:
+			return
+		popup.error(self, '{}'.format(err[1]))
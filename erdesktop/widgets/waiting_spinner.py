@@ -54,13 +54,13 @@ class WaitingSpinner(QWidget):
 		self.setFixedSize(size, size)
 
 	def _update_timer(self):
-		self._timer.setInterval(1000 / (self._number_of_lines * self._revolutions_per_second))
+		self._timer.setInterval(int(1000 / (self._number_of_lines * self._revolutions_per_second)))
 
 	def _update_position(self):
 		if self.parentWidget() and self._center_on_parent:
 			self.move(
-				self.parentWidget().width() / 2 - self.width() / 2,
-				self.parentWidget().height() / 2 - self.height() / 2
+				self.parentWidget().width() // 2 - self.width() // 2,
+				self.parentWidget().height() // 2 - self.height() // 2
 			)
 
 	@staticmethod
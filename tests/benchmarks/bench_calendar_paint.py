@@ -0,0 +1,116 @@
+"""
+Repaint time of the calendar page depending on the number of events on it,
+comparing badge lookups in plain lists with the precomputed date mapping.
+
+Usage:
+	python -m tests.benchmarks.bench_calendar_paint [SIZE ...]
+"""
+
+import os
+import sys
+import random
+
+from datetime import timedelta
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QApplication, QCalendarWidget
+
+from erdesktop.settings import Settings, FONT_NORMAL
+from erdesktop.widgets.calendar_widget import CalendarWidget
+
+from tests.benchmarks.util import sizes_from_args, temp_db_file, measure, print_table
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+PAGE_YEAR, PAGE_MONTH = 2019, 5
+
+
+class BenchCalendar(QCalendarWidget):
+	"""
+	Paints badges like CalendarWidget does, but without database and dialogs.
+	"""
+
+	paint_date = CalendarWidget.paint_date
+	badge_text = CalendarWidget.badge_text
+	get_badge_width = staticmethod(CalendarWidget.get_badge_width)
+
+	def __init__(self):
+		super().__init__()
+		self.badge_texts = {}
+		self.badge_font_size = FONT_NORMAL
+
+
+class ListBadgesCalendar(BenchCalendar):
+	"""
+	Reproduces badge lookups in plain lists used before the date mapping.
+	"""
+
+	def __init__(self, marked_dates, past_events, settings):
+		super().__init__()
+		self.marked_dates = marked_dates
+		self.past_events = past_events
+		self.settings = settings
+
+	def paintCell(self, painter, rect, cell_date, **kwargs):
+		QCalendarWidget.paintCell(self, painter, rect, cell_date)
+		if cell_date.toPyDate() in self.marked_dates:
+			self.badge_font_size = self.settings.app_font
+			self.paint_date(
+				cell_date, painter, rect, self.marked_dates.count(cell_date.toPyDate()),
+				cell_date.toPyDate() in self.past_events
+			)
+
+
+class MappingBadgesCalendar(BenchCalendar):
+
+	paintCell = CalendarWidget.paintCell
+
+	def __init__(self, badges):
+		super().__init__()
+		self.badges = badges
+
+
+def random_aggregates(size, seed=0):
+	rand = random.Random(seed)
+	start, end = CalendarWidget.visible_range(PAGE_YEAR, PAGE_MONTH)
+	days = (end - start).days + 1
+	counts = {}
+	for _ in range(size):
+		day = start + timedelta(days=rand.randrange(days))
+		counts[day] = counts.get(day, 0) + 1
+	return [(day, count, rand.random() < 0.3) for day, count in sorted(counts.items())]
+
+
+def render_time(widget):
+	widget.resize(800, 600)
+	widget.setCurrentPage(PAGE_YEAR, PAGE_MONTH)
+	pixmap = QPixmap(widget.size())
+	return measure(lambda: widget.render(pixmap), number=10)
+
+
+def main(args):
+	app = QApplication(sys.argv)
+	settings_file = temp_db_file('.ini')
+	rows = []
+	try:
+		settings = Settings(settings_file=settings_file)
+		for size in sizes_from_args(args, DEFAULT_SIZES):
+			aggregates = random_aggregates(size)
+			marked_dates, past_events = [], []
+			for day, count, has_past in aggregates:
+				marked_dates += [day] * count
+				if has_past:
+					past_events.append(day)
+			before = render_time(ListBadgesCalendar(marked_dates, past_events, settings))
+			after = render_time(MappingBadgesCalendar(CalendarWidget.aggregates_to_badges(aggregates)))
+			rows.append((size, '{:.3f}'.format(before), '{:.3f}'.format(after), '{:.1f}x'.format(before / after)))
+	finally:
+		os.remove(settings_file)
+	print_table(('events on page', 'lists, ms', 'mapping, ms', 'speedup'), rows)
+	app.quit()
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,85 @@
+"""
+Deleting and updating selected events with a read and a commit per event
+compared to single statements in one transaction.
+
+Usage:
+	python -m tests.benchmarks.bench_delete [SIZE ...]
+"""
+
+import os
+import sys
+import time
+
+from erdesktop.storage import Storage
+from erdesktop.storage.models import EventModel
+
+from tests.benchmarks.util import sizes_from_args, temp_db_file, populate, print_table
+
+DEFAULT_SIZES = [100, 1000]
+
+# number of events in the database, the first SIZE of them are deleted or updated
+TOTAL = 10000
+
+
+def per_event_delete(storage, db, pks):
+	"""
+	Reproduces deleting of selected events used before bulk deletes.
+	"""
+	for pk in pks:
+		if storage.event_exists(pk):
+			storage.delete_event(pk)
+
+
+def read_then_write_update(storage, db, pks):
+	"""
+	Reproduces updating used before partial updates: a read and a full row write
+	per event.
+	"""
+	cursor = db.cursor()
+	for pk in pks:
+		event = EventModel.get(cursor, pk)
+		event.is_notified = 1
+		EventModel.update(cursor, event)
+		db.commit()
+
+
+def bulk_delete(storage, db, pks):
+	storage.delete_events(pks)
+
+
+def partial_update(storage, db, pks):
+	for pk in pks:
+		storage.update_event(pk, is_notified=1)
+
+
+def elapsed(fn, db_file, pks):
+	db = populate(db_file, TOTAL)
+	storage = Storage(db_file=db_file)
+	try:
+		start = time.perf_counter()
+		fn(storage, db, pks)
+		return time.perf_counter() - start
+	finally:
+		storage.disconnect()
+		db.close()
+		os.remove(db_file)
+
+
+def main(args):
+	rows = []
+	for size in sizes_from_args(args, DEFAULT_SIZES):
+		pks = list(range(1, size + 1))
+		for name, before_fn, after_fn in (
+			('delete', per_event_delete, bulk_delete),
+			('update', read_then_write_update, partial_update)
+		):
+			before = elapsed(before_fn, temp_db_file(), pks)
+			after = elapsed(after_fn, temp_db_file(), pks)
+			rows.append((
+				size, name, '{:.1f}'.format(before * 1000), '{:.1f}'.format(after * 1000), '{:.1f}x'.format(before / after)
+			))
+	print_table(('events', 'operation', 'before, ms', 'after, ms', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
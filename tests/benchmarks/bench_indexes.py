@@ -0,0 +1,65 @@
+"""
+Lookup latency of the events table before and after schema migrations which
+add indexes and store dates and times as numbers.
+
+Usage:
+	python -m tests.benchmarks.bench_indexes [SIZE ...]
+"""
+
+import os
+import sys
+import random
+
+from datetime import datetime, timedelta
+
+from erdesktop.storage.models import EventModel
+from erdesktop.storage.sql import QUERY_SELECT_EVENTS_BY, QUERY_SELECT_PENDING_EVENTS
+
+from tests.benchmarks.util import sizes_from_args, temp_db_file, populate, measure, print_table, random_date
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+def run_queries(cursor, encode_date, seed=0):
+	rand = random.Random(seed)
+	by_date = QUERY_SELECT_EVENTS_BY.format('WHERE date = ?')
+	by_date_time = QUERY_SELECT_EVENTS_BY.format('WHERE date = ? AND time = ?')
+	due_soon = QUERY_SELECT_PENDING_EVENTS.format('AND date BETWEEN ? AND ?')
+	noon = datetime(2019, 1, 1, 12).time()
+	def due_soon_params():
+		start = random_date(rand)
+		return encode_date(start), encode_date(start + timedelta(days=1))
+
+	return (
+		measure(lambda: cursor.execute(by_date, (encode_date(random_date(rand)),)).fetchall()),
+		measure(lambda: cursor.execute(by_date_time, (
+			encode_date(random_date(rand)), noon.strftime(EventModel.TIME_FORMAT) if encode_date is text_date else noon
+		)).fetchall()),
+		measure(lambda: cursor.execute(due_soon, due_soon_params()).fetchall())
+	)
+
+
+def text_date(value):
+	return value.strftime(EventModel.DATE_FORMAT)
+
+
+def main(args):
+	rows = []
+	for size in sizes_from_args(args, DEFAULT_SIZES):
+		db_file = temp_db_file()
+		try:
+			db = populate(db_file, size, migrate=False)
+			cursor = db.cursor()
+			before = run_queries(cursor, text_date)
+			EventModel.create_table(cursor)
+			after = run_queries(cursor, lambda value: value)
+			db.close()
+		finally:
+			os.remove(db_file)
+		for name, b, a in zip(('by date', 'by date and time', 'not past, due soon'), before, after):
+			rows.append((size, name, '{:.3f}'.format(b), '{:.3f}'.format(a), '{:.1f}x'.format(b / a)))
+	print_table(('events', 'query', 'before, ms', 'after, ms', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,88 @@
+"""
+Construction time and memory of event models built from raw database rows:
+the previous model parsing date and time with strptime in '__init__' versus
+the slotted model parsing them lazily, and the slotted model built from rows
+typed by sqlite3 converters.
+
+Usage:
+	python -m tests.benchmarks.bench_models [SIZE ...]
+"""
+
+import os
+import sys
+import sqlite3
+import tracemalloc
+
+from datetime import datetime
+
+from erdesktop.storage.models import EventModel
+
+from tests.benchmarks.util import sizes_from_args, temp_db_file, populate, measure, print_table
+
+DEFAULT_SIZES = [100000]
+
+
+class DictEventModel:
+	"""
+	EventModel before it was slotted.
+	"""
+
+	def __init__(self, fields):
+		self.id = fields[0]
+		self.title = fields[1]
+		self.date = datetime.strptime(fields[2], EventModel.DATE_FORMAT).date()
+		self.time = datetime.strptime(fields[3][:8], EventModel.TIME_FORMAT).time()
+		self.description = fields[4]
+		self.is_past = fields[5] == 1
+		self.repeat_weekly = fields[6] == 1
+		self.is_notified = fields[7]
+
+
+def build(model_class, rows):
+	return [model_class(row) for row in rows]
+
+
+def build_and_read(model_class, rows):
+	return [(x.date, x.time) for x in build(model_class, rows)]
+
+
+def allocated_mb(model_class, rows):
+	tracemalloc.start()
+	models = build(model_class, rows)
+	size = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	del models
+	return size / 1024 / 1024
+
+
+def main(args):
+	rows = []
+	for size in sizes_from_args(args, DEFAULT_SIZES):
+		db_file = temp_db_file()
+		try:
+			populate(db_file, size).close()
+			db = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES)
+			typed_events = db.execute('SELECT * FROM Events;').fetchall()
+			db.close()
+		finally:
+			os.remove(db_file)
+		text_events = [
+			row[:2] + (EventModel.format_date(row[2]), EventModel.format_time(row[3])) + row[4:] for row in typed_events
+		]
+		for name, model_class, events in (
+			('dict, strptime, text rows', DictEventModel, text_events),
+			('slots, lazy, text rows', EventModel, text_events),
+			('slots, typed rows', EventModel, typed_events)
+		):
+			rows.append((
+				size,
+				name,
+				'{:.1f}'.format(measure(lambda: build(model_class, events), number=1)),
+				'{:.1f}'.format(measure(lambda: build_and_read(model_class, events), number=1)),
+				'{:.1f}'.format(allocated_mb(model_class, events))
+			))
+	print_table(('events', 'model', 'construct, ms', 'construct and read, ms', 'memory, MB'), rows)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
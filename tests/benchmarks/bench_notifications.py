@@ -0,0 +1,83 @@
+"""
+Time the reminder service spends on a burst of due events when every
+notification spawns a process on the service thread compared to submitting
+them to NotificationDispatcher. The 'true' command stands for 'notify-send'.
+
+Also compares the time of sending one notification by spawning a process and
+by a call over a persistent D-Bus connection to a private bus.
+
+Usage:
+	python -m tests.benchmarks.bench_notifications [SIZE ...]
+"""
+
+import sys
+import time
+
+from erdesktop.util.dispatcher import NotificationDispatcher
+from erdesktop.util.notification import Notification, SubprocessBackend, DBusBackend
+
+from tests.benchmarks.util import sizes_from_args, print_table, measure
+from tests.unittests.util.dbus_server import NotificationsTestServer
+
+DEFAULT_SIZES = [10, 50]
+
+
+class TrueBackend(SubprocessBackend):
+	COMMAND = 'true'
+
+
+def notifications(size):
+	return [Notification('Event Reminder', 'Event {}\n\ndescription'.format(i), key=i) for i in range(size)]
+
+
+def serial(size):
+	backend = TrueBackend()
+	start = time.perf_counter()
+	for notification in notifications(size):
+		backend.send(notification)
+	return (time.perf_counter() - start) * 1000
+
+
+def dispatched(size):
+	dispatcher = NotificationDispatcher(TrueBackend())
+	dispatcher.start()
+	start = time.perf_counter()
+	for notification in notifications(size):
+		dispatcher.submit(notification)
+	blocked = (time.perf_counter() - start) * 1000
+	dispatcher.stop()
+	return blocked, dispatcher.stats()
+
+
+def main(args):
+	rows = []
+	for size in sizes_from_args(args, DEFAULT_SIZES):
+		before = serial(size)
+		after, stats = dispatched(size)
+		rows.append((
+			size, '{:.2f}'.format(before), '{:.2f}'.format(after), stats['sent'], '{:.2f}'.format(stats['latency_max'])
+		))
+	print_table(('events', 'serial, ms', 'dispatcher, ms', 'processes', 'max latency, ms'), rows)
+	if NotificationsTestServer.is_available():
+		print()
+		send_time()
+
+
+def send_time():
+	notification = Notification('Event Reminder', 'Event\n\ndescription', key=1)
+	server = NotificationsTestServer().start()
+	backend = DBusBackend('Event Reminder', address=server.address)
+	try:
+		process = measure(lambda: TrueBackend().send(notification), number=20)
+		bus = measure(lambda: backend.send(notification), number=20)
+	finally:
+		backend.close()
+		server.stop()
+	print_table(
+		('process, ms', 'D-Bus, ms', 'speedup'),
+		[('{:.2f}'.format(process), '{:.2f}'.format(bus), '{:.1f}x'.format(process / bus))]
+	)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
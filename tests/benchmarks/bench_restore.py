@@ -0,0 +1,60 @@
+"""
+Restore time of a backup with per-row inserts compared to the bulk load path.
+
+Usage:
+	python -m tests.benchmarks.bench_restore [SIZE ...]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+
+from erdesktop.storage import Storage
+from erdesktop.storage.models import EventModel
+from erdesktop.storage.sql import QUERY_DELETE_ALL_EVENTS
+
+from tests.benchmarks.util import sizes_from_args, temp_db_file, generate_events, print_table
+
+DEFAULT_SIZES = [10000, 100000, 500000]
+
+FIELDS = ['title', 'date', 'time', 'description', 'is_past', 'repeat_weekly']
+
+
+def per_row_restore(cursor, events):
+	"""
+	Reproduces restoring used before the bulk load path.
+	"""
+	cursor.execute(QUERY_DELETE_ALL_EVENTS)
+	for item in events:
+		EventModel.insert(cursor, EventModel.from_dict(item))
+	cursor.connection.commit()
+
+
+def elapsed(fn, *args):
+	start = time.perf_counter()
+	fn(*args)
+	return time.perf_counter() - start
+
+
+def main(args):
+	rows = []
+	for size in sizes_from_args(args, DEFAULT_SIZES):
+		events = [dict(zip(FIELDS, x)) for x in generate_events(size)]
+		db_file = temp_db_file()
+		try:
+			db = sqlite3.connect(db_file)
+			EventModel.create_table(db.cursor())
+			before = elapsed(per_row_restore, db.cursor(), events)
+			db.close()
+			storage = Storage(db_file=db_file)
+			after = elapsed(lambda: storage.bulk_load((EventModel.dict_to_params(x) for x in events), replace=True))
+			storage.disconnect()
+		finally:
+			os.remove(db_file)
+		rows.append((size, '{:.2f}'.format(before), '{:.2f}'.format(after), '{:.1f}x'.format(before / after)))
+	print_table(('events', 'per row, s', 'bulk load, s', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,83 @@
+"""
+Throughput of EventModel.select with conditions formatted into the SQL text
+versus parameterized query shapes reused from the statement cache.
+
+Usage:
+	python -m tests.benchmarks.bench_select [SIZE ...]
+"""
+
+import os
+import sys
+import random
+
+from datetime import datetime, timedelta
+
+from erdesktop.storage.models import EventModel
+from erdesktop.storage.converters import adapt_date, adapt_time, adapt_date_time
+from erdesktop.storage.sql import QUERY_SELECT_EVENTS_BY, EVENTS_DATE_TIME_EXPR
+
+from tests.benchmarks.util import sizes_from_args, temp_db_file, populate, measure, print_table, random_date
+
+DEFAULT_SIZES = [1000, 100000]
+
+NUMBER = 2000
+
+
+def formatted_select(cursor, date=None, time=None, delta=None):
+	"""
+	EventModel.select before queries were parameterized, values are formatted in
+	the current storage encoding into the same conditions which EventModel.select
+	uses, so only formatting and parameterizing are compared.
+	"""
+	if date is not None and delta is not None:
+		start = datetime.combine(date, time if time is not None else datetime.min.time())
+		end = start + timedelta(minutes=delta)
+		condition = 'WHERE date BETWEEN {} AND {} AND {} BETWEEN {} AND {}'.format(
+			adapt_date(start.date()),
+			adapt_date(end.date()),
+			EVENTS_DATE_TIME_EXPR,
+			adapt_date_time(start),
+			adapt_date_time(end)
+		)
+		return [EventModel(item) for item in cursor.execute(QUERY_SELECT_EVENTS_BY.format(condition)).fetchall()]
+	condition = ''
+	if date is not None:
+		condition += '(date = {})'.format(adapt_date(date))
+	if time is not None:
+		if condition != '':
+			condition += ' AND '
+		condition += 'time = {}'.format(adapt_time(time))
+	if condition != '':
+		condition = 'WHERE ' + condition
+	return [EventModel(item) for item in cursor.execute(QUERY_SELECT_EVENTS_BY.format(condition)).fetchall()]
+
+
+def queries_per_second(select, cursor, seed=0):
+	rand = random.Random(seed)
+	calls = (
+		lambda: select(cursor, random_date(rand)),
+		lambda: select(cursor, random_date(rand), datetime(2019, 1, 1, rand.randrange(24)).time()),
+		lambda: select(cursor, random_date(rand), delta=rand.randrange(1, 1440))
+	)
+	return [1000 / measure(call, number=NUMBER) for call in calls]
+
+
+def main(args):
+	rows = []
+	for size in sizes_from_args(args, DEFAULT_SIZES):
+		db_file = temp_db_file()
+		try:
+			db = populate(db_file, size)
+			cursor = db.cursor()
+			before = queries_per_second(formatted_select, cursor)
+			after = queries_per_second(EventModel.select, cursor)
+			db.close()
+		finally:
+			os.remove(db_file)
+		for name, b, a in zip(('by date', 'by date and time', 'by date and delta'), before, after):
+			rows.append((size, name, '{:.0f}'.format(b), '{:.0f}'.format(a), '{:.2f}x'.format(a / b)))
+	print_table(('events', 'query', 'formatted, q/s', 'parameterized, q/s', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
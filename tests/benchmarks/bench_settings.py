@@ -0,0 +1,61 @@
+"""
+Time of reading settings used on hot paths directly from QSettings compared
+to reading them from the in-memory cache of 'Settings'.
+
+Usage:
+	python -m tests.benchmarks.bench_settings
+"""
+
+import os
+
+from PyQt5.QtCore import QSettings
+
+from erdesktop.settings import Settings, FONT, REMOVE_EVENT_AFTER_TIME_UP, REMIND_TIME, REMIND_UNIT
+from erdesktop.settings import type_conv as tc
+
+from tests.benchmarks.util import temp_db_file, measure, print_table
+
+READS = 1000
+
+
+def qsettings_reads(settings_file):
+	settings = QSettings(settings_file, QSettings.IniFormat)
+
+	def run():
+		for _ in range(READS):
+			int(settings.value('app_user/font', FONT))
+			tc.s_bool_(
+				settings.value('app_user/remove_event_after_time_up', tc.str_(REMOVE_EVENT_AFTER_TIME_UP))
+			)
+			int(settings.value('event_user/remind_time_before_event', REMIND_TIME))
+			int(settings.value('event_user/remind_time_unit', REMIND_UNIT))
+	return run
+
+
+def cached_reads(settings_file):
+	settings = Settings(settings_file=settings_file)
+
+	def run():
+		for _ in range(READS):
+			_ = settings.app_font
+			_ = settings.remove_event_after_time_up
+			settings.remind_time_before_event(True)
+	return run
+
+
+def main():
+	settings_file = temp_db_file('.ini')
+	try:
+		Settings(settings_file=settings_file).from_dict({})
+		before = measure(qsettings_reads(settings_file), number=10)
+		after = measure(cached_reads(settings_file), number=10)
+	finally:
+		os.remove(settings_file)
+	print_table(
+		('reads', 'QSettings, ms', 'cached, ms', 'speedup'),
+		[(READS * 4, '{:.2f}'.format(before), '{:.2f}'.format(after), '{:.1f}x'.format(before / after))]
+	)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,56 @@
+"""
+Time of every phase of application startup, and of creating the dialogs and
+the cloud client which are deferred until their first use.
+
+Settings, the database and the log are kept in a temporary data directory, so
+the data of the application is not touched, and the reminder service is not
+started. Use QT_QPA_PLATFORM=offscreen to run without a display.
+
+Usage:
+	python -m tests.benchmarks.bench_startup
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+# the data directory is read when the application modules are imported
+DATA_DIR = tempfile.TemporaryDirectory()
+os.environ['ERDESKTOP_DATA_PATH'] = DATA_DIR.name
+
+from PyQt5.QtWidgets import QApplication
+
+from erdesktop.app_main import startup
+from erdesktop.settings import APP_DATA_PATH
+from erdesktop.util.startup import StartupTimer
+
+from tests.benchmarks.util import print_table
+
+
+def main():
+	if not APP_DATA_PATH.startswith(DATA_DIR.name):
+		raise SystemExit('application data directory is not temporary: {}'.format(APP_DATA_PATH))
+	timer = StartupTimer()
+	with timer.phase('application'):
+		app = QApplication(sys.argv)
+		app.setStyle('Fusion')
+	window, _ = startup(app, timer, start_service=False)
+	try:
+		while timer.idle_at is None:
+			app.processEvents()
+		print(timer.report())
+		print()
+
+		rows = []
+		for name in ('cloud_storage', 'event_details_dialog', 'settings_dialog', 'backup_dialog'):
+			start = time.perf_counter()
+			getattr(window.calendar, name)
+			rows.append((name, '{:.2f}'.format((time.perf_counter() - start) * 1000)))
+		print_table(('deferred until first use', 'ms'), rows)
+	finally:
+		window.calendar.storage.disconnect()
+
+
+if __name__ == '__main__':
+	main()
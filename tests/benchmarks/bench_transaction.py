@@ -0,0 +1,65 @@
+"""
+Write throughput of creating, updating and deleting events with a commit per
+operation compared to operations grouped with 'Storage.transaction'.
+
+Usage:
+	python -m tests.benchmarks.bench_transaction [SIZE ...]
+"""
+
+import os
+import sys
+import time
+
+from datetime import datetime
+
+from erdesktop.storage import Storage
+
+from tests.benchmarks.util import sizes_from_args, temp_db_file, print_table
+
+DEFAULT_SIZES = [100, 1000]
+
+# operations grouped into one transaction
+BATCH_SIZE = 100
+
+
+def write(storage, size):
+	"""
+	Creates 'size' events, updates and then deletes each of them.
+	"""
+	when = datetime(2019, 5, 2, 10)
+	pks = [storage.create_event('title', when.date(), when.time(), 'descr', False).id for _ in range(size)]
+	for pk in pks:
+		storage.update_event(pk, is_notified=1)
+	for pk in pks:
+		storage.delete_event(pk)
+
+
+def grouped_write(storage, size):
+	for start in range(0, size, BATCH_SIZE):
+		with storage.transaction():
+			write(storage, min(BATCH_SIZE, size - start))
+
+
+def operations_per_second(fn, size):
+	db_file = temp_db_file()
+	storage = Storage(db_file=db_file)
+	try:
+		start = time.perf_counter()
+		fn(storage, size)
+		return size * 3 / (time.perf_counter() - start)
+	finally:
+		storage.disconnect()
+		os.remove(db_file)
+
+
+def main(args):
+	rows = []
+	for size in sizes_from_args(args, DEFAULT_SIZES):
+		before = operations_per_second(write, size)
+		after = operations_per_second(grouped_write, size)
+		rows.append((size * 3, '{:.0f}'.format(before), '{:.0f}'.format(after), '{:.1f}x'.format(after / before)))
+	print_table(('operations', 'per operation commit, op/s', 'grouped, op/s', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
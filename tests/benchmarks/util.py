@@ -0,0 +1,75 @@
+import os
+import random
+import sqlite3
+import tempfile
+import timeit
+
+from datetime import date, timedelta
+
+from erdesktop.storage.models import EventModel
+from erdesktop.storage.sql import QUERY_CREATE_EVENT_TABLE, QUERY_INSERT_EVENT
+
+# events are spread over this number of days starting from 'START_DATE'
+DAYS_RANGE = 3650
+START_DATE = date(2019, 1, 1)
+
+
+def sizes_from_args(args, default):
+	return [int(x) for x in args] if len(args) > 0 else default
+
+
+def temp_db_file(suffix='.db'):
+	fd, path = tempfile.mkstemp(suffix=suffix)
+	os.close(fd)
+	return path
+
+
+def random_date(rand):
+	return START_DATE + timedelta(days=rand.randrange(DAYS_RANGE))
+
+
+def generate_events(count, seed=0):
+	"""
+	Yields parameter tuples for 'QUERY_INSERT_EVENT'.
+	"""
+	rand = random.Random(seed)
+	for i in range(count):
+		yield (
+			'Event {}'.format(i),
+			random_date(rand).strftime(EventModel.DATE_FORMAT),
+			'{:02}:{:02}:00'.format(rand.randrange(24), rand.randrange(60)),
+			'Description of event {}'.format(i),
+			1 if rand.random() < 0.5 else 0,
+			1 if rand.random() < 0.1 else 0
+		)
+
+
+def populate(db_file, count, migrate=True):
+	"""
+	Creates a database with 'count' random events; if 'migrate' is False the
+	table is created without applying schema migrations.
+	"""
+	db = sqlite3.connect(db_file)
+	cursor = db.cursor()
+	if migrate:
+		EventModel.create_table(cursor)
+	else:
+		cursor.execute(QUERY_CREATE_EVENT_TABLE)
+	cursor.executemany(QUERY_INSERT_EVENT, generate_events(count))
+	db.commit()
+	return db
+
+
+def measure(fn, number=100, repeat=3):
+	"""
+	Returns the best average time of a single 'fn' call in milliseconds.
+	"""
+	return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1000
+
+
+def print_table(header, rows):
+	widths = [max(len(str(x)) for x in column) for column in zip(header, *rows)]
+	line_format = '  '.join('{{:>{}}}'.format(w) for w in widths)
+	print(line_format.format(*header))
+	for row in rows:
+		print(line_format.format(*row))
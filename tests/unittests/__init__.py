@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# settings, the database and the log of the application are kept in a temporary
+# directory while tests run; the directory is read when the application modules
+# are imported, so tests are discovered from 'tests' which is imported first
+if 'ERDESKTOP_DATA_PATH' not in os.environ:
+	DATA_DIR = tempfile.TemporaryDirectory()
+	os.environ['ERDESKTOP_DATA_PATH'] = DATA_DIR.name
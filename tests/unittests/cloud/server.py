@@ -0,0 +1,128 @@
+import json
+import threading
+
+from urllib.parse import parse_qs, urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from erdesktop.cloud import status
+
+
+class CloudRequestHandler(BaseHTTPRequestHandler):
+	"""
+	Serves the subset of the cloud api used by CloudStorage from memory.
+	"""
+
+	API_PREFIX = '/api/v1'
+
+	def log_message(self, *args):
+		pass
+
+	def __reply(self, code, body=None):
+		payload = json.dumps(body).encode('utf8') if body is not None else b''
+		self.send_response(code)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	def __read_body(self):
+		length = int(self.headers.get('Content-Length', 0))
+		body = self.rfile.read(length).decode('utf8')
+		if self.headers.get('Content-Type', '').startswith('application/json'):
+			return json.loads(body) if body else {}
+		return {key: values[0] for key, values in parse_qs(body).items()}
+
+	def __path(self):
+		path = urlparse(self.path).path
+		return path[len(self.API_PREFIX):] if path.startswith(self.API_PREFIX) else None
+
+	def __is_authorized(self):
+		return self.headers.get('Authorization') == 'Token {}'.format(self.server.token)
+
+	def do_GET(self):
+		path = self.__path()
+		if not self.__is_authorized():
+			self.__reply(status.HTTP_401_UNAUTHORIZED, {})
+		elif path == '/accounts/user':
+			self.__reply(status.HTTP_200_OK, {'username': self.server.username, 'max_backups': 100})
+		elif path == '/backups/':
+			self.__reply(status.HTTP_200_OK, [
+				{key: value for key, value in backup.items() if key != 'backup'} for backup in self.server.backups.values()
+			])
+		elif path.startswith('/backups/details/'):
+			backup = self.server.backups.get(path[len('/backups/details/'):])
+			if backup is None:
+				self.__reply(status.HTTP_404_NOT_FOUND, {})
+			else:
+				self.__reply(status.HTTP_200_OK, backup)
+		else:
+			self.__reply(status.HTTP_404_NOT_FOUND, {})
+
+	def do_POST(self):
+		path = self.__path()
+		data = self.__read_body()
+		if path == '/login':
+			if data.get('username') == self.server.username and data.get('password') == self.server.password:
+				self.__reply(status.HTTP_200_OK, {'key': self.server.token})
+			else:
+				self.__reply(status.HTTP_400_BAD_REQUEST, {})
+		elif not self.__is_authorized():
+			self.__reply(status.HTTP_401_UNAUTHORIZED, {})
+		elif path == '/logout':
+			self.__reply(status.HTTP_200_OK, {})
+		elif path == '/backups/create':
+			self.__create_backup(data)
+		elif path.startswith('/backups/delete/'):
+			if self.server.backups.pop(path[len('/backups/delete/'):], None) is None:
+				self.__reply(status.HTTP_404_NOT_FOUND, {})
+			else:
+				self.__reply(status.HTTP_201_CREATED, {})
+		else:
+			self.__reply(status.HTTP_404_NOT_FOUND, {})
+
+	def __create_backup(self, data):
+		if data.get('digest') in self.server.backups:
+			self.__reply(status.HTTP_400_BAD_REQUEST, {})
+		elif data.get('parent') and data['parent'] not in self.server.backups:
+			self.__reply(status.HTTP_409_CONFLICT, {})
+		else:
+			self.server.backups[data['digest']] = {
+				'digest': data['digest'],
+				'timestamp': data['timestamp'],
+				'backup': data['backup'],
+				'backup_size': data['backup_size'],
+				'events_count': int(data['events_count']),
+				'contains_settings': data['contains_settings'] == 'True',
+				'parent': data.get('parent')
+			}
+			self.__reply(status.HTTP_201_CREATED, {})
+
+
+class CloudTestServer(ThreadingHTTPServer):
+	"""
+	Local stand-in for the cloud server, listens on a free port of localhost in
+	a background thread. Use 'base_url' as CloudStorage base url.
+	"""
+
+	daemon_threads = True
+
+	def __init__(self, username='user', password='password'):
+		super(CloudTestServer, self).__init__(('127.0.0.1', 0), CloudRequestHandler)
+		self.username = username
+		self.password = password
+		self.token = 'test-token'
+		self.backups = {}
+		self.__thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+
+	@property
+	def base_url(self):
+		return 'http://{}:{}{}'.format(*self.server_address, CloudRequestHandler.API_PREFIX)
+
+	def start(self):
+		self.__thread.start()
+		return self
+
+	def stop(self):
+		self.shutdown()
+		self.server_close()
+		self.__thread.join()
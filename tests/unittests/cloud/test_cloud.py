@@ -0,0 +1,150 @@
+import os
+import sqlite3
+from unittest import TestCase
+from datetime import datetime, timedelta
+
+from erdesktop.cloud import CloudStorage
+from erdesktop.storage.storage import Storage
+from erdesktop.storage.models import EventModel
+from erdesktop.util.exceptions import BackupDownloadingError
+from tests.unittests.cloud.server import CloudTestServer
+
+
+# noinspection SqlDialectInspection,SqlNoDataSourceInspection
+class TestIncrementalBackup(TestCase):
+
+	def setUp(self):
+		self.server = CloudTestServer().start()
+		self.cloud = CloudStorage(base_url=self.server.base_url)
+		self.cloud.login('user', 'password')
+		self.storage = Storage(db_file='./test.db')
+		self.db = sqlite3.connect('./test.db')
+		self.db.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?)',
+			[('title {}'.format(i), '2019-05-02', '10:00:00', 'descr', 0, 0) for i in range(10)]
+		)
+		self.db.commit()
+
+	def doCleanups(self):
+		self.server.stop()
+		self.storage.disconnect()
+		self.db.close()
+		for file in ('./test.db', './test_restored.db'):
+			if os.path.exists(file):
+				os.remove(file)
+
+	def upload(self):
+		timestamp = (datetime.now() - timedelta(seconds=1)).strftime(EventModel.TIMESTAMP_FORMAT)
+		return self.cloud.upload_incremental_backup(self.storage, timestamp, False, 'user')
+
+	def rows(self, db):
+		return db.execute(
+			'SELECT id, title, date, time, description, is_past, repeat_weekly, is_notified FROM Events ORDER BY id;'
+		).fetchall()
+
+	def test_first_backup_is_full(self):
+		backup = self.upload()
+		self.assertNotIn('parent', backup)
+		self.assertEqual(10, backup['events_count'])
+		self.assertEqual((backup['digest'], self.storage.last_change_seq()), self.storage.get_backup_base())
+
+	def test_delta_contains_only_changes(self):
+		base = self.upload()
+		self.storage.update_event(pk=3, title='changed', is_past=False)
+		self.storage.delete_event(5)
+		delta = self.upload()
+		self.assertEqual(base['digest'], delta['parent'])
+		self.assertEqual(1, delta['events_count'])
+		self.assertEqual(base['digest'], self.server.backups[delta['digest']]['parent'])
+
+	def test_restore_chain(self):
+		self.upload()
+		self.storage.update_event(pk=3, title='changed', is_past=False)
+		self.upload()
+		self.storage.delete_event(5)
+		self.storage.create_event('new', datetime(2019, 5, 3).date(), datetime(2019, 5, 3, 11).time(), 'descr', False)
+		tip = self.upload()
+		expected = self.rows(self.db)
+
+		restored = Storage(db_file='./test_restored.db')
+		chain = self.cloud.download_backup_chain(tip['digest'])
+		self.assertEqual(3, len(chain))
+		restored.restore_chain(chain)
+		restored.disconnect()
+		db = sqlite3.connect('./test_restored.db')
+		self.assertListEqual(expected, self.rows(db))
+		db.close()
+
+	def test_missing_parent_uploads_full_backup(self):
+		base = self.upload()
+		self.cloud.delete_backup(base['digest'])
+		self.storage.update_event(pk=3, title='changed', is_past=False)
+		backup = self.upload()
+		self.assertNotIn('parent', backup)
+		self.assertEqual(10, backup['events_count'])
+
+	def test_replace_resets_backup_base(self):
+		self.upload()
+		self.storage.bulk_load([('title', '2019-05-02', '10:00:00', 'descr', 0, 0)], replace=True)
+		self.assertIsNone(self.storage.get_backup_base())
+		self.assertNotIn('parent', self.upload())
+
+	def restore(self, backup_hash):
+		restored = Storage(db_file='./test_restored.db')
+		restored.restore_chain(self.cloud.download_backup_chain(backup_hash))
+		restored.disconnect()
+		db = sqlite3.connect('./test_restored.db')
+		rows = self.rows(db)
+		db.close()
+		return rows
+
+	def test_broken_chain(self):
+		base = self.upload()
+		self.storage.update_event(pk=3, title='changed', is_past=False)
+		tip = self.upload()
+		self.server.backups[tip['digest']]['parent'] = tip['digest']
+		self.assertEqual(2, len(self.cloud.download_backup_chain(tip['digest'])))
+		self.server.backups[tip['digest']]['backup'] = self.server.backups[base['digest']]['backup']
+		self.assertRaises(BackupDownloadingError, self.cloud.download_backup_chain, tip['digest'])
+		self.server.backups[tip['digest']] = self.server.backups[base['digest']]
+		self.assertRaises(BackupDownloadingError, self.cloud.download_backup_chain, tip['digest'])
+
+	def test_restore_after_base_is_deleted(self):
+		base = self.upload()
+		self.storage.update_event(pk=3, title='changed', is_past=False)
+		delta = self.upload()
+		self.cloud.delete_backup(base['digest'])
+		self.assertRaises(BackupDownloadingError, self.cloud.download_backup_chain, delta['digest'])
+		self.storage.delete_event(5)
+		backup = self.upload()
+		self.assertNotIn('parent', backup)
+		self.assertListEqual(self.rows(self.db), self.restore(backup['digest']))
+
+	def test_long_chain_uploads_full_backup(self):
+		self.cloud.MAX_CHAIN_DELTAS = 2
+		self.upload()
+		for i in range(2):
+			self.storage.update_event(pk=3, title='changed {}'.format(i), is_past=False)
+			self.assertIn('parent', self.upload())
+		self.storage.update_event(pk=4, title='changed', is_past=False)
+		backup = self.upload()
+		self.assertNotIn('parent', backup)
+		self.assertEqual(10, backup['events_count'])
+		self.storage.update_event(pk=5, title='changed', is_past=False)
+		self.assertEqual(backup['digest'], self.upload()['parent'])
+
+	def test_dependent_backups(self):
+		backups = [
+			{'digest': 'a', 'parent': None},
+			{'digest': 'b', 'parent': 'a'},
+			{'digest': 'c', 'parent': 'b'},
+			{'digest': 'd'},
+			{'digest': 'e', 'parent': 'e'}
+		]
+		self.assertListEqual(['b', 'c'], CloudStorage.dependent_backups(backups, 'a'))
+		self.assertListEqual(['c'], CloudStorage.dependent_backups(backups, 'b'))
+		self.assertListEqual([], CloudStorage.dependent_backups(backups, 'd'))
+		self.assertEqual(0, CloudStorage.chain_length(backups, 'a'))
+		self.assertEqual(2, CloudStorage.chain_length(backups, 'c'))
+		self.assertIsNone(CloudStorage.chain_length(backups, 'e'))
+		self.assertIsNone(CloudStorage.chain_length(backups, 'x'))
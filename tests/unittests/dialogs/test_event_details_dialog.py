@@ -0,0 +1,67 @@
+import os
+import sys
+from unittest import TestCase
+from datetime import datetime, timedelta
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication, QWidget
+
+from erdesktop.storage.storage import Storage
+from erdesktop.dialogs.event_details_dialog import EventDetailsDialog
+
+
+class CalendarStub(QWidget):
+
+	def __init__(self):
+		super(CalendarStub, self).__init__()
+		self.loaded = 0
+
+	def load_events(self, date):
+		self.loaded += 1
+
+	def selectedDate(self):
+		return None
+
+
+class TestEventDetailsDialog(TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.app = QApplication.instance() or QApplication(sys.argv)
+
+	def setUp(self):
+		self.storage = Storage(db_file='./test.db')
+		self.calendar = CalendarStub()
+		self.dialog = EventDetailsDialog(flags=self.calendar.windowFlags(), calendar=self.calendar, storage=self.storage)
+		self.start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=1)
+		self.event = self.storage.create_event('title', self.start.date(), self.start.time(), 'description', True)
+
+	def doCleanups(self):
+		self.dialog.thread_pool.waitForDone()
+		self.storage.disconnect()
+		if os.path.exists('./test.db'):
+			os.remove('./test.db')
+
+	def test_edit_occurrence_keeps_series_date(self):
+		day = self.start.date() + timedelta(weeks=2)
+		occurrence = self.storage.get_day_events(day)[0]
+		self.assertEqual(day, occurrence.date)
+		self.assertEqual(self.start.date(), occurrence.occurrence_of)
+
+		self.dialog.reset_inputs(event_data=occurrence)
+		self.assertTrue(self.dialog.is_repeating)
+		self.dialog.title_input.setText('changed')
+		self.dialog.save_event_click()
+		self.dialog.thread_pool.waitForDone()
+
+		event = self.storage.get_event_by_id(self.event.id)
+		self.assertEqual('changed', event.title)
+		self.assertEqual(self.start.date(), event.date)
+		self.assertEqual(self.event.id, self.storage.get_day_events(day)[0].id)
+
+	def test_edit_stored_event(self):
+		event = self.storage.get_day_events(self.start.date())[0]
+		self.assertIsNone(event.occurrence_of)
+		self.dialog.reset_inputs(event_data=event)
+		self.assertEqual(self.start.date(), self.dialog.date_input.date().toPyDate())
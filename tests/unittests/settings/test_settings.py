@@ -0,0 +1,77 @@
+import os
+import configparser
+import tempfile
+from unittest import TestCase
+
+from erdesktop.settings import Settings, FONT
+
+
+class TestSettings(TestCase):
+
+	def setUp(self):
+		fd, self.settings_file = tempfile.mkstemp(suffix='.ini')
+		os.close(fd)
+		self.changed = []
+		self.settings = Settings(settings_file=self.settings_file)
+		self.settings.signals.changed.connect(self.changed.append)
+
+	def doCleanups(self):
+		self.settings.signals.changed.disconnect(self.changed.append)
+		if os.path.exists(self.settings_file):
+			os.remove(self.settings_file)
+
+	def stored(self, key):
+		parser = configparser.ConfigParser()
+		parser.read(self.settings_file)
+		section, option = key.split('/')
+		return parser.get(section, option, fallback=None)
+
+	def test_defaults(self):
+		self.assertEqual(FONT, self.settings.app_font)
+		self.assertIsNone(self.stored('app_user/font'))
+
+	def test_values_are_shared(self):
+		other = Settings(settings_file=self.settings_file)
+		self.assertFalse(other.is_dark_theme)
+		self.settings.set_theme(True)
+		self.assertTrue(other.is_dark_theme)
+		self.assertEqual('true', self.stored('app_user/is_dark_theme'))
+		self.assertListEqual(['app_user/is_dark_theme'], self.changed)
+
+	def test_unchanged_value_is_not_written(self):
+		self.settings.set_font(14)
+		self.settings.set_font(14)
+		self.assertListEqual(['app_user/font'], self.changed)
+
+	def test_commit(self):
+		self.settings.autocommit(False)
+		self.settings.set_font(16)
+		self.settings.set_start_in_tray(True)
+		self.assertEqual(16, self.settings.app_font)
+		self.assertIsNone(self.stored('app_user/font'))
+		self.settings.commit()
+		self.assertEqual('16', self.stored('app_user/font'))
+		self.assertEqual('true', self.stored('app_user/start_in_tray'))
+
+	def test_from_dict(self):
+		data = self.settings.to_dict()
+		data['font'] = 20
+		data['is_dark_theme'] = 1
+		Settings(settings_file=self.settings_file).from_dict(data)
+		self.assertEqual(20, self.settings.app_font)
+		self.assertTrue(self.settings.is_dark_theme)
+		self.assertEqual('20', self.stored('app_user/font'))
+
+	def test_shared(self):
+		self.assertIs(Settings.shared(), Settings.shared())
+
+	def test_key_signals(self):
+		fonts, themes = [], []
+		self.settings.signals.font_changed.connect(fonts.append)
+		self.settings.signals.theme_changed.connect(themes.append)
+		self.settings.set_font(18)
+		self.settings.set_theme(True)
+		self.settings.set_start_in_tray(True)
+		self.assertListEqual([18], fonts)
+		self.assertListEqual([True], themes)
+		self.assertListEqual(['app_user/font', 'app_user/is_dark_theme', 'app_user/start_in_tray'], self.changed)
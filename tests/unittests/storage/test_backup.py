@@ -0,0 +1,126 @@
+import io
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+from unittest import TestCase
+from datetime import datetime, timedelta
+
+from erdesktop.storage.storage import Storage
+from erdesktop.storage.models import EventModel
+from erdesktop.util.exceptions import DatabaseException
+from erdesktop.storage.backup import BackupFormat, BackupReader, BackupWriter
+
+
+class TestBackupFormat(TestCase):
+
+	def setUp(self):
+		self.timestamp = (datetime.now() - timedelta(minutes=1)).strftime(EventModel.TIMESTAMP_FORMAT)
+		self.events = [{
+			'title': 'title {}'.format(i),
+			'date': '2019-05-02',
+			'time': '10:00:00',
+			'description': 'description {}'.format(i),
+			'is_past': i % 2,
+			'repeat_weekly': 0,
+			'is_notified': 0
+		} for i in range(25)]
+
+	def write(self, include_settings=False):
+		file = io.BytesIO()
+		writer = BackupWriter(file, self.timestamp, include_settings, chunk_size=10)
+		if include_settings:
+			writer.write_settings({'font': 12})
+		for event in self.events:
+			writer.write_event(event)
+		writer.close()
+		file.seek(0)
+		return file
+
+	def test_is_backup(self):
+		self.assertTrue(BackupFormat.is_backup(self.write()))
+		self.assertFalse(BackupFormat.is_backup(io.BytesIO(pickle.dumps({}))))
+
+	def test_read_written(self):
+		reader = BackupReader(self.write(True)).verify()
+		self.assertEqual(self.timestamp, reader.timestamp)
+		self.assertEqual(len(self.events), reader.events_count)
+		self.assertTrue(reader.contains_settings)
+		self.assertDictEqual({'font': 12}, reader.settings)
+		self.assertListEqual([10, 10, 5], [len(x) for x in reader.chunks()])
+		self.assertListEqual(self.events, list(reader.events()))
+
+	def test_without_settings(self):
+		reader = BackupReader(self.write()).verify()
+		self.assertFalse(reader.contains_settings)
+		self.assertIsNone(reader.settings)
+
+	def test_broken_digest(self):
+		data = bytearray(self.write().getvalue())
+		data[-1] ^= 0xff
+		self.assertRaises(DatabaseException, BackupReader(io.BytesIO(bytes(data))).verify)
+
+	def test_broken_payload(self):
+		data = bytearray(self.write().getvalue())
+		data[len(BackupFormat.MAGIC) + 20] ^= 0xff
+		self.assertRaises(DatabaseException, BackupReader(io.BytesIO(bytes(data))).verify)
+
+	def test_truncated(self):
+		data = self.write().getvalue()
+		self.assertRaises(DatabaseException, BackupReader(io.BytesIO(data[:-30])).verify)
+
+
+class TestStorageBackup(TestCase):
+
+	def setUp(self):
+		self.dir = tempfile.mkdtemp()
+		self.storage = Storage(db_file='./test.db', backup_file='test')
+		self.db = sqlite3.connect('./test.db')
+		self.cursor = self.db.cursor()
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?)',
+			[('title {}'.format(i), '2019-05-02', '10:00:00', 'descr', 0, i % 2) for i in range(2500)]
+		)
+		self.db.commit()
+
+	def doCleanups(self):
+		self.storage.disconnect()
+		self.db.close()
+		shutil.rmtree(self.dir)
+		if os.path.exists('./test.db'):
+			os.remove('./test.db')
+
+	def backup_file(self):
+		return os.path.join(self.dir, os.listdir(self.dir)[0])
+
+	def test_backup_and_restore(self):
+		expected = self.cursor.execute('SELECT * FROM Events;').fetchall()
+		self.storage.backup(self.dir, False)
+		self.cursor.execute('DELETE FROM Events;')
+		self.db.commit()
+		self.storage.restore(self.backup_file())
+		self.assertListEqual(expected, self.cursor.execute('SELECT * FROM Events;').fetchall())
+
+	def test_failed_backup_leaves_no_file(self):
+		write_row = BackupWriter.write_row
+
+		def failing_write_row(writer, row):
+			if writer.events_count == 2000:
+				raise OSError('No space left on device')
+			write_row(writer, row)
+
+		BackupWriter.write_row = failing_write_row
+		try:
+			self.assertRaises(OSError, self.storage.backup, self.dir, False)
+		finally:
+			BackupWriter.write_row = write_row
+		self.assertListEqual([], os.listdir(self.dir))
+
+	def test_restore_legacy_backup(self):
+		timestamp = (datetime.now() - timedelta(minutes=1)).strftime(EventModel.TIMESTAMP_FORMAT)
+		expected = self.storage.to_array()[:3]
+		with open(os.path.join(self.dir, 'legacy.bak'), 'wb') as file:
+			file.write(pickle.dumps(self.storage.prepare_backup_data(expected, timestamp, False)))
+		self.storage.restore(self.backup_file())
+		self.assertListEqual(expected, self.storage.to_array())
@@ -5,7 +5,8 @@ from unittest import TestCase
 from datetime import timedelta
 
 from erdesktop.storage.models import EventModel
-from erdesktop.storage.sql import QUERY_CREATE_EVENT_TABLE
+from erdesktop.storage.converters import adapt_date_time
+from erdesktop.storage.sql import QUERY_CREATE_EVENT_TABLE, EVENTS_DATE_TIME_EXPR
 
 
 # noinspection SqlDialectInspection,SqlNoDataSourceInspection
@@ -118,6 +119,25 @@ class TestStorage(TestCase):
 		self.assertRaises(sqlite3.Error, self.cursor.execute, *('SELECT * FROM Events',))
 		self.cursor.execute(QUERY_CREATE_EVENT_TABLE)
 
+	def test_schema_version(self):
+		self.assertEqual(EventModel.SCHEMA_VERSION, self.cursor.execute('PRAGMA user_version;').fetchone()[0])
+
+	def test_migration_creates_indexes(self):
+		self.cursor.execute('DROP TABLE Events;')
+		self.cursor.execute('PRAGMA user_version = 0;')
+		EventModel.create_table(self.cursor)
+		indexes = [x[1] for x in self.cursor.execute('PRAGMA index_list(Events);').fetchall()]
+		self.assertIn('EventsDateTimeIdx', indexes)
+		self.assertIn('EventsDueIdx', indexes)
+		plan = self.cursor.execute(
+			'EXPLAIN QUERY PLAN SELECT * FROM Events WHERE date = ?;', (datetime(2019, 5, 2).toordinal(),)
+		).fetchall()
+		self.assertIn('EventsDateTimeIdx', plan[0][-1])
+
+	def test_migration_is_idempotent(self):
+		EventModel.create_table(self.cursor)
+		self.test_schema_version()
+
 	def test_get(self):
 		expected = ('Some title', datetime.now().date().strftime(EventModel.DATE_FORMAT), datetime.now().time().strftime(EventModel.TIME_FORMAT), 'Some description', 1, 0)
 		self.cursor.execute(
@@ -148,8 +168,9 @@ class TestStorage(TestCase):
 		self.assertEqual(item_id, 1)
 		actual = self.cursor.execute('SELECT * FROM Events WHERE id = ?;', (item_id,)).fetchone()
 		self.assertIsNotNone(actual)
+		actual = actual[:2] + (EventModel.format_date(actual[2]), EventModel.format_time(actual[3])) + actual[4:]
 		self.assertTupleEqual(
-			(item_id, 'Some title', dt.date().strftime(EventModel.DATE_FORMAT), dt.time().strftime(EventModel.TIME_FORMAT), 'Some description', 1, 0), actual
+			(item_id, 'Some title', dt.date().strftime(EventModel.DATE_FORMAT), dt.time().strftime(EventModel.TIME_FORMAT), 'Some description', 1, 0, 0), actual
 		)
 		self.clean_db()
 
@@ -164,8 +185,8 @@ class TestStorage(TestCase):
 		self.assertIsNotNone(actual)
 		self.assertEqual(1, actual[0])
 		self.assertEqual(expected[0], actual[1])
-		self.assertEqual(expected[1], actual[2])
-		self.assertEqual(expected[2], actual[3])
+		self.assertEqual(expected[1], EventModel.format_date(actual[2]))
+		self.assertEqual(expected[2], EventModel.format_time(actual[3]))
 		self.assertEqual(expected[3], actual[4])
 		self.assertEqual(expected[4], actual[5])
 		self.assertEqual(expected[5], actual[6])
@@ -178,8 +199,8 @@ class TestStorage(TestCase):
 		self.assertIsNotNone(actual)
 		self.assertEqual(modified[0], actual[0])
 		self.assertEqual(modified[1], actual[1])
-		self.assertEqual(modified[2], actual[2])
-		self.assertEqual(modified[3], actual[3])
+		self.assertEqual(modified[2], EventModel.format_date(actual[2]))
+		self.assertEqual(modified[3], EventModel.format_time(actual[3]))
 		self.assertEqual(modified[4], actual[4])
 		self.assertEqual(modified[5], actual[5])
 		self.assertEqual(modified[6], actual[6])
@@ -198,6 +219,75 @@ class TestStorage(TestCase):
 	def test_delete_not_existing(self):
 		self.assertFalse(EventModel.delete(self.cursor, 99999))
 
+	def test_delete_many(self):
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);',
+			[('title', '2019-05-02', '10:00:00', '', 0, 0)] * (EventModel.DELETE_BATCH_SIZE + 10)
+		)
+		pks = list(range(1, EventModel.DELETE_BATCH_SIZE + 6)) + [99999]
+		self.assertEqual(EventModel.DELETE_BATCH_SIZE + 5, EventModel.delete_many(self.cursor, pks))
+		self.assertEqual(5, self.cursor.execute('SELECT COUNT(*) FROM Events;').fetchone()[0])
+		self.clean_db()
+
+	def test_update_columns(self):
+		self.cursor.execute(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);',
+			('title', '2019-05-02', '10:00:00', 'descr', 1, 0)
+		)
+		model = EventModel.update_columns(self.cursor, self.cursor.lastrowid, {'title': 'changed'})
+		self.assertEqual('changed', model.title)
+		self.assertEqual('descr', model.description)
+		self.assertTrue(model.is_past)
+		model = EventModel.update_columns(self.cursor, model.id, {}, today=datetime(2019, 5, 2).date())
+		self.assertFalse(model.is_past)
+		self.assertIsNone(EventModel.update_columns(self.cursor, 99999, {'title': 'changed'}))
+		self.clean_db()
+
+	def test_to_fts_query(self):
+		self.assertIsNone(EventModel.to_fts_query('  '))
+		self.assertEqual('"meet"* "doc"*', EventModel.to_fts_query(' meet  doc'))
+		self.assertEqual('"say"* """hi"""* "OR"*', EventModel.to_fts_query('say "hi" OR'))
+
+	def test_search(self):
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);', [
+				('Dentist', '2019-05-02', '10:00:00', 'Call the doctor', 0, 0),
+				('Doctor appointment', '2019-05-03', '10:00:00', '', 0, 0),
+				('Café', '2019-05-04', '10:00:00', '', 0, 0)
+			]
+		)
+		self.assertListEqual(['Doctor appointment', 'Dentist'], [x.title for x in EventModel.search(self.cursor, 'doc', 10)])
+		self.assertListEqual(['Dentist'], [x.title for x in EventModel.search(self.cursor, 'doc', 10, 1)])
+		self.assertListEqual(['Café'], [x.title for x in EventModel.search(self.cursor, 'cafe', 10)])
+		self.assertEqual(2, len(EventModel.search(self.cursor, 'doc " *', 10)))
+		self.cursor.execute('UPDATE Events SET title = ? WHERE id = 2;', ('Meeting',))
+		self.cursor.execute('DELETE FROM Events WHERE id = 1;')
+		self.assertListEqual([], EventModel.search(self.cursor, 'doc', 10))
+		self.assertListEqual(['Meeting'], [x.title for x in EventModel.search(self.cursor, 'meet', 10)])
+		self.clean_db()
+
+	def test_to_like_patterns(self):
+		self.assertListEqual([], EventModel.to_like_patterns('  '))
+		self.assertListEqual(['%meet%', '%doc%'], EventModel.to_like_patterns(' meet  doc'))
+		self.assertListEqual(['%50\\%%', '%a\\_b%', '%c\\\\d%'], EventModel.to_like_patterns('50% a_b c\\d'))
+
+	def test_search_without_full_text_index(self):
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);', [
+				('Doctor appointment', '2019-05-03', '10:00:00', '', 0, 0),
+				('Dentist', '2019-05-02', '10:00:00', 'Call the doctor', 0, 0),
+				('Sale 50%', '2019-05-04', '10:00:00', '', 0, 0),
+				('Sale 500', '2019-05-05', '10:00:00', '', 0, 0)
+			]
+		)
+		self.assertTrue(EventModel.has_full_text_index(self.cursor))
+		self.assertListEqual(['Dentist', 'Doctor appointment'], [x.title for x in EventModel.search(self.cursor, 'DOC', 10, full_text=False)])
+		self.assertListEqual(['Doctor appointment'], [x.title for x in EventModel.search(self.cursor, 'doc', 10, 1, full_text=False)])
+		self.assertListEqual(['Dentist'], [x.title for x in EventModel.search(self.cursor, 'doc call', 10, full_text=False)])
+		self.assertListEqual(['Sale 50%'], [x.title for x in EventModel.search(self.cursor, '50%', 10, full_text=False)])
+		self.assertListEqual([], EventModel.search(self.cursor, ' ', 10, full_text=False))
+		self.clean_db()
+
 	def test_select_all(self):
 		now = datetime.now()
 		item_1_expected = ('Some title 1', (now + timedelta(days=2)).date().strftime(EventModel.DATE_FORMAT), (now + timedelta(days=2)).time().strftime(EventModel.TIME_FORMAT), 'Some description 1', 0, 1)
@@ -309,3 +399,106 @@ class TestStorage(TestCase):
 		self.assertEqual(actual.repeat_weekly, item_1_expected[5])
 
 		self.clean_db()
+
+	def test_select_by_date_range(self):
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);',
+			[('title {}'.format(day), '2019-05-0{}'.format(day), '10:00:00', '', 0, 0) for day in range(1, 5)]
+		)
+		actual = EventModel.select(self.cursor, date=datetime(2019, 5, 2).date(), delta=60 * 24)
+		self.assertListEqual(['title 2'], [x.title for x in actual])
+		actual = EventModel.select(self.cursor, date=datetime(2019, 5, 2).date(), delta=60 * 48)
+		self.assertListEqual(['title 2', 'title 3'], [x.title for x in actual])
+		self.clean_db()
+
+	def test_select_by_date_time_window(self):
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);',
+			[('title {}'.format(hour), '2019-05-02', '{:02}:00:00'.format(hour), '', 0, 0) for hour in range(0, 24, 2)]
+		)
+		actual = EventModel.select(self.cursor, date=datetime(2019, 5, 2).date(), time=datetime(2019, 5, 2, 9).time(), delta=180)
+		self.assertListEqual(['title 10', 'title 12'], [x.title for x in actual])
+		actual = EventModel.select(self.cursor, date=datetime(2019, 5, 2).date(), time=datetime(2019, 5, 2, 23).time(), delta=180)
+		self.assertListEqual([], actual)
+		self.clean_db()
+
+	def test_select_due(self):
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);',
+			[
+				('overdue', '2019-05-01', '10:00:00', '', 0, 0),
+				('past', '2019-05-01', '11:00:00', '', 1, 0),
+				('due', '2019-05-02', '10:00:00', '', 0, 0),
+				('later', '2019-05-02', '12:00:00', '', 0, 0)
+			]
+		)
+		actual = EventModel.select_due(self.cursor, datetime(2019, 5, 2, 11))
+		self.assertListEqual([
+			(1, datetime(2019, 5, 1, 10), 0),
+			(3, datetime(2019, 5, 2, 10), 0)
+		], sorted(actual))
+		plan = self.cursor.execute(
+			'EXPLAIN QUERY PLAN ' + EventModel.SELECT_DUE_QUERY, (adapt_date_time(datetime(2019, 5, 2, 11)),)
+		).fetchall()
+		self.assertIn('EventsDueIdx', plan[0][-1])
+		self.clean_db()
+
+	def test_select_queries_are_parameterized(self):
+		self.assertEqual(5, len(set(EventModel.SELECT_QUERIES.values())))
+		for query in EventModel.SELECT_QUERIES.values():
+			self.assertNotIn('\'', query)
+
+	def test_lazy_date_time(self):
+		model = EventModel((1, 'title', '2019-05-02', '10:20:30.123', 'descr', 0, 1, 0))
+		self.assertFalse(hasattr(model, '__dict__'))
+		self.assertEqual('2019-05-02', model.to_dict()['date'])
+		self.assertEqual('10:20:30', model.to_dict()['time'])
+		self.assertEqual(datetime(2019, 5, 2).date(), model.date)
+		self.assertEqual(datetime(2019, 5, 2, 10, 20, 30).time(), model.time)
+		model.date = datetime(2019, 5, 3).date()
+		self.assertEqual('2019-05-03', model.to_dict()['date'])
+
+	def test_row_to_dict(self):
+		row = (1, 'title', '2019-05-02', '10:20:30', 'descr', 0, 1, 0)
+		self.assertDictEqual(EventModel(row).to_dict(), EventModel.row_to_dict(row))
+		self.assertEqual(1, EventModel.row_to_dict(row, with_id=True)['id'])
+
+	def test_migration_encodes_text_dates(self):
+		# a database of a released version
+		self.cursor.execute('DROP TABLE Events;')
+		self.cursor.execute('PRAGMA user_version = 0;')
+		self.cursor.execute(QUERY_CREATE_EVENT_TABLE)
+		self.cursor.execute(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);',
+			('title', '2019-05-02', '10:20:30.123456', '', 0, 0)
+		)
+		EventModel.create_table(self.cursor)
+		self.assertTupleEqual(
+			(datetime(2019, 5, 2).toordinal(), 10 * 3600 + 20 * 60 + 30),
+			self.cursor.execute('SELECT date, time FROM Events;').fetchone()
+		)
+		index_sql = self.cursor.execute('SELECT sql FROM sqlite_master WHERE name = \'EventsDueIdx\';').fetchone()[0]
+		self.assertIn(EVENTS_DATE_TIME_EXPR, index_sql)
+		self.clean_db()
+
+	def test_text_dates_are_encoded_on_write(self):
+		self.cursor.execute(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);',
+			('title', '2019-05-02', '10:00:00', '', 0, 0)
+		)
+		self.cursor.execute('UPDATE Events SET date = ? WHERE id = 1;', ('2019-05-03',))
+		self.assertTupleEqual(
+			('integer', datetime(2019, 5, 3).toordinal()),
+			self.cursor.execute('SELECT typeof(date), date FROM Events;').fetchone()
+		)
+		self.clean_db()
+
+	def test_typed_connection(self):
+		db = sqlite3.connect('./test.db', detect_types=sqlite3.PARSE_DECLTYPES)
+		dt = datetime(2019, 5, 2, 10, 20, 30)
+		db.execute(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?);',
+			('title', dt.date(), dt.time(), '', 0, 0)
+		)
+		self.assertTupleEqual((dt.date(), dt.time()), db.execute('SELECT date, time FROM Events;').fetchone())
+		db.close()
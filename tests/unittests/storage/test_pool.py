@@ -0,0 +1,230 @@
+import os
+import time
+import sqlite3
+import threading
+from unittest import TestCase
+from datetime import datetime, timedelta
+
+from PyQt5.QtCore import Qt, QThreadPool
+
+from erdesktop.util.worker import Worker
+from erdesktop.storage.pool import ConnectionPool
+from erdesktop.storage.storage import Storage
+from erdesktop.util.exceptions import DatabaseException
+
+
+class TestConnectionPool(TestCase):
+
+	THREADS = 4
+	ITERATIONS = 50
+
+	def setUp(self):
+		self.storage = Storage(db_file='./test.db')
+		self.errors = []
+
+	def doCleanups(self):
+		self.storage.disconnect()
+		if os.path.exists('./test.db'):
+			os.remove('./test.db')
+
+	def run_threads(self, *targets):
+		def wrap(target):
+			def run():
+				try:
+					target()
+				except Exception as exc:
+					self.errors.append(exc)
+			return run
+		threads = [threading.Thread(target=wrap(target)) for target in targets]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertListEqual([], self.errors)
+
+	def test_wal_mode(self):
+		db = sqlite3.connect('./test.db')
+		self.assertEqual('wal', db.execute('PRAGMA journal_mode;').fetchone()[0])
+		db.close()
+
+	def test_connection_per_thread(self):
+		pool = ConnectionPool('./test.db')
+		pool.open()
+		connections = []
+		barrier = threading.Barrier(self.THREADS)
+
+		def get():
+			connections.append(pool.get())
+			barrier.wait(5)
+
+		self.run_threads(*[get] * self.THREADS)
+		self.assertEqual(self.THREADS, len(set(map(id, connections))))
+		self.assertIs(pool.get(), pool.get())
+		pool.close()
+		self.assertFalse(any(x.is_open for x in connections))
+		self.assertRaises(DatabaseException, pool.get)
+
+	def test_connections_of_finished_threads_are_closed(self):
+		pool = ConnectionPool('./test.db')
+		pool.open()
+		connections = []
+		barrier = threading.Barrier(self.THREADS)
+
+		def get():
+			connections.append(pool.get())
+			barrier.wait(5)
+
+		self.run_threads(*[get] * self.THREADS)
+		pool.get()
+		self.assertFalse(any(x.is_open for x in connections))
+		self.assertEqual(1, pool.size)
+		pool.close()
+
+	def test_idle_connections_of_expired_threads_are_closed(self):
+		pool = ConnectionPool('./test.db', idle_timeout=0.05)
+		pool.open()
+		thread_pool = QThreadPool()
+		thread_pool.setExpiryTimeout(50)
+		for _ in range(20):
+			finished = threading.Event()
+			worker = Worker(pool.get)
+			worker.signals.finished.connect(finished.set, Qt.DirectConnection)
+			thread_pool.start(worker)
+			finished.wait(5)
+			time.sleep(0.1)
+		thread_pool.waitForDone()
+		pool.get()
+		self.assertEqual(1, pool.size)
+		pool.close()
+
+	def test_idle_connection_in_transaction_is_kept(self):
+		pool = ConnectionPool('./test.db', idle_timeout=0.05)
+		pool.open()
+		connections = []
+		done = threading.Event()
+
+		def get(transaction_depth):
+			connection = pool.get()
+			connection.transaction_depth = transaction_depth
+			connections.append(connection)
+			done.wait(5)
+
+		threads = [threading.Thread(target=get, args=(i,)) for i in range(2)]
+		for thread in threads:
+			thread.start()
+		time.sleep(0.1)
+		pool.get()
+		done.set()
+		for thread in threads:
+			thread.join()
+		self.assertListEqual([False, True], [x.is_open for x in sorted(connections, key=lambda x: x.transaction_depth)])
+		pool.close()
+
+	def test_connections_are_reused_in_thread_pool(self):
+		thread_pool = QThreadPool()
+		thread_pool.setMaxThreadCount(2)
+		self.storage.create_event('title', datetime.now().date(), datetime.now().time(), '', False)
+		opened = self.storage.connection_stats()['opened']
+		results = []
+		for _ in range(10):
+			worker = Worker(self.storage.get_events)
+			worker.signals.param_success.connect(results.append, Qt.DirectConnection)
+			thread_pool.start(worker)
+		thread_pool.waitForDone()
+		self.assertEqual(10, len(results))
+		self.assertLessEqual(self.storage.connection_stats()['opened'] - opened, 2)
+
+	def test_broken_connection_is_replaced_once_in_thread_pool(self):
+		thread_pool = QThreadPool()
+		thread_pool.setMaxThreadCount(1)
+		stats = self.storage.connection_stats()
+		errors = []
+
+		def run(fn):
+			finished = threading.Event()
+			worker = Worker(fn)
+			worker.signals.error.connect(errors.append, Qt.DirectConnection)
+			worker.signals.finished.connect(finished.set, Qt.DirectConnection)
+			thread_pool.start(worker)
+			finished.wait(5)
+
+		run(self.storage.get_events)
+		run(self.storage.get_events)
+		self.assertEqual(stats['opened'] + 1, self.storage.connection_stats()['opened'])
+		# a connection which is closed behind the pool's back fails once
+		run(lambda: self.pool_connection().db.close())
+		run(self.storage.get_events)
+		self.assertEqual(1, len(errors))
+		for _ in range(5):
+			run(self.storage.get_events)
+		self.assertEqual(1, len(errors))
+		self.assertEqual(stats['opened'] + 2, self.storage.connection_stats()['opened'])
+		self.assertEqual(stats['failed'] + 1, self.storage.connection_stats()['failed'])
+		thread_pool.waitForDone()
+
+	def pool_connection(self):
+		return self.storage._Storage__pool.get()
+
+	def test_recover_broken_connection(self):
+		pool = ConnectionPool('./test.db')
+		pool.open()
+		connection = pool.get()
+		self.assertFalse(pool.recover())
+		connection.db.close()
+		self.assertTrue(pool.recover())
+		self.assertIsNot(connection, pool.get())
+		self.assertDictEqual({'open': 1, 'opened': 2, 'failed': 1}, pool.stats())
+		pool.close()
+
+	def test_connections_are_reused(self):
+		self.storage.try_to_reconnect = True
+		opened = self.storage.connection_stats()['opened']
+		for _ in range(10):
+			event = self.storage.create_event('title', datetime.now().date(), datetime.now().time(), '', False)
+			self.storage.update_event(event.id, title='changed')
+			self.storage.to_array()
+			self.storage.delete_event(event.id)
+		self.assertEqual(opened, self.storage.connection_stats()['opened'])
+		self.storage.disconnect()
+		self.assertEqual(0, len(self.storage.to_array()))
+		self.assertDictEqual({'open': 1, 'opened': opened + 1, 'failed': 0}, self.storage.connection_stats())
+
+	def test_reader_does_not_wait_for_writer(self):
+		written = threading.Event()
+		done = threading.Event()
+
+		def writer():
+			with self.storage.transaction():
+				self.storage.create_event('title', datetime.now().date(), datetime.now().time(), '', False)
+				written.set()
+				done.wait(5)
+
+		thread = threading.Thread(target=writer)
+		thread.start()
+		written.wait(5)
+		try:
+			self.assertListEqual([], self.storage.get_events())
+		finally:
+			done.set()
+			thread.join()
+		self.assertEqual(1, len(self.storage.get_events()))
+
+	def test_concurrent_reads_and_writes(self):
+		date = datetime(2019, 5, 2, 10)
+
+		def writer():
+			for i in range(self.ITERATIONS):
+				with self.storage.transaction():
+					event = self.storage.create_event('title', date.date(), date.time(), '', False)
+					self.storage.update_event(event.id, title='changed {}'.format(i))
+				if i % 2 == 0:
+					self.storage.delete_event(event.id)
+
+		def reader():
+			for _ in range(self.ITERATIONS):
+				for event in self.storage.get_events(date.date()):
+					self.assertTrue(event.title.startswith('changed'))
+				self.storage.get_date_aggregates(date.date(), date.date() + timedelta(days=1))
+
+		self.run_threads(*[writer] * self.THREADS + [reader] * self.THREADS)
+		self.assertEqual(self.THREADS * self.ITERATIONS // 2, len(self.storage.get_events(date.date())))
@@ -0,0 +1,39 @@
+from unittest import TestCase
+from datetime import date, datetime
+
+from erdesktop.storage.recurrence import Recurrence, WEEKLY, recurrence_of
+
+
+class TestRecurrence(TestCase):
+
+	def test_weekly_first_on_or_after(self):
+		start = date(2019, 5, 2)
+		self.assertEqual(start, WEEKLY.first_on_or_after(start, date(2019, 1, 1)))
+		self.assertEqual(start, WEEKLY.first_on_or_after(start, start))
+		self.assertEqual(date(2019, 5, 9), WEEKLY.first_on_or_after(start, date(2019, 5, 3)))
+		self.assertEqual(date(2019, 5, 9), WEEKLY.first_on_or_after(start, date(2019, 5, 9)))
+		self.assertEqual(date(2119, 5, 4), WEEKLY.first_on_or_after(start, date(2119, 5, 3)))
+
+	def test_next_after(self):
+		start = datetime(2019, 5, 2, 10)
+		self.assertEqual(datetime(2019, 5, 9, 10), WEEKLY.next_after(start, datetime(2019, 5, 2, 10)))
+		self.assertEqual(datetime(2021, 5, 6, 10), WEEKLY.next_after(start, datetime(2021, 5, 6, 9)))
+		self.assertEqual(datetime(2021, 5, 13, 10), WEEKLY.next_after(start, datetime(2021, 5, 6, 11)))
+
+	def test_occurrences(self):
+		start = date(2019, 5, 2)
+		self.assertListEqual(
+			[date(2019, 5, 9), date(2019, 5, 16)], list(WEEKLY.occurrences(start, date(2019, 5, 3), date(2019, 5, 22)))
+		)
+		self.assertListEqual([], list(WEEKLY.occurrences(start, date(2019, 5, 3), date(2019, 5, 8))))
+
+	def test_recurrence_of(self):
+		self.assertIs(WEEKLY, recurrence_of(1))
+		self.assertIsNone(recurrence_of(0))
+
+	def test_rule_must_implement_first_on_or_after(self):
+		# noinspection PyAbstractClass
+		class Rule(Recurrence):
+			pass
+
+		self.assertRaises(TypeError, Rule)
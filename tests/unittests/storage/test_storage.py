@@ -19,6 +19,7 @@ class TestStorage(TestCase):
 		EventModel.create_table(self.db.cursor())
 
 	def doCleanups(self):
+		self.storage.disconnect()
 		self.db.close()
 		if os.path.exists('./test.db'):
 			os.remove('./test.db')
@@ -162,14 +163,77 @@ class TestStorage(TestCase):
 		self.db.commit()
 		self.assertTrue(self.storage.event_exists(last))
 		self.storage.try_to_reconnect = True
-		self.storage.delete_event(last)
+		self.assertTrue(self.storage.delete_event(last))
 		self.assertFalse(self.storage.event_exists(last))
+		self.assertFalse(self.storage.delete_event(last))
 
 	def test_delete_event_db_connection_failed(self):
 		self.storage.disconnect()
 		self.storage.try_to_reconnect = False
 		self.assertRaises(DatabaseException, self.storage.delete_event, *(999999,))
 
+	def test_delete_events(self):
+		self.storage.from_array([
+			{'title': 'title {}'.format(i), 'date': '2019-05-02', 'time': '10:00:00', 'description': ''} for i in range(5)
+		])
+		changed = []
+		Storage.add_change_listener(changed.append)
+		try:
+			self.assertEqual(3, self.storage.delete_events([1, 3, 5, 999999]))
+		finally:
+			Storage.remove_change_listener(changed.append)
+		self.assertListEqual([2, 4], [x[0] for x in self.cursor.execute('SELECT id FROM Events;').fetchall()])
+		self.assertListEqual([1, 3, 5, 999999], changed)
+		self.clean_db()
+
+	def test_update_event_keeps_other_fields(self):
+		self.storage.from_array([
+			{'title': 'title', 'date': '2019-05-02', 'time': '10:00:00', 'description': 'descr', 'is_past': 1}
+		])
+		event = self.storage.update_event(pk=1, is_notified=1)
+		self.assertEqual('title', event.title)
+		self.assertEqual('descr', event.description)
+		self.assertTrue(event.is_past)
+		self.assertEqual(1, event.is_notified)
+		event = self.storage.update_event(pk=1, e_date=datetime.today().date() + timedelta(days=1))
+		self.assertFalse(event.is_past)
+		self.clean_db()
+
+	def test_transaction(self):
+		changed = []
+		Storage.add_change_listener(changed.append)
+		try:
+			with self.storage.transaction():
+				first = self.storage.create_event('first', datetime(2019, 5, 2).date(), datetime(2019, 5, 2, 10).time(), '', False)
+				with self.storage.transaction():
+					self.storage.update_event(first.id, title='changed')
+				self.assertEqual(0, self.cursor.execute('SELECT COUNT(*) FROM Events;').fetchone()[0])
+				self.assertListEqual([], changed)
+			self.assertListEqual([('changed',)], self.cursor.execute('SELECT title FROM Events;').fetchall())
+			self.assertListEqual([first.id], changed)
+		finally:
+			Storage.remove_change_listener(changed.append)
+		self.clean_db()
+
+	def test_transaction_rollback(self):
+		self.storage.from_array([{'title': 'title', 'date': '2019-05-02', 'time': '10:00:00', 'description': ''}])
+		with self.assertRaises(DatabaseException):
+			with self.storage.transaction():
+				self.storage.delete_event(1)
+				self.storage.update_event(999999, title='changed')
+		self.assertFalse(self.storage.in_transaction)
+		self.assertTrue(self.storage.event_exists(1))
+		self.clean_db()
+
+	def test_search_after_replace(self):
+		self.storage.from_array([{'title': 'old title', 'date': '2019-05-02', 'time': '10:00:00', 'description': ''}])
+		self.storage.bulk_load([('new title', '2019-05-03', '11:00:00', 'descr', 0, 0)], replace=True)
+		self.assertListEqual(['new title'], [x.title for x in self.storage.search('title')])
+		self.storage.create_event('another title', datetime(2019, 5, 4).date(), datetime(2019, 5, 4, 10).time(), '', False)
+		self.assertEqual(2, len(self.storage.search('titl')))
+		self.assertEqual(1, len(self.storage.search('titl', limit=1)))
+		self.clean_db()
+
 	def test_get_events(self):
 		expected = [
 			(
@@ -313,10 +377,118 @@ class TestStorage(TestCase):
 		for i in range(len(expected)):
 			self.assertEqual(actual[i][0], i + 1)
 			self.assertEqual(actual[i][1], expected[i].get('title'))
-			self.assertEqual(actual[i][2], expected[i].get('date'))
-			self.assertEqual(actual[i][3], expected[i].get('time'))
+			self.assertEqual(EventModel.format_date(actual[i][2]), expected[i].get('date'))
+			self.assertEqual(EventModel.format_time(actual[i][3]), expected[i].get('time'))
 			self.assertEqual(actual[i][4], expected[i].get('description'))
 			self.assertEqual(actual[i][5], expected[i].get('is_past'))
 			self.assertEqual(actual[i][6], expected[i].get('repeat_weekly'))
 
 		self.clean_db()
+
+	def test_change_listener(self):
+		changes = []
+		Storage.add_change_listener(changes.append)
+		try:
+			event = self.storage.create_event('title', datetime.now().date(), datetime.now().time(), 'descr', False)
+			self.storage.update_event(event.id, title='new title')
+			self.storage.delete_event(event.id)
+			self.storage.from_array([])
+		finally:
+			Storage.remove_change_listener(changes.append)
+		self.assertListEqual([event.id, event.id, event.id, None], changes)
+
+	def test_get_pending_events(self):
+		dt = datetime.now().replace(microsecond=0)
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?)',
+			[
+				('title 1', dt.strftime(EventModel.DATE_FORMAT), dt.strftime(EventModel.TIME_FORMAT), '', 0, 0),
+				('title 2', dt.strftime(EventModel.DATE_FORMAT), dt.strftime(EventModel.TIME_FORMAT), '', 1, 0)
+			]
+		)
+		self.db.commit()
+		self.assertListEqual([(1, dt, 0)], self.storage.get_pending_events())
+		self.assertListEqual([], self.storage.get_pending_events(2))
+		self.clean_db()
+
+	def test_get_date_aggregates(self):
+		day = datetime(2019, 5, 2)
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?)',
+			[
+				('title 1', '2019-05-02', '10:00:00', '', 0, 0),
+				('title 2', '2019-05-02', '11:00:00', '', 1, 0),
+				('title 3', '2019-05-03', '10:00:00', '', 0, 0),
+				('title 4', '2019-06-20', '10:00:00', '', 0, 0)
+			]
+		)
+		self.db.commit()
+		actual = self.storage.get_date_aggregates(day.date(), (day + timedelta(days=7)).date())
+		self.assertListEqual([
+			(day.date(), 2, True),
+			((day + timedelta(days=1)).date(), 1, False)
+		], actual)
+		self.clean_db()
+
+	def test_repeating_events(self):
+		self.cursor.executemany(
+			'INSERT INTO Events(title, date, time, description, is_past, repeat_weekly) VALUES (?, ?, ?, ?, ?, ?)',
+			[
+				('weekly', '2019-05-02', '12:00:00', '', 0, 1),
+				('once', '2019-05-09', '10:00:00', '', 0, 0),
+				('later', '2019-05-20', '10:00:00', '', 0, 1)
+			]
+		)
+		self.db.commit()
+		actual = self.storage.get_date_aggregates(datetime(2019, 5, 1).date(), datetime(2019, 5, 20).date())
+		self.assertListEqual([
+			(datetime(2019, 5, 2).date(), 1, False),
+			(datetime(2019, 5, 9).date(), 2, False),
+			(datetime(2019, 5, 16).date(), 1, False),
+			(datetime(2019, 5, 20).date(), 1, False)
+		], actual)
+		events = self.storage.get_day_events(datetime(2019, 5, 9).date())
+		self.assertListEqual(['once', 'weekly'], [x.title for x in events])
+		self.assertEqual(datetime(2019, 5, 9).date(), events[1].date)
+		self.assertEqual(1, events[1].id)
+		self.assertListEqual([], self.storage.get_day_events(datetime(2019, 5, 10).date()))
+		self.clean_db()
+
+	def test_bulk_load_replace(self):
+		self.storage.from_array([{'title': 'old', 'date': '2019-05-02', 'time': '10:00:00', 'description': ''}])
+		self.storage.bulk_load([('new', '2019-05-03', '11:00:00', 'descr', 0, 1)], replace=True)
+		actual = self.cursor.execute('SELECT title, date, time, description, is_past, repeat_weekly FROM Events;').fetchall()
+		self.assertListEqual([('new', datetime(2019, 5, 3).toordinal(), 11 * 3600, 'descr', 0, 1)], actual)
+		indexes = [x[1] for x in self.cursor.execute('PRAGMA index_list(Events);').fetchall()]
+		self.assertIn('EventsDateTimeIdx', indexes)
+		self.assertIn('EventsDueIdx', indexes)
+		self.clean_db()
+
+	def test_bulk_load_rolls_back_on_failure(self):
+		self.storage.from_array([{'title': 'old', 'date': '2019-05-02', 'time': '10:00:00', 'description': ''}])
+		self.assertRaises(sqlite3.IntegrityError, self.storage.bulk_load, [
+			('new', '2019-05-03', '11:00:00', 'descr', 0, 1),
+			(None, '2019-05-03', '11:00:00', 'descr', 0, 1)
+		], replace=True)
+		actual = self.cursor.execute('SELECT title FROM Events;').fetchall()
+		self.assertListEqual([('old',)], actual)
+		indexes = [x[1] for x in self.cursor.execute('PRAGMA index_list(Events);').fetchall()]
+		self.assertIn('EventsDateTimeIdx', indexes)
+		self.clean_db()
+
+	def test_changes_since(self):
+		self.storage.from_array([
+			{'title': 'title {}'.format(i), 'date': '2019-05-02', 'time': '10:00:00', 'description': ''} for i in range(3)
+		])
+		seq = self.storage.last_change_seq()
+		self.assertEqual(([], []), self.storage.changes_since(seq))
+		self.storage.update_event(pk=2, title='changed', is_past=False)
+		self.storage.delete_event(3)
+		events, deleted = self.storage.changes_since(seq)
+		self.assertListEqual([2], [x['id'] for x in events])
+		self.assertEqual('changed', events[0]['title'])
+		self.assertListEqual([3], deleted)
+		self.storage.set_backup_base('digest', self.storage.last_change_seq())
+		self.assertEqual(('digest', self.storage.last_change_seq()), self.storage.get_backup_base())
+		self.assertEqual(0, self.cursor.execute('SELECT COUNT(*) FROM EventChanges WHERE deleted = 1;').fetchone()[0])
+		self.clean_db()
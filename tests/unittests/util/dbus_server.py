@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+from PyQt5.QtCore import QCoreApplication, QObject, Q_CLASSINFO, pyqtSlot
+from PyQt5.QtDBus import QDBusAbstractAdaptor, QDBusConnection
+
+SERVICE = 'org.freedesktop.Notifications'
+PATH = '/org/freedesktop/Notifications'
+
+
+class NotificationsAdaptor(QDBusAbstractAdaptor):
+	"""
+	Implements 'Notify' of org.freedesktop.Notifications writing every call as
+	a json line to the log file.
+	"""
+
+	Q_CLASSINFO('D-Bus Interface', 'org.freedesktop.Notifications')
+	Q_CLASSINFO('D-Bus Introspection', '''
+		<interface name="org.freedesktop.Notifications">
+			<method name="Notify">
+				<arg direction="in" type="s" name="app_name"/>
+				<arg direction="in" type="u" name="replaces_id"/>
+				<arg direction="in" type="s" name="app_icon"/>
+				<arg direction="in" type="s" name="summary"/>
+				<arg direction="in" type="s" name="body"/>
+				<arg direction="in" type="as" name="actions"/>
+				<arg direction="in" type="a{sv}" name="hints"/>
+				<arg direction="in" type="i" name="expire_timeout"/>
+				<arg direction="out" type="u" name="id"/>
+			</method>
+		</interface>
+	''')
+
+	def __init__(self, parent, log_file):
+		super(NotificationsAdaptor, self).__init__(parent)
+		self.log_file = log_file
+		self.last_id = 0
+
+	@pyqtSlot(str, 'uint', str, str, str, 'QStringList', 'QVariantMap', int, result='uint')
+	def Notify(self, app_name, replaces_id, app_icon, summary, body, actions, hints, expire_timeout):
+		urgency = hints.get('urgency')
+		if isinstance(urgency, bytes):
+			urgency = ord(urgency)
+		if replaces_id == 0:
+			self.last_id += 1
+			replaces_id = self.last_id
+		with open(self.log_file, 'a') as file:
+			file.write(json.dumps({
+				'app_name': app_name,
+				'id': replaces_id,
+				'summary': summary,
+				'body': body,
+				'urgency': urgency,
+				'expire_timeout': expire_timeout
+			}) + '\n')
+		return replaces_id
+
+
+class NotificationsTestServer:
+	"""
+	Runs a private session bus with a notifications service which records
+	calls instead of showing them. Tests using it are skipped if dbus-daemon
+	is not installed.
+	"""
+
+	def __init__(self):
+		self.address = None
+		self.__daemon = None
+		self.__server = None
+		self.__directory = tempfile.TemporaryDirectory()
+		self.log_file = os.path.join(self.__directory.name, 'calls.log')
+
+	@staticmethod
+	def is_available():
+		return shutil.which('dbus-daemon') is not None
+
+	def start(self):
+		self.__daemon = subprocess.Popen(
+			['dbus-daemon', '--session', '--nofork', '--nopidfile', '--print-address=1'],
+			stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True
+		)
+		self.address = self.__daemon.stdout.readline().strip()
+		self.__server = subprocess.Popen(
+			[sys.executable, '-m', 'tests.unittests.util.dbus_server', self.address, self.log_file],
+			stdout=subprocess.PIPE, universal_newlines=True
+		)
+		self.__server.stdout.readline()
+		return self
+
+	def stop(self):
+		for process in (self.__server, self.__daemon):
+			if process is not None:
+				process.terminate()
+				process.wait()
+				process.stdout.close()
+		self.__directory.cleanup()
+
+	def calls(self):
+		if not os.path.exists(self.log_file):
+			return []
+		with open(self.log_file) as file:
+			return [json.loads(line) for line in file]
+
+
+def main(address, log_file):
+	app = QCoreApplication(sys.argv)
+	connection = QDBusConnection.connectToBus(address, 'notifications')
+	service = QObject()
+	NotificationsAdaptor(service, log_file)
+	connection.registerObject(PATH, service)
+	if not connection.registerService(SERVICE):
+		raise SystemExit(connection.lastError().message())
+	print('ready', flush=True)
+	app.exec_()
+
+
+if __name__ == '__main__':
+	main(*sys.argv[1:])
@@ -0,0 +1,98 @@
+import threading
+from unittest import TestCase
+
+from erdesktop.util.dispatcher import NotificationDispatcher
+from erdesktop.util.exceptions import NotificationError
+from erdesktop.util.notification import Notification, NotificationBackend, SinkBackend
+
+
+def make_notification(i, key=None, urgency=Notification.URGENCY_LOW):
+	return Notification('title', 'event {}\n\ndescription'.format(i), urgency=urgency, key=key)
+
+
+class BlockingBackend(SinkBackend):
+
+	def __init__(self):
+		super(BlockingBackend, self).__init__()
+		self.entered = threading.Event()
+		self.released = threading.Event()
+
+	def send(self, notification):
+		self.entered.set()
+		self.released.wait(5)
+		super(BlockingBackend, self).send(notification)
+
+
+class FailingBackend(NotificationBackend):
+
+	def send(self, notification):
+		raise NotificationError('not available')
+
+
+class TestNotificationDispatcher(TestCase):
+
+	def test_send(self):
+		backend = SinkBackend()
+		dispatcher = NotificationDispatcher(backend, coalesce_window=0)
+		dispatcher.start()
+		self.assertTrue(dispatcher.submit(make_notification(1)))
+		dispatcher.stop()
+		self.assertListEqual(['event 1\n\ndescription'], [x.description for x in backend.sent])
+		stats = dispatcher.stats()
+		self.assertEqual(1, stats['sent'])
+		self.assertGreater(stats['latency_max'], 0)
+
+	def test_submit_does_not_wait_for_backend(self):
+		backend = BlockingBackend()
+		dispatcher = NotificationDispatcher(backend, max_size=2, coalesce_window=0)
+		dispatcher.start()
+		dispatcher.submit(make_notification(0))
+		backend.entered.wait(5)
+		self.assertTrue(dispatcher.submit(make_notification(1)))
+		self.assertTrue(dispatcher.submit(make_notification(2)))
+		self.assertFalse(dispatcher.submit(make_notification(3)))
+		backend.released.set()
+		dispatcher.stop()
+		self.assertEqual(3, len(backend.sent))
+		self.assertEqual(1, dispatcher.stats()['dropped'])
+
+	def test_coalesce_into_summary(self):
+		backend = SinkBackend()
+		dispatcher = NotificationDispatcher(backend, coalesce_limit=3)
+		for i in range(5):
+			dispatcher.submit(make_notification(i, urgency=Notification.URGENCY_NORMAL if i == 2 else Notification.URGENCY_LOW))
+		dispatcher.start()
+		dispatcher.stop()
+		self.assertEqual(1, len(backend.sent))
+		summary = backend.sent[0]
+		self.assertEqual('event 0\nevent 1\nevent 2\nevent 3\nevent 4', summary.description)
+		self.assertEqual(Notification.URGENCY_NORMAL, summary.urgency)
+		self.assertEqual(4, dispatcher.stats()['coalesced'])
+
+	def test_coalesce_same_key(self):
+		backend = SinkBackend()
+		dispatcher = NotificationDispatcher(backend)
+		dispatcher.submit(make_notification(1, key=1))
+		dispatcher.submit(make_notification(2, key=2))
+		dispatcher.submit(make_notification(3, key=1))
+		dispatcher.start()
+		dispatcher.stop()
+		self.assertListEqual(
+			['event 3\n\ndescription', 'event 2\n\ndescription'], [x.description for x in backend.sent]
+		)
+
+	def test_failed(self):
+		dispatcher = NotificationDispatcher(FailingBackend(), coalesce_window=0)
+		dispatcher.start()
+		dispatcher.submit(make_notification(1))
+		dispatcher.stop()
+		stats = dispatcher.stats()
+		self.assertEqual(0, stats['sent'])
+		self.assertEqual(1, stats['failed'])
+
+	def test_backend_without_send(self):
+		# noinspection PyAbstractClass
+		class IncompleteBackend(NotificationBackend):
+			pass
+
+		self.assertRaises(TypeError, IncompleteBackend)
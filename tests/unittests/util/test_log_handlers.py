@@ -0,0 +1,80 @@
+import os
+import time
+import queue
+import logging
+import tempfile
+from unittest import TestCase
+
+from erdesktop.util.log_handlers import RotatingLogFileHandler, BoundedQueueHandler
+
+
+def make_record(msg, level=logging.INFO):
+	return logging.makeLogRecord({'name': 'test', 'levelno': level, 'levelname': 'INFO', 'msg': msg})
+
+
+class TestRotatingLogFileHandler(TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.log_file = os.path.join(self.directory.name, 'application.log')
+
+	def doCleanups(self):
+		self.directory.cleanup()
+
+	def test_rotates_by_size(self):
+		handler = RotatingLogFileHandler(self.log_file, 100, 2, 3600)
+		for i in range(10):
+			handler.emit(make_record('x' * 40))
+		handler.close()
+		self.assertListEqual(
+			['application.log', 'application.log.1', 'application.log.2'], sorted(os.listdir(self.directory.name))
+		)
+		self.assertLessEqual(os.path.getsize(self.log_file), 100)
+
+	def test_rotates_by_age(self):
+		handler = RotatingLogFileHandler(self.log_file, 0, 2, 3600)
+		handler.emit(make_record('first'))
+		handler.emit(make_record('second'))
+		self.assertFalse(os.path.exists(self.log_file + '.1'))
+		handler.rollover_at = time.time() - 1
+		handler.emit(make_record('third'))
+		handler.close()
+		with open(self.log_file + '.1') as file:
+			self.assertEqual('first\nsecond\n', file.read())
+		with open(self.log_file) as file:
+			self.assertEqual('third\n', file.read())
+
+
+class TestBoundedQueueHandler(TestCase):
+
+	def messages(self, records_queue):
+		result = []
+		while not records_queue.empty():
+			result.append(records_queue.get_nowait().getMessage())
+		return result
+
+	def test_drop_new(self):
+		handler = BoundedQueueHandler(queue.Queue(2), BoundedQueueHandler.DROP_NEW)
+		for i in range(4):
+			handler.emit(make_record(str(i)))
+		self.assertEqual(2, handler.dropped)
+		self.assertListEqual(['0', '1'], self.messages(handler.queue))
+		handler.emit(make_record('4'))
+		self.assertListEqual(['2 log records were dropped, the queue was full', '4'], self.messages(handler.queue))
+
+	def test_drop_oldest(self):
+		handler = BoundedQueueHandler(queue.Queue(2), BoundedQueueHandler.DROP_OLDEST)
+		for i in range(4):
+			handler.emit(make_record(str(i)))
+		self.assertEqual(2, handler.dropped)
+		self.assertListEqual(['2', '3'], self.messages(handler.queue))
+
+	def test_block(self):
+		handler = BoundedQueueHandler(queue.Queue(1), BoundedQueueHandler.BLOCK, timeout=0.01)
+		handler.emit(make_record('0'))
+		handler.emit(make_record('1'))
+		self.assertEqual(1, handler.dropped)
+		self.assertListEqual(['0'], self.messages(handler.queue))
+
+	def test_unknown_policy(self):
+		self.assertRaises(ValueError, BoundedQueueHandler, queue.Queue(1), 'unknown')
@@ -0,0 +1,71 @@
+import unittest
+from unittest import TestCase
+
+from erdesktop.util import notification
+from erdesktop.util.exceptions import NotificationError
+from erdesktop.util.notification import Notification, DBusBackend, SinkBackend, shared_backend
+
+from tests.unittests.util.dbus_server import NotificationsTestServer
+
+
+@unittest.skipUnless(NotificationsTestServer.is_available(), 'dbus-daemon is not installed')
+class TestDBusBackend(TestCase):
+
+	def setUp(self):
+		self.server = NotificationsTestServer().start()
+		self.fallback = SinkBackend()
+		self.backend = DBusBackend('app', address=self.server.address, fallback=self.fallback)
+
+	def doCleanups(self):
+		self.backend.close()
+		self.server.stop()
+
+	def test_notify(self):
+		self.backend.send(Notification('title', 'description', duration=3, urgency=Notification.URGENCY_CRITICAL))
+		self.assertTrue(self.backend.is_connected)
+		self.assertListEqual([{
+			'app_name': 'app',
+			'id': 1,
+			'summary': 'title',
+			'body': 'description',
+			'urgency': 2,
+			'expire_timeout': 3000
+		}], self.server.calls())
+		self.assertListEqual([], self.fallback.sent)
+
+	def test_replace_same_key(self):
+		self.backend.send(Notification('title', 'first', key=10))
+		self.backend.send(Notification('title', 'other', key=20))
+		self.backend.send(Notification('title', 'second', key=10))
+		self.backend.send(Notification('title', 'summary'))
+		self.assertListEqual(
+			[(1, 'first'), (2, 'other'), (1, 'second'), (3, 'summary')],
+			[(x['id'], x['body']) for x in self.server.calls()]
+		)
+
+	def test_fallback(self):
+		backend = DBusBackend('app', address='unix:path=/nonexistent', fallback=self.fallback)
+		backend.send(Notification('title', 'first'))
+		backend.send(Notification('title', 'second'))
+		self.assertFalse(backend.is_connected)
+		self.assertListEqual(['first', 'second'], [x.description for x in self.fallback.sent])
+		self.assertRaises(
+			NotificationError, DBusBackend('app', address='unix:path=/nonexistent').send, Notification('t', 'd')
+		)
+		backend.close()
+
+	def test_send_reuses_shared_backend(self):
+		notification._shared = self.backend
+		try:
+			Notification('title', 'first', key=1).send()
+			Notification('title', 'second', key=1).send()
+		finally:
+			notification._shared = None
+		self.assertTrue(self.backend.is_connected)
+		self.assertListEqual([(1, 'first'), (1, 'second')], [(x['id'], x['body']) for x in self.server.calls()])
+
+
+class TestSharedBackend(TestCase):
+
+	def test_backend_is_created_once(self):
+		self.assertIs(shared_backend(), shared_backend())
@@ -0,0 +1,58 @@
+import threading
+from unittest import TestCase
+from datetime import datetime, timedelta
+
+from erdesktop.util.scheduler import DeadlineScheduler
+
+
+class TestDeadlineScheduler(TestCase):
+
+	def setUp(self):
+		self.scheduler = DeadlineScheduler(max_sleep=0.1)
+		self.scheduler.pop_changes()
+
+	def test_wait_returns_due_deadlines_in_order(self):
+		now = datetime.now()
+		self.scheduler.schedule(2, [(now - timedelta(seconds=1), DeadlineScheduler.EXPIRE)])
+		self.scheduler.schedule(1, [(now - timedelta(seconds=2), DeadlineScheduler.NOTIFY)])
+		self.scheduler.schedule(3, [(now + timedelta(hours=1), DeadlineScheduler.EXPIRE)])
+		self.assertListEqual(
+			[(1, DeadlineScheduler.NOTIFY), (2, DeadlineScheduler.EXPIRE)],
+			self.scheduler.wait()
+		)
+		self.assertEqual(1, len(self.scheduler))
+
+	def test_reschedule_drops_stale_deadlines(self):
+		now = datetime.now()
+		self.scheduler.schedule(1, [(now - timedelta(seconds=1), DeadlineScheduler.EXPIRE)])
+		self.scheduler.schedule(1, [(now + timedelta(hours=1), DeadlineScheduler.EXPIRE)])
+		self.assertEqual(now + timedelta(hours=1), self.scheduler.next_deadline())
+		self.assertListEqual([], self.scheduler.wait())
+
+	def test_unschedule(self):
+		self.scheduler.schedule(1, [(datetime.now(), DeadlineScheduler.EXPIRE)])
+		self.scheduler.unschedule(1)
+		self.assertIsNone(self.scheduler.next_deadline())
+		self.assertEqual(0, len(self.scheduler))
+
+	def test_invalidate_wakes_waiting_thread(self):
+		self.scheduler = DeadlineScheduler(max_sleep=5)
+		self.scheduler.pop_changes()
+		self.scheduler.schedule(1, [(datetime.now() + timedelta(hours=1), DeadlineScheduler.EXPIRE)])
+		timer = threading.Timer(0.1, self.scheduler.invalidate, args=(7,))
+		timer.start()
+		started = datetime.now()
+		self.assertListEqual([], self.scheduler.wait())
+		timer.join()
+		self.assertLess(datetime.now() - started, timedelta(seconds=2))
+		self.assertEqual((False, {7}), self.scheduler.pop_changes())
+
+	def test_invalidate_all(self):
+		self.scheduler.invalidate()
+		self.assertEqual((True, set()), self.scheduler.pop_changes())
+		self.assertEqual((False, set()), self.scheduler.pop_changes())
+
+	def test_stop(self):
+		self.scheduler.stop()
+		self.assertTrue(self.scheduler.is_stopped)
+		self.assertListEqual([], self.scheduler.wait())
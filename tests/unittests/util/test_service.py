@@ -0,0 +1,145 @@
+import os
+from unittest import TestCase
+from datetime import datetime, timedelta
+
+from erdesktop.settings import Settings
+from erdesktop.storage import Storage
+from erdesktop.util.service import ReminderService
+from erdesktop.util.notification import SinkBackend
+from erdesktop.util.scheduler import DeadlineScheduler
+
+
+class Calendar:
+
+	def __init__(self):
+		self.updates = 0
+
+	def update(self):
+		self.updates += 1
+
+
+class TestReminderService(TestCase):
+
+	def setUp(self):
+		self.settings = Settings.shared()
+		self.remind_time = self.settings.remind_time_before_event()
+		self.remove_event_after_time_up = self.settings.remove_event_after_time_up
+		self.settings.set_remind_time_before_event(15)
+		self.settings.set_remove_event_after_time_up(False)
+		self.storage = Storage(db_file='./test.db')
+		self.backend = SinkBackend()
+		self.calendar = Calendar()
+		self.service = ReminderService(None, self.calendar, self.backend, self.storage)
+		self.scheduler = self.service._ReminderService__scheduler
+		self.dispatcher = self.service._ReminderService__dispatcher
+		self.dispatcher.start()
+
+	def doCleanups(self):
+		self.dispatcher.stop()
+		self.storage.disconnect()
+		self.settings.set_remind_time_before_event(self.remind_time)
+		self.settings.set_remove_event_after_time_up(self.remove_event_after_time_up)
+		if os.path.exists('./test.db'):
+			os.remove('./test.db')
+
+	def create_event(self, delta, repeat_weekly=False):
+		event_datetime = (datetime.now() + delta).replace(microsecond=0)
+		return self.storage.create_event('title', event_datetime.date(), event_datetime.time(), 'descr', repeat_weekly)
+
+	def refresh(self):
+		self.service._ReminderService__refresh_schedule()
+
+	def process(self, due=None):
+		self.service._ReminderService__process_events(self.scheduler.wait() if due is None else due)
+
+	def sent(self):
+		self.dispatcher.stop()
+		self.dispatcher.start()
+		return [x.key for x in self.backend.sent]
+
+	def test_notify(self):
+		event = self.create_event(timedelta(minutes=10))
+		self.create_event(timedelta(minutes=30))
+		self.refresh()
+		self.assertEqual(5, len(self.scheduler))
+		self.process()
+		self.assertListEqual([event.id], self.sent())
+		self.assertTrue(self.storage.get_event_by_id(event.id).is_notified)
+		self.assertFalse(self.storage.get_event_by_id(event.id).is_past)
+		self.process([(event.id, DeadlineScheduler.NOTIFY)])
+		self.assertListEqual([event.id], self.sent())
+		self.assertEqual(0, self.calendar.updates)
+
+	def test_expire(self):
+		event = self.create_event(timedelta(minutes=-1))
+		self.refresh()
+		self.process()
+		self.assertListEqual([event.id], self.sent())
+		self.assertTrue(self.storage.get_event_by_id(event.id).is_past)
+		self.assertEqual(1, self.calendar.updates)
+
+	def test_expire_removes_event(self):
+		self.settings.set_remove_event_after_time_up(True)
+		event = self.create_event(timedelta(minutes=-1))
+		self.refresh()
+		self.process()
+		self.assertListEqual([event.id], self.sent())
+		self.assertIsNone(self.storage.get_event_by_id(event.id))
+
+	def test_repeat_advance(self):
+		event = self.create_event(timedelta(days=-8), repeat_weekly=True)
+		self.refresh()
+		self.process()
+		self.assertListEqual([event.id], self.sent())
+		updated = self.storage.get_event_by_id(event.id)
+		self.assertEqual(event.date + timedelta(days=14), updated.date)
+		self.assertEqual(event.time, updated.time)
+		self.assertFalse(updated.is_past)
+		self.assertFalse(updated.is_notified)
+
+	def test_changed_event_is_rescheduled(self):
+		event = self.create_event(timedelta(minutes=70))
+		self.refresh()
+		self.assertGreater(self.scheduler.next_deadline(), datetime.now() + timedelta(minutes=50))
+		event_datetime = datetime.now() + timedelta(minutes=5)
+		self.storage.update_event(event.id, e_date=event_datetime.date(), e_time=event_datetime.time())
+		self.scheduler.invalidate(event.id)
+		self.refresh()
+		self.process()
+		self.assertListEqual([event.id], self.sent())
+
+	def test_reload(self):
+		self.refresh()
+		self.assertFalse(self.scheduler.pop_changes()[0])
+		self.process([(None, DeadlineScheduler.RELOAD)])
+		self.assertTrue(self.scheduler.pop_changes()[0])
+
+	def test_retry(self):
+		event = self.create_event(timedelta(minutes=-1))
+		self.refresh()
+		self.dispatcher.submit = lambda notification: False
+		self.process()
+		self.assertFalse(self.storage.get_event_by_id(event.id).is_past)
+		self.assertEqual(2, len(self.scheduler))
+		self.assertLessEqual(self.scheduler.next_deadline(), datetime.now() + timedelta(seconds=ReminderService.RETRY_DELAY))
+		del self.dispatcher.submit
+		self.scheduler.wait()
+		self.process([(event.id, DeadlineScheduler.EXPIRE)])
+		self.assertListEqual([event.id], self.sent())
+		self.assertTrue(self.storage.get_event_by_id(event.id).is_past)
+
+	def test_nothing_due_does_not_open_transaction(self):
+		transactions = []
+		transaction = self.storage.transaction
+		self.storage.transaction = lambda: transactions.append(None) or transaction()
+		self.process([])
+		self.process([(None, DeadlineScheduler.RELOAD)])
+		self.assertListEqual([], transactions)
+		self.process([(1, DeadlineScheduler.EXPIRE)])
+		self.assertEqual(1, len(transactions))
+
+	def test_shutdown(self):
+		self.service.start()
+		self.assertTrue(self.service.isRunning())
+		self.assertTrue(self.service.shutdown())
+		self.assertTrue(self.service.isFinished())
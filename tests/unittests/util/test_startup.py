@@ -0,0 +1,42 @@
+import sys
+import builtins
+from unittest import TestCase
+
+from erdesktop.util.startup import StartupTimer, ImportProfiler
+
+
+class TestStartupTimer(TestCase):
+
+	def test_phases(self):
+		timer = StartupTimer()
+		with timer.phase('first'):
+			pass
+		with timer.phase('second'):
+			pass
+		self.assertListEqual(['first', 'second'], [name for name, _ in timer.phases])
+		self.assertIsNone(timer.idle_at)
+		timer.idle()
+		total = timer.total
+		timer.idle()
+		self.assertEqual(total, timer.total)
+		self.assertIn('total to idle', timer.report())
+
+
+class TestImportProfiler(TestCase):
+
+	def test_records_new_imports(self):
+		sys.modules.pop('colorsys', None)
+		original = builtins.__import__
+		profiler = ImportProfiler()
+		profiler.start()
+		try:
+			import colorsys
+			import os
+		finally:
+			profiler.stop()
+		self.assertIs(original, builtins.__import__)
+		self.assertIn('colorsys', profiler.timings)
+		self.assertNotIn('os', profiler.timings)
+		total, own = profiler.timings['colorsys']
+		self.assertGreaterEqual(total, own)
+		self.assertIn('colorsys', profiler.report())